@@ -1,53 +1,365 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_from_directory
+from flask import Blueprint, Flask, current_app, request, jsonify, g
 import database
-import notifications
+import events
+import jobs
+import metrics
+import static_files
+import transfer
 import os
+import base64
+import json
+import time
+from functools import wraps
 from datetime import datetime, date
+from response_cache import ResponseCache, make_etag
 
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'frontend/dist'), static_url_path='/')
-app.secret_key = 'super_secret_key_for_flash_messages'
-POSSIBLE_CORS = True # Set to False in production if served from same origin
+# CORS solo hace falta con el dev server de Vite (otro origen); en producción se sirve todo
+# desde el mismo origen. PENDIENTES_CORS=0 lo desactiva.
+CORS_ENABLED = os.environ.get('PENDIENTES_CORS', '1') != '0'
 
-if POSSIBLE_CORS:
-    from flask_cors import CORS
-    CORS(app)
+# Todas las rutas viven en el blueprint; create_app() arma la aplicación
+bp = Blueprint('pendientes', __name__)
 
-# Inicializar BD
-database.init_db()
 
-# --- Rutas de Frontend (Producción) ---
-@app.route('/')
-def index():
-    # En desarrollo, esto puede no funcionar si no se ha hecho 'npm run build'.
-    # Lo ideal es usar el dev server de Vite para el frontend.
-    try:
-        return send_from_directory(app.static_folder, 'index.html')
-    except:
-        return "Frontend no construido. Ejecuta 'npm run build' en la carpeta frontend y reinicia."
+def create_app(static_root=static_files.DIST_DIR, cors=None):
+    """
+    Crea la aplicación. El chequeo de esquema, el hub de eventos y el índice de archivos
+    del frontend se resuelven acá, una vez por proceso, y no al importar el módulo.
+    """
+    app = Flask(__name__, static_folder=None)
+    app.secret_key = 'super_secret_key_for_flash_messages'
+
+    if CORS_ENABLED if cors is None else cors:
+        from flask_cors import CORS
+        CORS(app, expose_headers=['ETag', 'X-Sync-Cursor'])
+
+    # Inicializar BD
+    database.init_db()
+    events.start()
+
+    app.extensions['static_files'] = static_files.StaticFiles(static_root)
+    app.register_blueprint(bp)
+    return app
+
+# Una sola conexión del pool por petición, reutilizada por todas las llamadas a database.
+# Latencia por ruta (plantilla de la regla, no la URL, para no multiplicar las series)
+@bp.before_app_request
+def start_request():
+    g.request_start = time.perf_counter()
+    if request.path.startswith('/api/'):
+        database.begin_request()
+
+@bp.teardown_app_request
+def close_db_connection(exc):
+    database.end_request()
+
+@bp.after_app_request
+def record_request_time(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.http_request_seconds.observe(
+            time.perf_counter() - start,
+            method=request.method, route=route, status=response.status_code
+        )
+    return response
+
+
+# --- Caché de listados con ETag ---
+
+response_cache = ResponseCache()
+
+def versioned_key(path, query_string):
+    """Clave de caché de una URL (igual desde Flask y desde asgi.py)."""
+    return f"{path}?{query_string.decode('latin-1')}"
+
+def versioned_lookup(key, tables, daily, if_none_match, check=True):
+    """
+    Retorna (etag, versions, entry). entry es None si hay que generar la respuesta,
+    'not_modified' si el cliente ya la tiene, o la entrada de response_cache.
+    """
+    versions = database.get_data_versions(tables, check=check)
+    if daily:
+        versions += (date.today().isoformat(),)
+    etag = make_etag(key, database.DATA_EPOCH, versions)
+    if etag in if_none_match:
+        response_cache.not_modified += 1
+        return etag, versions, 'not_modified'
+    return etag, versions, response_cache.get(key, versions)
+
+def versioned(*tables, daily=False):
+    """
+    Para GET de listados que dependen de 'tables': responde 304 si el If-None-Match del
+    cliente coincide con las versiones actuales de los datos, o sirve la respuesta desde
+    la caché en memoria; en ambos casos sin consultar SQLite.
+    daily=True para respuestas que dependen de la fecha de hoy (vencidos, esta semana).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = versioned_key(request.path, request.query_string)
+            etag, versions, entry = versioned_lookup(key, tables, daily, request.if_none_match)
+
+            if entry == 'not_modified':
+                response = current_app.response_class(status=304)
+            elif entry is not None:
+                response = current_app.response_class(entry['body'], mimetype=entry['mimetype'])
+                response.headers.extend(entry['headers'])
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                headers = [(k, v) for k, v in response.headers.items() if k.startswith('X-')]
+                if response.is_streamed:
+                    # Se cachea mientras sale hacia el cliente, sin esperar el cuerpo completo
+                    response.response = response_cache.tee(key, versions, response.response, response.mimetype, headers)
+                else:
+                    response_cache.put(key, versions, response.get_data(), response.mimetype, headers)
+
+            response.set_etag(etag)
+            # El navegador debe revalidar siempre (barato gracias al 304)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        # asgi.py responde los 304 y aciertos de caché sin pasar por Flask
+        wrapper.versioned = (tables, daily)
+        return wrapper
+    return decorator
+
+
+# --- API DIAGNÓSTICO ---
+
+@bp.route('/api/db/pool', methods=['GET'])
+def db_pool_stats():
+    return jsonify(database.get_pool_stats())
+
+@bp.route('/api/cache', methods=['GET'])
+def cache_stats():
+    return jsonify(response_cache.stats())
+
+
+# Estado del pool, la caché y el hub de eventos, calculado al exportar
+metrics.Gauge('pendientes_db_pool', 'Estado del pool de conexiones SQLite', ('stat',),
+              fn=lambda: {(k,): v for k, v in database.get_pool_stats().items() if isinstance(v, (int, float))})
+metrics.Gauge('pendientes_response_cache', 'Estado de la caché de respuestas', ('stat',),
+              fn=lambda: {(k,): v for k, v in response_cache.stats().items()})
+metrics.Gauge('pendientes_events', 'Estado del hub de eventos SSE', ('stat',),
+              fn=lambda: {(k,): v for k, v in events.hub.stats().items()})
+
+@bp.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Métricas en formato de texto de Prometheus."""
+    return current_app.response_class(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+# --- API EVENTOS (SSE) ---
+
+@bp.route('/api/events', methods=['GET'])
+def events_stream():
+    """
+    Flujo Server-Sent Events con los cambios de pendientes, clientes y tareas.
+    event: change  -> data {table, op, ids, ...}; el cliente pide el delta con ?since=
+    event: resync  -> se perdieron eventos; el cliente debe recargar
+    Reanuda con el header Last-Event-ID (lo envía EventSource al reconectar).
+    """
+    last_event_id = events.parse_last_event_id(
+        request.headers.get('Last-Event-ID', request.args.get('lastEventId'))
+    )
+    response = current_app.response_class(events.stream(last_event_id), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Evita que nginx acumule el flujo en su buffer
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@bp.route('/api/events/stats', methods=['GET'])
+def events_stats():
+    return jsonify(events.hub.stats())
+
 
+# --- API BÚSQUEDA ---
 
+@bp.route('/api/search', methods=['GET'])
+def search_api():
+    """GET /api/search?q=texto&limit=20 -> { clientes, tasks, pendientes }"""
+    q = request.args.get('q', '')
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+    results = database.search(q, limit=limit)
+    return jsonify({kind: [dict(row) for row in rows] for kind, rows in results.items()})
+
+
+# --- API ESTADÍSTICAS ---
+
+@bp.route('/api/stats', methods=['GET'])
+@versioned('pendientes', 'clientes', 'client_tasks', daily=True)
+def stats_api():
+    """
+    GET /api/stats?due_days=7&top=10 -> contadores para el tablero (ver database.get_stats).
+    La respuesta queda en la caché de versioned hasta la próxima escritura (o cambio de día).
+    """
+    due_days = max(0, min(request.args.get('due_days', 7, type=int), 365))
+    top = max(1, min(request.args.get('top', database.STATS_TOP, type=int), 100))
+    return jsonify(database.get_stats(due_days=due_days, top=top))
 
 
 # --- API PENDIENTES ---
 
-@app.route('/api/pendientes', methods=['GET'])
+MAX_PAGE_SIZE = 1000
+
+# --- Sincronización incremental ---
+
+def _row(row):
+    return dict(row) if row is not None else None
+
+def _with_sync_cursor(response, cursor):
+    # Cursor leído ANTES de la consulta: un cambio concurrente puede repetirse, nunca perderse
+    response.headers['X-Sync-Cursor'] = str(cursor)
+    return response
+
+def _stale_cursor(since):
+    """410 si se purgaron tombstones posteriores a 'since': el cliente debe recargar la lista."""
+    if since < database.get_tombstone_floor():
+        return jsonify({'error': 'Cursor de sincronización vencido, recargar la lista'}), 410
+    return None
+
+def _delta(rows, table, since, cursor):
+    return {
+        'items': [dict(row) for row in rows],
+        'deleted': database.get_deleted_since(table, since),
+        'cursor': cursor
+    }
+
+def _encode_cursor(row):
+    raw = json.dumps([row['fecha_limite'], row['id']]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def _decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+    fecha_limite, row_id = json.loads(raw)
+    # Un cursor armado a mano no debe llegar a SQLite con listas u objetos como parámetros
+    if not (fecha_limite is None or isinstance(fecha_limite, str)):
+        raise ValueError('fecha_limite inválida en el cursor')
+    return fecha_limite, int(row_id)
+
+def _json_rows(columns, rows, fields=None):
+    """
+    Respuesta con un arreglo JSON que se escribe mientras se leen las filas (tuplas), por
+    bloques: la memoria no crece con la cantidad de filas y el primer byte sale enseguida.
+    """
+    return current_app.response_class(transfer.json_stream(columns, rows, fields), mimetype='application/json')
+
+def _split_param(name):
+    value = request.args.get(name, '')
+    return [v.strip() for v in value.split(',') if v.strip()]
+
+@bp.route('/api/pendientes', methods=['GET'])
+@versioned('pendientes')
 def get_pendientes():
-    pendientes = database.get_pendientes()
-    # Convertir 'sqlite3.Row' a dict
-    return jsonify([dict(row) for row in pendientes])
+    """
+    Query params (todos opcionales):
+        estado=Pendiente,En Progreso   empresa=ACME   client_id=7
+        fecha_desde=2026-01-01         fecha_hasta=2026-01-31
+        q=texto                        (búsqueda en actividad, descripción y empresa)
+        fields=id,actividad,estado     (proyección de columnas)
+        limit=100  cursor=<next_cursor> (paginación keyset por fecha_limite, id)
+
+    Sin limit ni cursor devuelve la lista completa como antes.
+    Con paginación devuelve { items, next_cursor, total }; total solo en la primera página.
+
+    since=N devuelve solo los cambios posteriores al cursor de sincronización N:
+    { items, deleted, cursor }. El cursor actual viaja en el header X-Sync-Cursor.
+    """
+    since = request.args.get('since', type=int)
+    if since is not None:
+        stale = _stale_cursor(since)
+        if stale:
+            return stale
+        sync_cursor = database.get_sync_cursor()
+        return jsonify(_delta(database.get_pendientes_since(since), 'pendientes', since, sync_cursor))
+
+    return _pendientes_list(client_id=request.args.get('client_id', type=int))
+
+@bp.route('/api/clients/<int:client_id>/pendientes', methods=['GET'])
+@versioned('pendientes', 'clientes')
+def get_client_pendientes(client_id):
+    """
+    Pendientes de un cliente (por client_id, con índice). Acepta los mismos parámetros
+    que /api/pendientes salvo since y client_id.
+    """
+    if not database.get_cliente(client_id):
+        return jsonify({'error': 'Cliente no encontrado'}), 404
+    return _pendientes_list(client_id=client_id)
+
+def _pendientes_list(client_id=None):
+    """Listado (completo o paginado) de pendientes con los filtros del query string."""
+    filters = {
+        'estados': _split_param('estado'),
+        'empresa': request.args.get('empresa') or None,
+        'fecha_desde': request.args.get('fecha_desde') or None,
+        'fecha_hasta': request.args.get('fecha_hasta') or None,
+        'q': request.args.get('q') or None,
+        'client_id': client_id,
+    }
+    fields = _split_param('fields')
+    unknown = [f for f in fields if f not in database.PENDIENTE_FIELDS]
+    if unknown:
+        return jsonify({'error': f'Campos desconocidos: {", ".join(unknown)}'}), 400
+    output_fields = set(fields) | {'id'} if fields else None
+
+    def to_dict(row):
+        item = dict(row)
+        if output_fields:
+            item = {k: v for k, v in item.items() if k in output_fields}
+        return item
+
+    sync_cursor = database.get_sync_cursor()
+    cursor = request.args.get('cursor')
+    limit = request.args.get('limit')
+    if limit is not None:
+        # Un limit mal escrito no debe caer en el listado completo
+        if not limit.isdigit() or int(limit) < 1:
+            return jsonify({'error': 'limit debe ser un entero positivo'}), 400
+        limit = int(limit)
+    if cursor is None and limit is None:
+        rows = database.iter_pendientes(fields=fields, **filters)
+        return _with_sync_cursor(_json_rows(database.pendientes_columns(fields), rows, output_fields), sync_cursor)
+
+    try:
+        after = _decode_cursor(cursor) if cursor else None
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Cursor inválido'}), 400
+    limit = max(1, min(limit or 100, MAX_PAGE_SIZE))
+
+    # Se pide una fila extra para saber si hay página siguiente
+    rows = database.get_pendientes_page(fields=fields, limit=limit + 1, after=after, **filters)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    result = {
+        'items': [to_dict(row) for row in rows],
+        'next_cursor': _encode_cursor(rows[-1]) if has_more else None,
+    }
+    if after is None:
+        result['total'] = database.count_pendientes(**filters)
+    return _with_sync_cursor(jsonify(result), sync_cursor)
 
-@app.route('/api/pendientes', methods=['POST'])
+@bp.route('/api/pendientes/<int:id>', methods=['GET'])
+def get_pendiente(id):
+    item = database.get_pendiente(id)
+    if not item:
+        return jsonify({'error': 'Pendiente no encontrado'}), 404
+    return jsonify(dict(item))
+
+@bp.route('/api/pendientes', methods=['POST'])
 def add_pendiente():
     data = request.json
-    database.add_pendiente(
+    new_id = database.add_pendiente(
         data['fecha'], data['actividad'], data.get('descripcion', ''),
         data.get('empresa', ''), 'Pendiente', data.get('observaciones', ''),
         data.get('fecha_limite', ''), data.get('email_notificacion', ''),
         data.get('dias_antes_notificacion', 3)
     )
-    return jsonify({'message': 'Pendiente agregado'}), 201
+    return jsonify({'message': 'Pendiente agregado', 'item': _row(database.get_pendiente(new_id))}), 201
 
-@app.route('/api/pendientes/<int:id>', methods=['PUT'])
+@bp.route('/api/pendientes/<int:id>', methods=['PUT'])
 def update_pendiente(id):
     data = request.json
     database.update_pendiente(
@@ -56,39 +368,64 @@ def update_pendiente(id):
         data.get('fecha_limite', ''), data.get('email_notificacion', ''),
         data.get('dias_antes_notificacion', 3)
     )
-    return jsonify({'message': 'Pendiente actualizado'})
+    return jsonify({'message': 'Pendiente actualizado', 'item': _row(database.get_pendiente(id))})
 
 # ... (omitted)
 
 
 
-@app.route('/api/pendientes/<int:id>', methods=['DELETE'])
+@bp.route('/api/pendientes/<int:id>', methods=['DELETE'])
 def delete_pendiente(id):
     database.delete_pendiente(id)
-    return jsonify({'message': 'Pendiente eliminado'})
+    return jsonify({'message': 'Pendiente eliminado', 'id': id})
 
 # --- API CLIENTES ---
 
-@app.route('/api/clientes', methods=['GET'])
+@bp.route('/api/clientes', methods=['GET'])
+@versioned('clientes', 'client_tasks', 'pendientes', daily=True)
 def api_get_clientes():
-    clientes = database.get_clientes()
-    return jsonify([dict(row) for row in clientes])
-
+    """
+    Query params opcionales:
+        q=texto        busca en empresa, observaciones, procedimiento y tareas del cliente
+        status=Estado  Sin Tareas / Pendiente / En Proceso / Finalizado (Todos = sin filtro)
+        since=N        solo cambios posteriores al cursor N -> { items, deleted, cursor }
 
-@app.route('/api/clientes', methods=['POST'])
+    Cada cliente incluye el resumen de sus pendientes abiertos: open_pendientes,
+    overdue_pendientes y due_week_pendientes (vencen hasta el domingo).
+    """
+    since = request.args.get('since', type=int)
+    if since is not None:
+        stale = _stale_cursor(since)
+        if stale:
+            return stale
+        cursor = database.get_sync_cursor()
+        return jsonify(_delta(database.get_clientes(since=since), 'clientes', since, cursor))
+
+    status = request.args.get('status') or None
+    if status == 'Todos':
+        status = None
+    if status and status not in database.CLIENT_STATUSES:
+        return jsonify({'error': f'Estado inválido: {status}'}), 400
+
+    cursor = database.get_sync_cursor()
+    clientes = database.get_clientes(q=request.args.get('q') or None, status=status)
+    return _with_sync_cursor(jsonify([dict(row) for row in clientes]), cursor)
+
+
+@bp.route('/api/clientes', methods=['POST'])
 def add_cliente():
     data = request.json
-    database.add_cliente(
+    new_id = database.add_cliente(
         data['empresa'], 
         data.get('observaciones', ''),
         data.get('check_estado', 0),
         data.get('procedimiento', ''),
         data.get('estado', 'Pendiente')
     )
-    return jsonify({'message': 'Cliente agregado'}), 201
+    return jsonify({'message': 'Cliente agregado', 'item': _row(database.get_cliente_summary(new_id))}), 201
 
 
-@app.route('/api/clientes/<int:id>', methods=['PUT'])
+@bp.route('/api/clientes/<int:id>', methods=['PUT'])
 def update_cliente(id):
     data = request.json
     database.update_cliente(
@@ -99,82 +436,214 @@ def update_cliente(id):
         data.get('procedimiento', ''),
         data.get('estado', 'Pendiente')
     )
-    return jsonify({'message': 'Cliente actualizado'})
+    return jsonify({'message': 'Cliente actualizado', 'item': _row(database.get_cliente_summary(id))})
 
 
-@app.route('/api/clientes/<int:id>', methods=['DELETE'])
+@bp.route('/api/clientes/<int:id>', methods=['DELETE'])
 def delete_cliente(id):
     database.delete_cliente(id)
-    return jsonify({'message': 'Cliente eliminado'})
+    return jsonify({'message': 'Cliente eliminado', 'id': id})
 
 # --- API NOTIFICACIONES ---
 
-@app.route('/api/notify/<int:id>', methods=['POST'])
+@bp.route('/api/notify/<int:id>', methods=['POST'])
 def notify_api(id):
     item = database.get_pendiente(id)
-    if item and item['email_notificacion']:
-        subject = f"🔔 Recordatorio: '{item['actividad']}'"
-        body = f"""Hola,
-        
-Registro de pendiente:
---------------------------------------------------
-ACTIVIDAD: {item['actividad']}
---------------------------------------------------
-📅 Fecha Límite: {item['fecha_limite']}
-🏢 Empresa:      {item['empresa']}
-📝 Descripción:  {item['descripcion']}
-⚠️ Estado Actual: {item['estado']}
-        
-Saludos,
-Tu Asistente Virtual"""
-        success = notifications.send_email(item['email_notificacion'], subject, body)
-        if success:
-            return jsonify({'message': f'Correo enviado a {item["email_notificacion"]}'})
-        else:
-            return jsonify({'error': 'Error al enviar el correo'}), 500
-    return jsonify({'error': 'No tiene correo configurado'}), 400
+    if not item:
+        return jsonify({'error': 'Pendiente no encontrado'}), 404
+    if not item['email_notificacion']:
+        return jsonify({'error': 'No tiene correo configurado'}), 400
+
+    # El envío SMTP se hace en segundo plano; el estado se consulta en /api/jobs/<job_id>
+    job_id = jobs.enqueue('notify_pendiente', {'id': id})
+    return jsonify({
+        'message': f'Correo a {item["email_notificacion"]} en cola de envío',
+        'job_id': job_id
+    }), 202
+
+@bp.route('/api/notify/deadlines', methods=['POST'])
+def notify_deadlines_api():
+    """Ejecuta la revisión de vencimientos (igual que el scheduler) en segundo plano."""
+    data = request.get_json(silent=True) or {}
+    job_id = jobs.enqueue('check_deadlines', {'mode': data.get('mode')})
+    return jsonify({'message': 'Revisión de vencimientos en cola', 'job_id': job_id}), 202
+
+@bp.route('/api/clients/<int:client_id>/notify-pending-tasks', methods=['POST'])
+def notify_client_pending_tasks(client_id):
+    """
+    Envía por correo las tareas pendientes de un cliente.
+    Body: { "emails": ["a@example.com", "b@example.com"] }
+    """
+    data = request.json
+    emails = data.get('emails') or []
+    if isinstance(emails, str):
+        emails = emails.split(',')
+    emails = [e.strip() for e in emails if e and e.strip()]
+    if not emails:
+        return jsonify({'error': 'Debe especificar al menos un correo electrónico'}), 400
+    if not database.get_cliente(client_id):
+        return jsonify({'error': 'Cliente no encontrado'}), 404
 
+    job_id = jobs.enqueue('client_pending_tasks_email', {'client_id': client_id, 'emails': emails})
+    return jsonify({'message': 'Envío en cola', 'job_id': job_id}), 202
 
-    return jsonify({'error': 'No tiene correo configurado'}), 400
+# --- API JOBS ---
+
+@bp.route('/api/jobs/<int:job_id>', methods=['GET'])
+def get_job(job_id):
+    job = database.get_job(job_id)
+    if not job:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    return jsonify(job)
 
 
 # --- API CLIENT TASKS ---
 
-@app.route('/api/clients/<int:client_id>/tasks', methods=['GET'])
+@bp.route('/api/clients/<int:client_id>/tasks', methods=['GET'])
+@versioned('client_tasks')
 def get_client_tasks(client_id):
-    tasks = database.get_client_tasks(client_id)
-    return jsonify([dict(row) for row in tasks])
-
-@app.route('/api/clients/<int:client_id>/tasks', methods=['POST'])
+    since = request.args.get('since', type=int)
+    if since is not None:
+        stale = _stale_cursor(since)
+        if stale:
+            return stale
+        cursor = database.get_sync_cursor()
+        tasks = database.get_client_tasks(client_id, since=since)
+        return jsonify(_delta(tasks, 'client_tasks', since, cursor))
+
+    cursor = database.get_sync_cursor()
+    tasks = database.iter_client_tasks(client_id)
+    return _with_sync_cursor(_json_rows(database.CLIENT_TASK_FIELDS, tasks), cursor)
+
+@bp.route('/api/clients/<int:client_id>/tasks', methods=['POST'])
 def add_client_task(client_id):
     data = request.json
-    database.add_client_task(client_id, data['description'])
-    return jsonify({'message': 'Tarea agregada'}), 201
+    if not database.get_cliente(client_id):
+        return jsonify({'error': 'Cliente no encontrado'}), 404
+    task_id = database.add_client_task(client_id, data['description'])
+    return jsonify({
+        'message': 'Tarea agregada',
+        'item': _row(database.get_task(task_id)),
+        'cliente': _row(database.get_cliente_summary(client_id))
+    }), 201
 
-@app.route('/api/clients/<int:client_id>/tasks/bulk', methods=['POST'])
+@bp.route('/api/clients/<int:client_id>/tasks/bulk', methods=['POST'])
 def add_client_tasks_bulk(client_id):
     data = request.json
+    if not database.get_cliente(client_id):
+        return jsonify({'error': 'Cliente no encontrado'}), 404
+    before = database.get_sync_cursor()
     database.add_client_tasks_bulk(client_id, data['tasks'])
-    return jsonify({'message': 'Tareas agregadas'}), 201
+    return jsonify({
+        'message': 'Tareas agregadas',
+        'items': [dict(row) for row in database.get_client_tasks(client_id, since=before)],
+        'cliente': _row(database.get_cliente_summary(client_id))
+    }), 201
 
-@app.route('/api/tasks/<int:id>', methods=['PUT'])
+@bp.route('/api/tasks/<int:id>', methods=['PUT'])
 def update_task_status(id):
     data = request.json
     database.update_task_status(id, data['completed'])
-    return jsonify({'message': 'Estado actualizado'})
+    task = database.get_task(id)
+    return jsonify({
+        'message': 'Estado actualizado',
+        'item': _row(task),
+        'cliente': _row(database.get_cliente_summary(task['client_id'])) if task else None
+    })
 
-@app.route('/api/tasks/<int:id>', methods=['DELETE'])
+@bp.route('/api/tasks/<int:id>', methods=['DELETE'])
 def delete_task(id):
+    task = database.get_task(id)
     database.delete_task(id)
-    return jsonify({'message': 'Tarea eliminada'})
+    return jsonify({
+        'message': 'Tarea eliminada',
+        'id': id,
+        'cliente': _row(database.get_cliente_summary(task['client_id'])) if task else None
+    })
+
+MAX_TASK_OPERATIONS = 5000
 
-@app.route('/api/tasks/global', methods=['POST'])
+@bp.route('/api/tasks', methods=['PATCH'])
+def patch_tasks():
+    """
+    Lote de operaciones sobre tareas en una sola transacción:
+    { "operations": [
+        {"op": "complete", "id": 1}, {"op": "uncomplete", "id": 2}, {"op": "delete", "id": 3},
+        {"op": "edit", "id": 4, "description": "..."}, {"op": "complete_all", "client_id": 7}
+      ],
+      "atomic": false }
+    Responde un resultado por operación (ok / not_found / skipped), las tareas modificadas,
+    los ids borrados y el resumen de cada cliente afectado. Con atomic=true, si alguna
+    operación no encuentra su tarea no se aplica ninguna (409).
+    """
+    data = request.get_json(silent=True) or {}
+    operations = data.get('operations')
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'error': 'Se requiere una lista "operations"'}), 400
+    if len(operations) > MAX_TASK_OPERATIONS:
+        return jsonify({'error': f'Máximo {MAX_TASK_OPERATIONS} operaciones por lote'}), 400
+
+    for index, op in enumerate(operations):
+        kind = op.get('op') if isinstance(op, dict) else None
+        key = 'client_id' if kind == 'complete_all' else 'id'
+        if kind not in database.TASK_OPERATIONS:
+            return jsonify({'error': f'Operación {index}: "op" debe ser uno de {", ".join(database.TASK_OPERATIONS)}'}), 400
+        # bool es subclase de int: true no debe tomarse como la tarea 1
+        if type(op.get(key)) is not int:
+            return jsonify({'error': f'Operación {index}: falta "{key}" numérico'}), 400
+        if kind == 'edit' and not (isinstance(op.get('description'), str) and op['description'].strip()):
+            return jsonify({'error': f'Operación {index}: falta "description"'}), 400
+
+    before = database.get_sync_cursor()
+    outcome = database.apply_task_operations(operations, atomic=bool(data.get('atomic')))
+    if not outcome['applied']:
+        return jsonify({'error': 'Alguna operación no encontró su tarea; no se aplicó ningún cambio',
+                        'results': outcome['results']}), 409
+
+    items = {row['id']: dict(row) for row in database.get_tasks_by_ids(outcome['updated_ids'])}
+    for op in operations:
+        if op['op'] == 'complete_all':
+            items.update((row['id'], dict(row)) for row in database.get_client_tasks(op['client_id'], since=before))
+    clientes = [_row(database.get_cliente_summary(cid)) for cid in outcome['client_ids']]
+
+    return jsonify({
+        'results': outcome['results'],
+        'items': list(items.values()),
+        'deleted': outcome['deleted_ids'],
+        'clientes': [c for c in clientes if c],
+    })
+
+@bp.route('/api/tasks/global', methods=['POST'])
 def add_global_task():
-    data = request.json
-    database.add_task_to_all_clients(data['description'])
-    return jsonify({'message': 'Tarea global agregada a todos los clientes'}), 201
+    """
+    { "description": "..." } o { "descriptions": [...] }
+    Filtros opcionales: "estado" (string o lista), "empresa_like" (patrón LIKE), "client_ids".
+    Los clientes que ya tienen la tarea no la reciben de nuevo.
+    """
+    data = request.json or {}
+    descriptions = data.get('descriptions') or [data.get('description')]
+    descriptions = [d for d in descriptions if isinstance(d, str) and d.strip()]
+    if not descriptions:
+        return jsonify({'error': 'Falta la descripción de la tarea'}), 400
+
+    estados = data.get('estado')
+    if isinstance(estados, str):
+        estados = [estados]
+    client_ids = data.get('client_ids')
+    if client_ids is not None and not (
+        isinstance(client_ids, list) and all(type(i) is int for i in client_ids)
+    ):
+        return jsonify({'error': 'client_ids debe ser una lista de números'}), 400
+
+    inserted = database.add_task_to_all_clients(
+        descriptions,
+        estados=estados or None,
+        empresa_like=data.get('empresa_like') or None,
+        client_ids=client_ids,
+    )
+    return jsonify({'message': 'Tarea global agregada a los clientes', 'inserted': inserted}), 201
 
-@app.route('/api/clients/<int:client_id>/create-pending-tasks', methods=['POST'])
+@bp.route('/api/clients/<int:client_id>/create-pending-tasks', methods=['POST'])
 def create_pending_tasks(client_id):
     """
     Crea registros en la tabla 'pendientes' a partir de las tareas pendientes de un cliente
@@ -203,45 +672,184 @@ def create_pending_tasks(client_id):
     if not pending_tasks or len(pending_tasks) == 0:
         return jsonify({'error': 'No hay tareas pendientes para este cliente'}), 400
     
-    # Crear un pendiente por cada tarea pendiente
-    from datetime import datetime
+    # Crear un pendiente por cada tarea pendiente, todos en una sola transacción
     fecha_hoy = datetime.now().strftime('%Y-%m-%d')
-    
-    created_count = 0
-    for task in pending_tasks:
-        database.add_pendiente(
-            fecha=fecha_hoy,
-            actividad=task['description'],
-            descripcion=f"Tarea del cliente: {client['empresa']}",
-            empresa=client['empresa'],
-            estado='Pendiente',
-            observaciones='',
-            fecha_limite=fecha_limite,
-            email_notificacion=email,
-            dias_antes_notificacion=dias_antes
-        )
-        created_count += 1
+    rows = [
+        _pending_row(task, client['empresa'], client_id, fecha_hoy, fecha_limite, email, dias_antes)
+        for task in pending_tasks
+    ]
+    created_count = database.add_pendientes_bulk(rows)
     
     return jsonify({
         'message': f'{created_count} tarea(s) agregada(s) a Pendientes',
         'count': created_count
     }), 201
 
+@bp.route('/api/clients/create-pending-tasks', methods=['POST'])
+def create_pending_tasks_multi():
+    """
+    Igual que create-pending-tasks pero para varios clientes en una sola llamada
+    Body: {
+        "client_ids": [1, 2, 3],
+        "email": "destinatario@example.com",
+        "dias_antes_notificacion": 3,
+        "fecha_limite": "2026-01-30" (opcional)
+    }
+    """
+    data = request.json
+    client_ids = data.get('client_ids') or []
+    email = data.get('email', '')
+    dias_antes = data.get('dias_antes_notificacion', 3)
+    fecha_limite = data.get('fecha_limite', '')
+
+    if not email:
+        return jsonify({'error': 'Debe especificar un correo electrónico'}), 400
+    if not isinstance(client_ids, list) or not client_ids:
+        return jsonify({'error': 'Debe especificar una lista de clientes (client_ids)'}), 400
+
+    # Sin conversiones: true, "3" o 3.9 no son ids de cliente
+    if not all(type(cid) is int for cid in client_ids):
+        return jsonify({'error': 'client_ids debe contener solo números'}), 400
+    client_ids = list(dict.fromkeys(client_ids))
+
+    found_ids = {row['id'] for row in database.get_clientes_by_ids(client_ids)}
+    pending_tasks = database.get_pending_tasks_by_clients(client_ids)
+
+    fecha_hoy = datetime.now().strftime('%Y-%m-%d')
+    rows = []
+    per_client = {cid: 0 for cid in client_ids if cid in found_ids}
+    for task in pending_tasks:
+        rows.append(_pending_row(task, task['empresa'], task['client_id'], fecha_hoy, fecha_limite, email, dias_antes))
+        per_client[task['client_id']] += 1
+
+    created_count = database.add_pendientes_bulk(rows)
 
-@app.route('/<path:path>')
+    return jsonify({
+        'message': f'{created_count} tarea(s) agregada(s) a Pendientes',
+        'count': created_count,
+        'per_client': [{'client_id': cid, 'count': count} for cid, count in per_client.items()],
+        'not_found': [cid for cid in client_ids if cid not in found_ids]
+    }), 201
+
+def _pending_row(task, empresa, client_id, fecha_hoy, fecha_limite, email, dias_antes):
+    # Orden de columnas esperado por database.add_pendientes_bulk
+    return (
+        fecha_hoy,
+        task['description'],
+        f"Tarea del cliente: {empresa}",
+        empresa,
+        'Pendiente',
+        '',
+        fecha_limite,
+        email,
+        dias_antes,
+        client_id
+    )
+
+
+# --- API EXPORTACIÓN / IMPORTACIÓN ---
+
+@bp.route('/api/export/<table>', methods=['GET'])
+def export_table(table):
+    """
+    GET /api/export/{pendientes,clientes,client_tasks}?format=csv|xlsx|json
+    Acepta los mismos filtros que el listado correspondiente. La respuesta se genera
+    mientras se lee la base, sin armar el archivo completo en memoria.
+    """
+    fmt = request.args.get('format', 'csv').lower()
+    if fmt not in transfer.CONTENT_TYPES:
+        return jsonify({'error': 'Formato no soportado (csv, xlsx o json)'}), 400
+
+    if table == 'pendientes':
+        rows = database.export_pendientes(
+            estados=_split_param('estado'),
+            empresa=request.args.get('empresa') or None,
+            fecha_desde=request.args.get('fecha_desde') or None,
+            fecha_hasta=request.args.get('fecha_hasta') or None,
+            q=request.args.get('q') or None,
+            client_id=request.args.get('client_id', type=int),
+        )
+    elif table == 'clientes':
+        rows = database.export_clientes(
+            q=request.args.get('q') or None,
+            status=request.args.get('status') or None,
+        )
+    elif table == 'client_tasks':
+        rows = database.export_client_tasks(client_id=request.args.get('client_id', type=int))
+    else:
+        return jsonify({'error': 'Tabla desconocida'}), 404
+
+    columns = database.EXPORT_COLUMNS[table]
+    if fmt == 'xlsx':
+        body = transfer.xlsx_stream(columns, rows, sheet_name=table)
+    elif fmt == 'json':
+        body = transfer.json_stream(columns, rows)
+    else:
+        body = transfer.csv_stream(columns, rows)
+
+    response = current_app.response_class(body, mimetype=transfer.CONTENT_TYPES[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename={table}.{fmt}'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@bp.route('/api/import/<table>', methods=['POST'])
+def import_table(table):
+    """
+    POST /api/import/{pendientes,clientes,client_tasks}?dry_run=1  (multipart, campo "file")
+    Usa las mismas columnas que la exportación. Con dry_run solo valida y reporta.
+    """
+    if table not in transfer.IMPORT_SCHEMAS:
+        return jsonify({'error': 'Tabla desconocida'}), 404
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        return jsonify({'error': 'Falta el archivo (campo "file")'}), 400
+
+    dry_run = request.args.get('dry_run', '').lower() in ('1', 'true', 'si', 'sí')
+    fmt = request.args.get('format') or upload.filename.rsplit('.', 1)[-1].lower()
+    try:
+        if fmt == 'xlsx':
+            columns, records = transfer.read_xlsx(upload.stream)
+        elif fmt == 'csv':
+            columns, records = transfer.read_csv(upload.stream)
+        else:
+            return jsonify({'error': 'Formato no soportado (csv o xlsx)'}), 400
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({'error': f'No se pudo leer el archivo: {e}'}), 400
+
+    missing = transfer.missing_columns(table, columns)
+    if missing:
+        return jsonify({'error': f'Faltan columnas obligatorias: {", ".join(missing)}'}), 400
+
+    try:
+        report = transfer.import_rows(table, records, dry_run=dry_run)
+    except UnicodeDecodeError as e:
+        return jsonify({'error': f'El archivo no está en UTF-8: {e}'}), 400
+    return jsonify(report)
+
+
+# --- Rutas de Frontend (Producción) ---
+
+def _serve_frontend(path):
+    files = current_app.extensions['static_files']
+    asset = files.get(path) if path else None
+    # Para routing de cliente (SPA), todo lo que no es un archivo recibe index.html
+    asset = asset or files.index
+    if asset is None:
+        # En desarrollo lo ideal es usar el dev server de Vite para el frontend
+        return "Frontend no construido. Ejecuta 'npm run build' en la carpeta frontend y reinicia.", 404
+    return files.response(asset)
+
+@bp.route('/')
+def index():
+    return _serve_frontend('')
+
+@bp.route('/<path:path>')
 def serve_static(path):
     # Evitar devolver index.html para llamadas a la API que fallan (404 real)
     if path.startswith('api/'):
         return jsonify({'error': 'Not found'}), 404
-
-    # Sirve archivos estáticos generados por React
-    if path != "" and os.path.exists(os.path.join(app.static_folder, path)):
-        return send_from_directory(app.static_folder, path)
-    else:
-        # Para routing de cliente (SPA), siempre devolvemos index.html si no es un archivo
-        return send_from_directory(app.static_folder, 'index.html')
+    return _serve_frontend(path)
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5001, debug=True)
-
+    create_app().run(host='0.0.0.0', port=5001, debug=True)
@@ -0,0 +1,169 @@
+"""
+Modo de servicio asíncrono (ASGI) con el mismo contrato /api/* que app.py.
+
+Requiere: pip install starlette uvicorn a2wsgi (incluidos en requirements-serve.txt)
+
+    python asgi.py [--host 0.0.0.0] [--port 5001] [--threads 16]
+    uvicorn asgi:app --host 0.0.0.0 --port 5001          (equivalente)
+
+Un proceso con un solo event loop atiende todas las conexiones:
+
+- /api/events (SSE) corre en el loop: cada EventSource abierto es una corrutina con su
+  cola asyncio, sin hilo propio (events.LoopRelay). Miles de clientes conectados caben
+  en un proceso con memoria pareja.
+- Los GET marcados con @versioned (listados, /api/stats) que el cliente ya tiene (304)
+  o que están en la caché de respuestas se contestan en el loop, sin hilo ni SQLite.
+- El resto son las mismas vistas de Flask, ejecutadas por a2wsgi en un pool acotado de
+  hilos (--threads). SQLite no tiene E/S asíncrona (aiosqlite también corre cada conexión
+  en un hilo), así que las consultas siguen siendo las de database.py con su pool.
+
+Ninguna petición espera al servidor de correo: /api/notify y compañía encolan un
+trabajo (jobs.py) que envía con las sesiones SMTP persistentes de mailer.py.
+
+Igual que wsgi.py, CORS queda apagado salvo PENDIENTES_CORS=1; con CORS encendido todo
+pasa por Flask (que es quien agrega esos headers) y solo se gana el servidor asíncrono.
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import time
+
+os.environ.setdefault('PENDIENTES_CORS', '0')
+
+import anyio
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.datastructures import Headers
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Mount, Route
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import parse_etags
+
+import app as flask_app_module
+import database
+import events
+import metrics
+import static_files
+
+# Hilos para las vistas de Flask (cada uno toma a lo sumo una conexión del pool)
+WSGI_THREADS = int(os.environ.get('PENDIENTES_THREADS', '16'))
+
+
+class VersionedFastPath:
+    """
+    Delante de la app WSGI: resuelve en el loop los GET de rutas @versioned cuando la
+    respuesta sale de las versiones en memoria (304) o de response_cache; si hay que
+    consultar la base, pasa la petición a Flask, que además la deja en la caché.
+    """
+
+    def __init__(self, wsgi, flask_app):
+        self.wsgi = wsgi
+        self.views = flask_app.view_functions
+        self.urls = flask_app.url_map.bind('')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['method'] == 'GET':
+            response = self._cached(scope)
+            if response is not None:
+                await response(scope, receive, send)
+                return
+        await self.wsgi(scope, receive, send)
+
+    def _cached(self, scope):
+        start = time.perf_counter()
+        try:
+            rule, _ = self.urls.match(scope['path'], method='GET', return_rule=True)
+        except HTTPException:
+            return None
+        spec = getattr(self.views.get(rule.endpoint), 'versioned', None)
+        if spec is None:
+            return None
+
+        tables, daily = spec
+        key = flask_app_module.versioned_key(scope['path'], scope['query_string'])
+        if_none_match = parse_etags(Headers(scope=scope).get('if-none-match'))
+        # check=False: los cambios de otros procesos los revisa _watch_data_versions
+        etag, _, entry = flask_app_module.versioned_lookup(key, tables, daily, if_none_match, check=False)
+        if entry is None:
+            return None
+
+        if entry == 'not_modified':
+            response = Response(status_code=304)
+        else:
+            response = Response(entry['body'], media_type=entry['mimetype'])
+            for name, value in entry['headers']:
+                response.headers.append(name, value)
+        response.headers['ETag'] = f'"{etag}"'
+        response.headers['Cache-Control'] = 'no-cache'
+        metrics.http_request_seconds.observe(
+            time.perf_counter() - start, method='GET', route=rule.rule, status=response.status_code
+        )
+        return response
+
+
+async def events_stream(request):
+    """Mismo flujo que app.events_stream, sin ocupar un hilo por conexión."""
+    last_event_id = events.parse_last_event_id(
+        request.headers.get('last-event-id', request.query_params.get('lastEventId'))
+    )
+    return StreamingResponse(
+        events.astream(request.app.state.relay, last_event_id),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+async def _watch_data_versions():
+    # La revisión de cambios de otros procesos consulta SQLite: se hace en un hilo
+    while True:
+        await anyio.to_thread.run_sync(database.get_data_versions, ())
+        await asyncio.sleep(database.DATA_VERSION_RECHECK_SECONDS)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    relay = events.LoopRelay(asyncio.get_running_loop())
+    events.hub.subscribe(relay)
+    app.state.relay = relay
+    watcher = asyncio.create_task(_watch_data_versions())
+    try:
+        yield
+    finally:
+        watcher.cancel()
+        events.hub.unsubscribe(relay)
+
+
+def create_asgi_app(static_root=static_files.DIST_DIR, cors=None, threads=WSGI_THREADS):
+    flask_app = flask_app_module.create_app(static_root=static_root, cors=cors)
+    wsgi = WSGIMiddleware(flask_app, workers=threads)
+    if flask_app_module.CORS_ENABLED if cors is None else cors:
+        return wsgi
+    return Starlette(
+        routes=[
+            Route('/api/events', events_stream),
+            Mount('/', app=VersionedFastPath(wsgi, flask_app)),
+        ],
+        lifespan=lifespan,
+    )
+
+
+app = create_asgi_app()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor ASGI (uvicorn) para pendientes')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5001)
+    parser.add_argument('--threads', type=int, default=WSGI_THREADS)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    server_app = app if args.threads == WSGI_THREADS else create_asgi_app(threads=args.threads)
+    print(f'🚀 Sirviendo en http://{args.host}:{args.port} (uvicorn, {args.threads} hilos para Flask)')
+    uvicorn.run(server_app, host=args.host, port=args.port, log_level='warning', timeout_keep_alive=30)
+
+
+if __name__ == '__main__':
+    main()
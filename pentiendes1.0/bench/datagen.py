@@ -0,0 +1,159 @@
+"""
+Genera bases pendientes.db sintéticas para benchmarks.
+
+Tamaños predefinidos (clientes / tareas / pendientes):
+    1k    100 / 1.000 / 1.000
+    100k  2.000 / 100.000 / 100.000
+    1m    20.000 / 1.000.000 / 1.000.000
+
+skew controla la concentración: 0 reparte tareas y pendientes de forma uniforme entre
+clientes y destinatarios; valores mayores (1.0-1.5) dejan unos pocos clientes con la
+mayoría de las filas (distribución tipo Zipf), como pasa con los clientes grandes reales.
+
+Uso:
+    python bench/datagen.py --size 100k [--skew 1.1] [--seed 1] --out pendientes.db
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+SIZES = {
+    '1k': (100, 1_000, 1_000),
+    '100k': (2_000, 100_000, 100_000),
+    '1m': (20_000, 1_000_000, 1_000_000),
+}
+
+ESTADOS = ['Pendiente', 'En Progreso', 'Completado', 'Cancelado']
+ESTADO_WEIGHTS = [2, 1, 6, 1]
+OPEN_ESTADOS = ('Pendiente', 'En Progreso')
+CLIENT_ESTADOS = ['Pendiente', 'En Proceso', 'Finalizado']
+ACTIVIDADES = ['Declaración mensual', 'Revisión de balance', 'Pago de impuestos', 'Actualizar tablas',
+               'Renovar certificado', 'Cierre contable', 'Conciliación bancaria', 'Reunión con cliente']
+N_EMAILS = 50
+
+# Filas por executemany (acota la memoria con 1M filas)
+BATCH_ROWS = 50_000
+
+
+def _cum_weights(n, skew):
+    weights = [1.0 / (i + 1) ** skew for i in range(n)] if skew else [1.0] * n
+    return list(itertools.accumulate(weights))
+
+
+def _batches(rows):
+    iterator = iter(rows)
+    while True:
+        batch = list(itertools.islice(iterator, BATCH_ROWS))
+        if not batch:
+            return
+        yield batch
+
+
+def populate(conn, n_clients, n_tasks, n_pendientes, skew=0.0, seed=1, today=None):
+    """Inserta clientes, tareas y pendientes. Solo usa columnas del esquema base (v1)."""
+    rnd = random.Random(seed)
+    today = today or date.today()
+    clients = _cum_weights(n_clients, skew)
+    emails = _cum_weights(N_EMAILS, skew)
+
+    def pick(cum):
+        return rnd.choices(range(len(cum)), cum_weights=cum)[0]
+
+    conn.executemany(
+        'INSERT INTO clientes (empresa, observaciones, estado) VALUES (?, ?, ?)',
+        ((f'Empresa {i:05d}', '', rnd.choice(CLIENT_ESTADOS)) for i in range(n_clients))
+    )
+
+    tasks = (
+        (pick(clients) + 1, f'{rnd.choice(ACTIVIDADES)} {i}', int(rnd.random() < 0.6),
+         (today - timedelta(days=rnd.randint(0, 720))).isoformat())
+        for i in range(n_tasks)
+    )
+    for batch in _batches(tasks):
+        conn.executemany(
+            'INSERT INTO client_tasks (client_id, description, completed, created_at) VALUES (?, ?, ?, ?)', batch
+        )
+
+    def pendiente(i):
+        estado = rnd.choices(ESTADOS, weights=ESTADO_WEIGHTS)[0]
+        # Los abiertos vencen cerca de hoy (así hay avisos que enviar); los cerrados son historial
+        days = rnd.randint(-30, 60) if estado in OPEN_ESTADOS else rnd.randint(-720, 0)
+        return (today.isoformat(), f'{rnd.choice(ACTIVIDADES)} {i}', f'Detalle del pendiente {i}',
+                f'Empresa {pick(clients):05d}', estado, '', (today + timedelta(days=days)).isoformat(),
+                f'operador{pick(emails):02d}@example.com', rnd.randint(1, 7))
+
+    pendientes = (pendiente(i) for i in range(n_pendientes))
+    for batch in _batches(pendientes):
+        conn.executemany(
+            '''INSERT INTO pendientes (fecha, actividad, descripcion, empresa, estado, observaciones,
+                                       fecha_limite, email_notificacion, dias_antes_notificacion)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''', batch
+        )
+    conn.commit()
+
+
+def generate(path, size='100k', skew=0.0, seed=1):
+    """
+    Crea la base en 'path' con el esquema al día. Carga los datos sobre el esquema v1 y
+    después aplica las migraciones (índices, contadores y FTS se llenan de una vez, más
+    rápido que disparar los triggers fila por fila). Retorna un resumen con los tiempos.
+    """
+    n_clients, n_tasks, n_pendientes = SIZES[size]
+    if os.path.exists(path):
+        os.remove(path)
+
+    previous = database.DB_NAME
+    database.reset_pool()
+    database.DB_NAME = path
+    try:
+        with database.connection() as conn:
+            database.migrate(conn, target_version=1)
+            start = time.perf_counter()
+            populate(conn, n_clients, n_tasks, n_pendientes, skew=skew, seed=seed)
+            populate_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            database.migrate(conn)
+            migrate_time = time.perf_counter() - start
+            conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    finally:
+        database.reset_pool()
+        database.DB_NAME = previous
+
+    return {
+        'size': size,
+        'skew': skew,
+        'seed': seed,
+        'clientes': n_clients,
+        'client_tasks': n_tasks,
+        'pendientes': n_pendientes,
+        'populate_seconds': round(populate_time, 3),
+        'migrate_seconds': round(migrate_time, 3),
+        'bytes': os.path.getsize(path),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size', choices=SIZES, default='100k')
+    parser.add_argument('--skew', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', default='pendientes.db')
+    args = parser.parse_args()
+
+    info = generate(args.out, args.size, args.skew, args.seed)
+    print(f"{args.out}: {info['clientes']} clientes, {info['client_tasks']} tareas, "
+          f"{info['pendientes']} pendientes ({info['bytes'] / 1e6:.1f} MB) en "
+          f"{info['populate_seconds'] + info['migrate_seconds']:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,365 @@
+"""
+Comparación de carga HTTP real entre los modos de servicio: waitress (wsgi.py), gevent
+(serve_gevent.py) y ASGI (asgi.py).
+
+Para cada servidor, sobre su propia copia del dataset de run.py:
+1. Arranca el servidor en un subproceso y mide su memoria (RSS) y cantidad de hilos.
+2. Abre --idle conexiones /api/events (EventSource inactivos) y vuelve a medir.
+3. Con esas conexiones abiertas, --concurrency clientes keep-alive piden una mezcla de
+   lecturas durante --duration segundos, revalidando con If-None-Match como el navegador.
+4. Hace una escritura y mide cuánto tarda el aviso en llegar a cada EventSource.
+
+Uso:
+    python bench/http_load.py [--size 1k|100k|1m] [--servers waitress,gevent,asgi]
+                              [--idle 1000] [--concurrency 32] [--duration 10]
+                              [--threads 16] [--out archivo.json]
+
+Un servidor cuyo paquete no esté instalado se informa y se omite. La memoria y los hilos
+se leen de /proc (solo Linux).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import datagen
+from run import dataset_context, git_revision, prepare_database, summarize
+
+SERVERS = {
+    'waitress': ['wsgi.py', '--threads', '{threads}'],
+    'gevent': ['serve_gevent.py'],
+    'asgi': ['asgi.py', '--threads', '{threads}'],
+}
+# Segundos máximos de espera por una respuesta antes de contarla como error
+REQUEST_TIMEOUT = 5.0
+STARTUP_TIMEOUT = 60.0
+# Conexiones SSE abiertas a la vez mientras se arma el grupo inactivo
+CONNECT_BATCH = 100
+
+
+# --- CLIENTE HTTP MÍNIMO (keep-alive, sin dependencias) ---
+
+class HTTPConnection:
+    def __init__(self, port):
+        self.port = port
+        self.reader = self.writer = None
+
+    async def open(self):
+        self.reader, self.writer = await asyncio.open_connection('127.0.0.1', self.port)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+    async def send(self, method, path, headers=None, body=b''):
+        if self.writer is None:
+            await self.open()
+        lines = [f'{method} {path} HTTP/1.1', 'Host: 127.0.0.1']
+        lines += [f'{name}: {value}' for name, value in (headers or {}).items()]
+        if body:
+            lines += ['Content-Type: application/json', f'Content-Length: {len(body)}']
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await self.writer.drain()
+
+    async def read_head(self):
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError('conexión cerrada por el servidor')
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        return status, headers
+
+    async def read_body(self, headers):
+        if 'content-length' in headers:
+            return await self.reader.readexactly(int(headers['content-length']))
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                chunk = await self.reader.readexactly(size + 2)
+                if size == 0:
+                    return b''.join(chunks)
+                chunks.append(chunk[:-2])
+        return b''
+
+    async def request(self, method, path, headers=None, body=b''):
+        await self.send(method, path, headers, body)
+        status, response_headers = await self.read_head()
+        data = b'' if status in (204, 304) else await self.read_body(response_headers)
+        if response_headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status, response_headers, data
+
+
+# --- SERVIDOR ---
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def process_stats(pid):
+    """RSS (MB) e hilos del proceso según /proc, o None fuera de Linux."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line)
+    except OSError:
+        return None
+    return {
+        'rss_mb': round(int(fields['VmRSS'].split()[0]) / 1024, 1),
+        'threads': int(fields['Threads']),
+    }
+
+
+def start_server(name, workdir, port, threads):
+    script, *extra = SERVERS[name]
+    command = [sys.executable, os.path.join(ROOT, script), '--host', '127.0.0.1', '--port', str(port)]
+    command += [arg.format(threads=threads) for arg in extra]
+    log = open(os.path.join(workdir, f'{name}.log'), 'w')
+    # cwd = carpeta de la copia: database.DB_NAME es relativo
+    proc = subprocess.Popen(command, cwd=workdir, stdout=log, stderr=subprocess.STDOUT)
+
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            log.close()
+            with open(log.name) as f:
+                raise RuntimeError(f.read().strip().splitlines()[-1])
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return proc, log
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError('el servidor no arrancó a tiempo')
+
+
+def stop_server(proc, log):
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+    log.close()
+
+
+# --- ESCENARIOS ---
+
+async def open_event_streams(port, count):
+    """Abre 'count' conexiones /api/events; retorna (abiertas, sin respuesta a tiempo)."""
+    opened, stalled = [], 0
+
+    async def one():
+        nonlocal stalled
+        conn = HTTPConnection(port)
+        try:
+            await conn.send('GET', '/api/events', {'Accept': 'text/event-stream'})
+            status, _ = await asyncio.wait_for(conn.read_head(), REQUEST_TIMEOUT)
+            if status == 200:
+                opened.append(conn)
+                return
+        except (OSError, asyncio.TimeoutError, ConnectionError, ValueError):
+            pass
+        stalled += 1
+        conn.close()
+
+    for start in range(0, count, CONNECT_BATCH):
+        await asyncio.gather(*(one() for _ in range(min(CONNECT_BATCH, count - start))))
+    return opened, stalled
+
+
+async def run_load(port, ctx, concurrency, duration, seed):
+    read_mix = [
+        lambda r: '/api/pendientes?limit=200&fields=id,actividad,empresa,estado,fecha_limite',
+        lambda r: '/api/pendientes?estado=Pendiente&limit=50',
+        lambda r: '/api/clientes',
+        lambda r: '/api/stats',
+        lambda r: f"/api/clients/{r.randint(1, ctx['counts']['clientes'])}/tasks",
+        lambda r: f"/api/pendientes/{r.randint(1, ctx['max_pendiente'])}",
+        lambda r: f'/api/search?q=cierre {r.randint(0, 99)}',
+    ]
+    deadline = time.perf_counter() + duration
+    samples, statuses = [], {}
+    errors = 0
+
+    async def worker(n):
+        nonlocal errors
+        rnd = random.Random(seed * 1000 + n)
+        conn = HTTPConnection(port)
+        etags = {}
+        while time.perf_counter() < deadline:
+            path = rnd.choice(read_mix)(rnd).replace(' ', '%20')
+            headers = {'If-None-Match': etags[path]} if path in etags else {}
+            start = time.perf_counter()
+            try:
+                status, response_headers, _ = await asyncio.wait_for(conn.request('GET', path, headers), REQUEST_TIMEOUT)
+            except (OSError, asyncio.TimeoutError, ConnectionError, ValueError, asyncio.IncompleteReadError):
+                errors += 1
+                conn.close()
+                continue
+            samples.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+            if 'etag' in response_headers:
+                etags[path] = response_headers['etag']
+        conn.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        'concurrency': concurrency,
+        'duration_s': round(elapsed, 3),
+        'requests': len(samples),
+        'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        'errors': errors,
+        'statuses': {str(k): v for k, v in sorted(statuses.items())},
+        'latency': summarize(samples),
+    }
+
+
+async def measure_fanout(port, streams):
+    """Tiempo desde una escritura hasta que cada EventSource abierto recibe el aviso."""
+    if not streams:
+        return {'streams': 0}
+    delays = []
+
+    async def wait_change(conn, start):
+        while True:
+            line = await conn.reader.readline()
+            if not line:
+                return
+            if line.startswith(b'event: change'):
+                delays.append(time.perf_counter() - start)
+                return
+
+    writer = HTTPConnection(port)
+    start = time.perf_counter()
+    try:
+        status, _, _ = await asyncio.wait_for(
+            writer.request('POST', '/api/clientes', body=b'{"empresa": "Bench SSE"}'), REQUEST_TIMEOUT
+        )
+    except (OSError, asyncio.TimeoutError, ConnectionError):
+        return {'streams': len(streams), 'delivered': 0, 'write_status': None}
+    finally:
+        writer.close()
+    waiters = [asyncio.ensure_future(wait_change(conn, start)) for conn in streams]
+    await asyncio.wait(waiters, timeout=REQUEST_TIMEOUT * 2)
+    for waiter in waiters:
+        waiter.cancel()
+    return {'streams': len(streams), 'delivered': len(delays), 'write_status': status, 'delay': summarize(delays)}
+
+
+async def bench_server(port, pid, ctx, args):
+    result = {'idle_requested': args.idle}
+    result['process_start'] = process_stats(pid)
+
+    start = time.perf_counter()
+    streams, stalled = await open_event_streams(port, args.idle)
+    result['idle_open'] = len(streams)
+    result['idle_stalled'] = stalled
+    result['idle_connect_s'] = round(time.perf_counter() - start, 3)
+    result['process_idle'] = process_stats(pid)
+    print(f'  {len(streams)}/{args.idle} EventSource abiertos ({stalled} sin respuesta), '
+          f"proceso {result['process_idle']}")
+
+    result['load'] = await run_load(port, ctx, args.concurrency, args.duration, args.seed)
+    result['process_load'] = process_stats(pid)
+    load = result['load']
+    print(f"  {load['throughput_rps']} req/s, p50 {load['latency'].get('p50_ms')} ms, "
+          f"p99 {load['latency'].get('p99_ms')} ms, errores {load['errors']}")
+
+    result['fanout'] = await measure_fanout(port, streams)
+    fanout = result['fanout']
+    if streams:
+        print(f"  aviso SSE: {fanout['delivered']}/{fanout['streams']} en p95 {fanout.get('delay', {}).get('p95_ms')} ms")
+    for conn in streams:
+        conn.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size', choices=datagen.SIZES, default='100k')
+    parser.add_argument('--skew', type=float, default=1.1)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--servers', default=','.join(SERVERS))
+    parser.add_argument('--idle', type=int, default=1000, help='conexiones /api/events inactivas')
+    parser.add_argument('--concurrency', type=int, default=32, help='clientes keep-alive de la carga')
+    parser.add_argument('--duration', type=float, default=10.0, help='segundos de carga')
+    parser.add_argument('--threads', type=int, default=16, help='hilos de waitress / de Flask en asgi')
+    parser.add_argument('--data-dir', default=os.path.join(BENCH_DIR, 'data'))
+    parser.add_argument('--regenerate', action='store_true')
+    parser.add_argument('--out')
+    args = parser.parse_args()
+
+    result = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_revision': git_revision(),
+            'python': sys.version.split()[0],
+            'args': vars(args),
+        },
+        'servers': {},
+    }
+
+    for name in [s.strip() for s in args.servers.split(',') if s.strip()]:
+        print(f'\n{name}:')
+        with tempfile.TemporaryDirectory() as workdir:
+            path, _ = prepare_database(args, workdir)
+            # El dataset ya existe después del primer servidor
+            args.regenerate = False
+            ctx = dataset_context(path)
+
+            port = free_port()
+            try:
+                proc, log = start_server(name, workdir, port, args.threads)
+            except RuntimeError as e:
+                print(f'  omitido: {e}')
+                result['servers'][name] = {'error': str(e)}
+                continue
+            try:
+                result['servers'][name] = asyncio.run(bench_server(port, proc.pid, ctx, args))
+            finally:
+                stop_server(proc, log)
+
+    print(f"\n{'servidor':<10} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errores':>8} "
+          f"{'SSE':>11} {'RSS MB':>8} {'hilos':>6}")
+    for name, server in result['servers'].items():
+        if 'error' in server:
+            continue
+        load, idle = server['load'], server['process_idle'] or {}
+        print(f"{name:<10} {load['throughput_rps']:>9} {load['latency'].get('p50_ms', '-'):>8} "
+              f"{load['latency'].get('p99_ms', '-'):>8} {load['errors']:>8} "
+              f"{server['idle_open']:>5}/{server['idle_requested']:<5} {idle.get('rss_mb', '-'):>8} "
+              f"{idle.get('threads', '-'):>6}")
+
+    out = args.out or os.path.join(
+        BENCH_DIR, 'results', f"http-{args.size}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    print(f'\nResultados: {out}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Compara los planes de consulta y tiempos antes y después de los índices.
+
+Crea una base temporal con ~100k tareas de clientes y ~100k pendientes,
+la deja en la versión 1 del esquema (sin índices), mide, aplica el resto
+de migraciones y vuelve a medir.
+
+Uso:
+    python bench/query_plans.py [--tasks 100000] [--clients 2000] [--pendientes 100000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from datagen import populate
+
+QUERIES = {
+    'get_clientes': ('''
+        SELECT c.*,
+               GROUP_CONCAT(ct.description, '|||') as task_list,
+               COUNT(ct.id) as total_tasks,
+               SUM(CASE WHEN ct.completed = 1 THEN 1 ELSE 0 END) as completed_tasks
+        FROM clientes c
+        LEFT JOIN client_tasks ct ON c.id = ct.client_id
+        GROUP BY c.id
+        ORDER BY c.empresa ASC
+    ''', ()),
+    'get_client_tasks': (
+        'SELECT * FROM client_tasks WHERE client_id = ? ORDER BY id DESC', (42,)
+    ),
+    'get_pending_tasks_by_client': ('''
+        SELECT id, description, created_at, completed
+        FROM client_tasks
+        WHERE client_id = ? AND completed = 0
+        ORDER BY created_at DESC
+    ''', (42,)),
+    'check_deadlines_and_notify': ('''
+        SELECT * FROM pendientes
+        WHERE estado = 'Pendiente' AND fecha_limite BETWEEN ? AND ?
+    ''', ((date.today() - timedelta(days=1)).isoformat(),
+          (date.today() + timedelta(days=30)).isoformat())),
+    'get_pendientes': (
+        'SELECT * FROM pendientes ORDER BY fecha_limite ASC', ()
+    ),
+}
+
+def measure(conn, repeat=3):
+    results = {}
+    for name, (sql, params) in QUERIES.items():
+        plan = [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = (plan, best)
+    return results
+
+
+def report(title, results):
+    print(f'\n=== {title} ===')
+    for name, (plan, elapsed) in results.items():
+        print(f'\n{name}: {elapsed * 1000:.2f} ms')
+        for line in plan:
+            print(f'    {line}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tasks', type=int, default=100_000)
+    parser.add_argument('--clients', type=int, default=2_000)
+    parser.add_argument('--pendientes', type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_NAME = os.path.join(tmp, 'bench.db')
+        with database.connection() as conn:
+            database.migrate(conn, target_version=1)
+            populate(conn, args.clients, args.tasks, args.pendientes)
+            before = measure(conn)
+
+            start = time.perf_counter()
+            database.migrate(conn)
+            migrate_time = time.perf_counter() - start
+            after = measure(conn)
+
+            start = time.perf_counter()
+            database.init_db()
+            noop_time = time.perf_counter() - start
+        database.reset_pool()
+
+    report('Antes (esquema v1, sin índices)', before)
+    report(f'Después (esquema v{database.SCHEMA_VERSION})', after)
+    print(f'\nCreación de índices: {migrate_time * 1000:.1f} ms')
+    print(f'init_db() con el esquema al día: {noop_time * 1000:.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,504 @@
+"""
+Suite de benchmarks reproducible de la API y las notificaciones.
+
+1. Genera (o reutiliza de bench/data/) una base sintética con datagen.py.
+2. Recorre todas las rutas /api/* de app.py con el test client de Flask y mide cada una.
+3. Carga concurrente: N hilos con una mezcla de lecturas (y escrituras opcionales).
+4. Mide notifications.check_deadlines_and_notify() (modo item y digest) contra un
+   servidor SMTP local de prueba (smtp_stub.py).
+5. Guarda todo en JSON (bench/results/) y, con --compare, lo contrasta con otra corrida.
+
+Uso:
+    python bench/run.py [--size 1k|100k|1m] [--skew 1.1] [--seed 1] [--repeat 20]
+                        [--concurrency 8] [--duration 10] [--write-ratio 0.05]
+                        [--smtp-latency 0] [--out archivo.json] [--compare anterior.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+
+import database
+import datagen
+from smtp_stub import StubSMTPServer
+
+# Diferencia relativa en p50 / throughput que se marca como regresión en --compare
+REGRESSION_THRESHOLD = 0.20
+# Diferencias de latencia menores a esto (ms) se consideran ruido aunque superen el umbral
+MIN_DELTA_MS = 0.5
+# Segundos máximos esperando que la cola de trabajos quede vacía
+JOBS_TIMEOUT = 300
+
+
+def summarize(samples):
+    """Estadísticas en milisegundos de una lista de duraciones en segundos."""
+    if not samples:
+        return {'n': 0}
+    ordered = sorted(samples)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] * 1000
+
+    return {
+        'n': len(ordered),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3),
+        'p50_ms': round(pct(50), 3),
+        'p95_ms': round(pct(95), 3),
+        'p99_ms': round(pct(99), 3),
+        'min_ms': round(ordered[0] * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+    }
+
+
+def next_weekday(day):
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    return day
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+# --- DATOS ---
+
+def prepare_database(args, workdir):
+    """Copia (o genera y guarda) el dataset; cada corrida trabaja sobre su propia copia."""
+    os.makedirs(args.data_dir, exist_ok=True)
+    cached = os.path.join(args.data_dir, f'{args.size}-skew{args.skew:g}-seed{args.seed}.db')
+    info = None
+    if not os.path.exists(cached) or args.regenerate:
+        print(f'Generando dataset {args.size} (skew {args.skew:g})...')
+        info = datagen.generate(cached, args.size, args.skew, args.seed)
+        with open(cached + '.json', 'w') as f:
+            json.dump(info, f)
+    elif os.path.exists(cached + '.json'):
+        with open(cached + '.json') as f:
+            info = json.load(f)
+
+    path = os.path.join(workdir, 'pendientes.db')
+    shutil.copyfile(cached, path)
+    return path, info
+
+
+def dataset_context(path):
+    """Ids de referencia para los escenarios."""
+    conn = sqlite3.connect(path)
+    try:
+        max_pendiente = conn.execute('SELECT MAX(id) FROM pendientes').fetchone()[0]
+        max_task = conn.execute('SELECT MAX(id) FROM client_tasks').fetchone()[0]
+        by_size = conn.execute(
+            'SELECT client_id FROM client_task_stats WHERE total_tasks > completed_tasks ORDER BY total_tasks DESC'
+        ).fetchall()
+        counts = {t: conn.execute(f'SELECT COUNT(*) FROM {t}').fetchone()[0]
+                  for t in ('clientes', 'client_tasks', 'pendientes')}
+    finally:
+        conn.close()
+    return {
+        'max_pendiente': max_pendiente,
+        'max_task': max_task,
+        # Cliente más grande (lecturas) y uno mediano (escrituras que copian sus tareas)
+        'big_client': by_size[0][0],
+        'client': by_size[len(by_size) // 2][0],
+        'counts': counts,
+        'new_pendientes': [],
+        'new_clientes': [],
+        'new_tasks': [],
+        'job_id': None,
+    }
+
+
+# --- ESCENARIOS POR RUTA ---
+
+def _pendiente_body(i):
+    return {
+        'fecha': date.today().isoformat(), 'actividad': f'Bench {i}', 'descripcion': 'bench',
+        'empresa': 'Empresa 00001', 'estado': 'Pendiente', 'observaciones': '',
+        'fecha_limite': (date.today() + timedelta(days=3)).isoformat(),
+        'email_notificacion': 'bench@example.com', 'dias_antes_notificacion': 3,
+    }
+
+
+def _import_csv(rows):
+    lines = ['empresa,observaciones,estado'] + [f'Importada {i},bench,Pendiente' for i in range(rows)]
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def _first_event(client):
+    response = client.get('/api/events', buffered=False)
+    next(iter(response.response))
+    response.close()
+    return response
+
+
+def route_scenarios(ctx):
+    """
+    (nombre, regla de app.url_map, función(client, i) -> response).
+    Orden: lecturas, escrituras (cada DELETE borra lo creado por su POST) y al final
+    los endpoints que encolan trabajos.
+    """
+    c = ctx
+    pid = lambda i: 1 + (i * 7919) % c['max_pendiente']
+    tid = lambda i: 1 + (i * 7919) % c['max_task']
+    csv_body = _import_csv(1000)
+
+    def created(key, i):
+        return c[key][i % len(c[key])]
+
+    def post_pendiente(client, i):
+        r = client.post('/api/pendientes', json=_pendiente_body(i))
+        c['new_pendientes'].append(r.get_json()['item']['id'])
+        return r
+
+    def post_cliente(client, i):
+        r = client.post('/api/clientes', json={'empresa': f'Bench {i}', 'observaciones': ''})
+        c['new_clientes'].append(r.get_json()['item']['id'])
+        return r
+
+    def post_task(client, i):
+        r = client.post(f"/api/clients/{c['client']}/tasks", json={'description': f'Bench {i}'})
+        c['new_tasks'].append(r.get_json()['item']['id'])
+        return r
+
+    def notify(client, i):
+        r = client.post(f'/api/notify/{pid(i)}')
+        c['job_id'] = r.get_json().get('job_id') or c['job_id']
+        return r
+
+    return [
+        # Lecturas
+        ('GET /api/pendientes (página)', '/api/pendientes',
+         lambda cl, i: cl.get('/api/pendientes?limit=200&fields=id,actividad,empresa,estado,fecha_limite')),
+        ('GET /api/pendientes (filtro)', '/api/pendientes',
+         lambda cl, i: cl.get('/api/pendientes?estado=Pendiente&limit=100')),
+        ('GET /api/pendientes (completo)', '/api/pendientes', lambda cl, i: cl.get('/api/pendientes')),
+        ('GET /api/pendientes (since)', '/api/pendientes', lambda cl, i: cl.get('/api/pendientes?since=0&limit=1')),
+        ('GET /api/pendientes/<id>', '/api/pendientes/<int:id>', lambda cl, i: cl.get(f'/api/pendientes/{pid(i)}')),
+        ('GET /api/clientes', '/api/clientes', lambda cl, i: cl.get('/api/clientes')),
+        ('GET /api/clientes (q)', '/api/clientes', lambda cl, i: cl.get(f'/api/clientes?q=Empresa 0{i % 10}')),
+        ('GET /api/clients/<id>/tasks', '/api/clients/<int:client_id>/tasks',
+         lambda cl, i: cl.get(f"/api/clients/{c['big_client']}/tasks")),
+        ('GET /api/clients/<id>/pendientes', '/api/clients/<int:client_id>/pendientes',
+         lambda cl, i: cl.get(f"/api/clients/{c['big_client']}/pendientes?estado=Pendiente,En Progreso&limit=100")),
+        ('GET /api/search', '/api/search', lambda cl, i: cl.get(f'/api/search?q=revision {i % 50}')),
+        ('GET /api/stats', '/api/stats', lambda cl, i: cl.get('/api/stats')),
+        ('GET /api/export/pendientes (csv)', '/api/export/<table>',
+         lambda cl, i: cl.get('/api/export/pendientes?format=csv&estado=Pendiente')),
+        ('GET /api/export/clientes (xlsx)', '/api/export/<table>', lambda cl, i: cl.get('/api/export/clientes?format=xlsx')),
+        ('GET /api/export/client_tasks (json)', '/api/export/<table>',
+         lambda cl, i: cl.get('/api/export/client_tasks?format=json')),
+        ('GET /api/events (primer byte)', '/api/events', lambda cl, i: _first_event(cl)),
+        ('GET /api/events/stats', '/api/events/stats', lambda cl, i: cl.get('/api/events/stats')),
+        ('GET /api/db/pool', '/api/db/pool', lambda cl, i: cl.get('/api/db/pool')),
+        ('GET /api/cache', '/api/cache', lambda cl, i: cl.get('/api/cache')),
+        ('GET /metrics', '/metrics', lambda cl, i: cl.get('/metrics')),
+        # Escrituras
+        ('POST /api/pendientes', '/api/pendientes', post_pendiente),
+        ('PUT /api/pendientes/<id>', '/api/pendientes/<int:id>',
+         lambda cl, i: cl.put(f"/api/pendientes/{created('new_pendientes', i)}", json=_pendiente_body(i))),
+        ('DELETE /api/pendientes/<id>', '/api/pendientes/<int:id>',
+         lambda cl, i: cl.delete(f"/api/pendientes/{c['new_pendientes'].pop()}")),
+        ('POST /api/clientes', '/api/clientes', post_cliente),
+        ('PUT /api/clientes/<id>', '/api/clientes/<int:id>',
+         lambda cl, i: cl.put(f"/api/clientes/{created('new_clientes', i)}",
+                              json={'empresa': f'Bench {i}', 'observaciones': 'x', 'check_estado': 0,
+                                    'procedimiento': '', 'estado': 'Pendiente'})),
+        ('DELETE /api/clientes/<id>', '/api/clientes/<int:id>',
+         lambda cl, i: cl.delete(f"/api/clientes/{c['new_clientes'].pop()}")),
+        ('POST /api/clients/<id>/tasks', '/api/clients/<int:client_id>/tasks', post_task),
+        ('POST /api/clients/<id>/tasks/bulk', '/api/clients/<int:client_id>/tasks/bulk',
+         lambda cl, i: cl.post(f"/api/clients/{c['client']}/tasks/bulk", json={'tasks': [f'Bulk {i}-{k}' for k in range(20)]})),
+        ('PUT /api/tasks/<id>', '/api/tasks/<int:id>',
+         lambda cl, i: cl.put(f'/api/tasks/{tid(i)}', json={'completed': i % 2 == 0})),
+        ('PATCH /api/tasks', '/api/tasks',
+         lambda cl, i: cl.patch('/api/tasks', json={'operations': [
+             {'op': 'complete' if i % 2 else 'uncomplete', 'id': tid(i * 50 + k)} for k in range(50)]})),
+        ('DELETE /api/tasks/<id>', '/api/tasks/<int:id>',
+         lambda cl, i: cl.delete(f"/api/tasks/{c['new_tasks'].pop()}")),
+        ('POST /api/tasks/global', '/api/tasks/global',
+         lambda cl, i: cl.post('/api/tasks/global', json={'description': 'Bench global'})),
+        ('POST /api/clients/<id>/create-pending-tasks', '/api/clients/<int:client_id>/create-pending-tasks',
+         lambda cl, i: cl.post(f"/api/clients/{c['client']}/create-pending-tasks",
+                               json={'email': 'bench@example.com', 'dias_antes_notificacion': 3})),
+        ('POST /api/clients/create-pending-tasks', '/api/clients/create-pending-tasks',
+         lambda cl, i: cl.post('/api/clients/create-pending-tasks',
+                               json={'client_ids': [c['client']], 'email': 'bench@example.com'})),
+        ('POST /api/import/clientes (dry run)', '/api/import/<table>',
+         lambda cl, i: cl.post('/api/import/clientes?dry_run=1', data={'file': (io.BytesIO(csv_body), 'c.csv')})),
+        # Trabajos en segundo plano (solo se mide el encolado)
+        ('POST /api/notify/<id>', '/api/notify/<int:id>', notify),
+        ('GET /api/jobs/<id>', '/api/jobs/<int:job_id>', lambda cl, i: cl.get(f"/api/jobs/{c['job_id']}")),
+        ('POST /api/clients/<id>/notify-pending-tasks', '/api/clients/<int:client_id>/notify-pending-tasks',
+         lambda cl, i: cl.post(f"/api/clients/{c['client']}/notify-pending-tasks", json={'emails': ['bench@example.com']})),
+        ('POST /api/notify/deadlines', '/api/notify/deadlines', lambda cl, i: cl.post('/api/notify/deadlines', json={})),
+    ]
+
+
+def run_routes(app, ctx, repeat, heavy_repeat):
+    client = app.test_client()
+    results = {}
+    covered = set()
+    for name, rule, fn in route_scenarios(ctx):
+        covered.add(rule)
+        # Las rutas que devuelven o recorren tablas completas se repiten menos
+        times = heavy_repeat if '(completo)' in name or '/export/' in name or 'global' in name else repeat
+        samples = []
+        statuses = {}
+        size = 0
+        for i in range(times):
+            start = time.perf_counter()
+            response = fn(client, i)
+            # El stream de eventos no termina: ya se midió hasta el primer fragmento
+            body = b'' if rule == '/api/events' else response.get_data()
+            samples.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            size = len(body)
+        results[name] = {**summarize(samples), 'status': statuses, 'bytes': size}
+        print(f"  {name:<48} p50 {results[name]['p50_ms']:>9.2f} ms  p95 {results[name]['p95_ms']:>9.2f} ms  {statuses}")
+
+    api_rules = {r.rule for r in app.url_map.iter_rules() if r.rule.startswith('/api/') or r.rule == '/metrics'}
+    return results, sorted(api_rules - covered)
+
+
+def wait_for_jobs(path):
+    conn = sqlite3.connect(path)
+    deadline = time.monotonic() + JOBS_TIMEOUT
+    try:
+        while time.monotonic() < deadline:
+            pending = conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')").fetchone()[0]
+            if not pending:
+                return True
+            time.sleep(0.2)
+    finally:
+        conn.close()
+    return False
+
+
+# --- CARGA CONCURRENTE ---
+
+def run_load(app, ctx, concurrency, duration, write_ratio, seed):
+    read_mix = [
+        lambda r: '/api/pendientes?limit=200&fields=id,actividad,empresa,estado,fecha_limite',
+        lambda r: '/api/pendientes?estado=Pendiente&limit=50',
+        lambda r: '/api/clientes?status=Pendiente',
+        lambda r: f"/api/clients/{r.randint(1, ctx['counts']['clientes'])}/tasks",
+        lambda r: f"/api/pendientes/{r.randint(1, ctx['max_pendiente'])}",
+        lambda r: f'/api/search?q=cierre {r.randint(0, 99)}',
+    ]
+    deadline = time.perf_counter() + duration
+
+    def worker(n):
+        rnd = random.Random(seed * 1000 + n)
+        client = app.test_client()
+        reads, writes, errors = [], [], 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            if rnd.random() < write_ratio:
+                response = client.put(f"/api/tasks/{rnd.randint(1, ctx['max_task'])}",
+                                      json={'completed': rnd.random() < 0.5})
+                bucket = writes
+            else:
+                response = client.get(rnd.choice(read_mix)(rnd))
+                bucket = reads
+            response.get_data()
+            bucket.append(time.perf_counter() - start)
+            if response.status_code >= 500:
+                errors += 1
+        return reads, writes, errors
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    reads = [s for r, _, _ in outcomes for s in r]
+    writes = [s for _, w, _ in outcomes for s in w]
+    total = len(reads) + len(writes)
+    return {
+        'concurrency': concurrency,
+        'duration_s': round(elapsed, 3),
+        'requests': total,
+        'throughput_rps': round(total / elapsed, 2) if elapsed else 0.0,
+        'errors': sum(e for _, _, e in outcomes),
+        'reads': summarize(reads),
+        'writes': summarize(writes),
+    }
+
+
+# --- NOTIFICACIONES ---
+
+def use_stub_smtp(smtp):
+    """Apunta notifications (y los trabajos que lo usan) al servidor de prueba."""
+    import notifications
+    notifications.SMTP_SERVER, notifications.SMTP_PORT = smtp.address
+    notifications.SMTP_STARTTLS = False
+    notifications.SENDER_PASSWORD = None
+    notifications.NOTIFICATION_BACKOFF = 0
+
+
+def run_notifications(smtp):
+    import notifications
+
+    today = next_weekday(date.today())
+    results = {}
+    for mode in ('item', 'digest'):
+        with database.connection() as conn:
+            conn.execute('DELETE FROM notification_log')
+            conn.commit()
+        smtp.reset_counters()
+        start = time.perf_counter()
+        # Los print por correo distorsionan la medición con miles de envíos
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            report = notifications.check_deadlines_and_notify(mode, today=today) or {}
+        elapsed = time.perf_counter() - start
+        results[mode] = {
+            'today': today.isoformat(),
+            'elapsed_s': round(elapsed, 3),
+            'messages': report.get('total', 0),
+            'sent': report.get('sent', 0),
+            'failed': report.get('failed', 0),
+            'throughput_msg_s': round(report.get('total', 0) / elapsed, 2) if elapsed else 0.0,
+            'smtp_connections': smtp.connections,
+            'smtp_messages_received': smtp.messages,
+        }
+        print(f"  {mode:<7} {results[mode]['messages']} correos en {elapsed:.2f}s "
+              f"({results[mode]['throughput_msg_s']} msg/s, {smtp.connections} conexiones SMTP)")
+    return results
+
+
+# --- COMPARACIÓN ---
+
+def compare(current, previous, threshold=REGRESSION_THRESHOLD):
+    """Imprime las diferencias con otra corrida y retorna la cantidad de regresiones."""
+    regressions = 0
+    print(f"\nComparación con {previous['meta'].get('git_revision')} ({previous['meta'].get('timestamp')}):")
+
+    def line(name, before, after, higher_is_better=False):
+        nonlocal regressions
+        if not before or after is None:
+            return
+        change = (after - before) / before
+        worse = -change if higher_is_better else change
+        noise = not higher_is_better and abs(after - before) < MIN_DELTA_MS
+        flag = '' if noise else 'REGRESIÓN' if worse > threshold else ('mejora' if worse < -threshold else '')
+        regressions += flag == 'REGRESIÓN'
+        print(f'  {name:<56} {before:>10.2f} -> {after:>10.2f}  {change:+7.1%}  {flag}')
+
+    for name, result in current['routes'].items():
+        before = previous.get('routes', {}).get(name)
+        if before:
+            line(name + ' p50 ms', before.get('p50_ms'), result.get('p50_ms'))
+    if previous.get('load') and current.get('load'):
+        line('carga rps', previous['load']['throughput_rps'], current['load']['throughput_rps'], True)
+    for mode, result in current.get('notifications', {}).items():
+        before = previous.get('notifications', {}).get(mode)
+        if before:
+            line(f'notificaciones {mode} msg/s', before['throughput_msg_s'], result['throughput_msg_s'], True)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size', choices=datagen.SIZES, default='100k')
+    parser.add_argument('--skew', type=float, default=1.1)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=20, help='repeticiones por ruta')
+    parser.add_argument('--heavy-repeat', type=int, default=3, help='repeticiones de rutas de tabla completa')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0, help='segundos de carga concurrente')
+    parser.add_argument('--write-ratio', type=float, default=0.05)
+    parser.add_argument('--smtp-latency', type=float, default=0.0, help='segundos por mensaje en el SMTP de prueba')
+    parser.add_argument('--data-dir', default=os.path.join(BENCH_DIR, 'data'))
+    parser.add_argument('--regenerate', action='store_true', help='regenerar el dataset aunque exista')
+    parser.add_argument('--skip', default='', help='partes a omitir: routes,load,notifications')
+    parser.add_argument('--out')
+    parser.add_argument('--compare')
+    args = parser.parse_args()
+    skip = {s.strip() for s in args.skip.split(',') if s.strip()}
+
+    result = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'args': vars(args),
+        },
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path, info = prepare_database(args, workdir)
+        database.reset_pool()
+        database.DB_NAME = path
+        ctx = dataset_context(path)
+        result['dataset'] = {**(info or {}), 'counts': ctx['counts']}
+
+        # create_app inicializa la base: DB_NAME ya apunta a la copia
+        from app import create_app
+        app = create_app(cors=False)
+
+        with StubSMTPServer(latency=args.smtp_latency) as smtp:
+            use_stub_smtp(smtp)
+
+            if 'routes' not in skip:
+                print('\nRutas:')
+                result['routes'], uncovered = run_routes(app, ctx, args.repeat, args.heavy_repeat)
+                result['uncovered_routes'] = uncovered
+                if uncovered:
+                    print(f'  Rutas sin escenario: {", ".join(uncovered)}')
+                # Los trabajos encolados (envíos) no deben pisar las mediciones siguientes
+                result['jobs_drained'] = wait_for_jobs(path)
+
+            if 'load' not in skip:
+                print(f'\nCarga concurrente ({args.concurrency} hilos, {args.duration:g}s):')
+                result['load'] = run_load(app, ctx, args.concurrency, args.duration, args.write_ratio, args.seed)
+                load = result['load']
+                print(f"  {load['throughput_rps']} req/s, lecturas p95 {load['reads'].get('p95_ms')} ms, "
+                      f"escrituras p95 {load['writes'].get('p95_ms')} ms, errores {load['errors']}")
+
+            if 'notifications' not in skip:
+                print('\nNotificaciones (SMTP de prueba):')
+                result['notifications'] = run_notifications(smtp)
+
+        database.reset_pool()
+
+    out = args.out or os.path.join(
+        BENCH_DIR, 'results', f"{args.size}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    print(f'\nResultados: {out}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        regressions = compare(result, previous)
+        if regressions:
+            print(f'\n{regressions} regresión(es) de más de {REGRESSION_THRESHOLD:.0%}')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Servidor SMTP mínimo para benchmarks: acepta todo, no entrega nada.
+
+Implementa lo que usa smtplib en mailer.py / notifications.py (EHLO, AUTH PLAIN, MAIL,
+RCPT, DATA, RSET, NOOP, QUIT), sin STARTTLS: al usarlo hay que poner SMTP_STARTTLS = False.
+Cualquier usuario y clave se aceptan. latency agrega una espera por mensaje para simular
+un servidor real.
+
+    with StubSMTPServer(latency=0.005) as smtp:
+        notifications.SMTP_SERVER, notifications.SMTP_PORT = smtp.address
+"""
+import socketserver
+import threading
+import time
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self.reply('220 stub ESMTP')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line[:4].upper()
+            if command == b'EHLO':
+                self.reply('250-stub')
+                self.reply('250-AUTH PLAIN')
+                self.reply('250 8BITMIME')
+            elif command == b'AUTH':
+                self.reply('235 Authentication successful')
+            elif command in (b'HELO', b'MAIL', b'RCPT', b'RSET', b'NOOP'):
+                self.reply('250 OK')
+            elif command == b'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while True:
+                    data = self.rfile.readline()
+                    if not data or data in (b'.\r\n', b'.\n'):
+                        break
+                if server.latency:
+                    time.sleep(server.latency)
+                with server.lock:
+                    server.messages += 1
+                self.reply('250 OK queued')
+            elif command == b'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class StubSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0):
+        super().__init__((host, port), _Handler)
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages = 0
+        self._thread = None
+
+    @property
+    def address(self):
+        return self.server_address[0], self.server_address[1]
+
+    def reset_counters(self):
+        with self.lock:
+            self.connections = 0
+            self.messages = 0
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, name='smtp-stub', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
+        self.server_close()
@@ -1,22 +1,32 @@
-import sqlite3
+import sys
 
-conn = sqlite3.connect('pendientes.db')
-cursor = conn.cursor()
+import database
 
-# Contar clientes antes de borrar
-cursor.execute('SELECT COUNT(*) FROM clientes')
-total_antes = cursor.fetchone()[0]
-print(f'Clientes antes de borrar: {total_antes}')
+# Borra todos los clientes y, por cascada, sus tareas (ver trg_clientes_cascade_delete).
+# Lo hace en lotes cortos: la app puede seguir abierta mientras corre.
+# Uso: python borrar_clientes.py [--si]   (--si omite la confirmación)
 
-# Borrar todos los clientes
-cursor.execute('DELETE FROM clientes')
-conn.commit()
+database.init_db()
 
-# Verificar que se borraron
-cursor.execute('SELECT COUNT(*) FROM clientes')
-total_despues = cursor.fetchone()[0]
-print(f'Clientes después de borrar: {total_despues}')
+with database.connection() as conn:
+    total_antes = conn.execute('SELECT COUNT(*) FROM clientes').fetchone()[0]
+    tareas_antes = conn.execute('SELECT COUNT(*) FROM client_tasks').fetchone()[0]
+print(f'Clientes antes de borrar: {total_antes} ({tareas_antes} tareas)')
+
+if total_antes and '--si' not in sys.argv:
+    if input('¿Borrar todos los clientes y sus tareas? Escribe "si" para confirmar: ').strip().lower() != 'si':
+        print('Cancelado.')
+        sys.exit(1)
 
-print(f'\n✓ Se borraron {total_antes} clientes de la tabla.')
+borrados = database.delete_all_clientes(
+    pause=database.MAINTENANCE_PAUSE,
+    progress=lambda n: print(f'  {n}/{total_antes} borrados...', end='\r')
+)
+
+# Verificar que se borraron
+with database.connection() as conn:
+    total_despues = conn.execute('SELECT COUNT(*) FROM clientes').fetchone()[0]
+    huerfanas = conn.execute('SELECT COUNT(*) FROM client_tasks').fetchone()[0]
+print(f'Clientes después de borrar: {total_despues} (tareas restantes: {huerfanas})')
 
-conn.close()
+print(f'\n✓ Se borraron {borrados} clientes de la tabla.')
@@ -1,206 +1,1363 @@
 
+import json
+import os
+import queue
+import re
 import sqlite3
-from datetime import datetime
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+import metrics
 
 DB_NAME = 'pendientes.db'
 
+# Tamaño máximo del pool compartido (API, scheduler y notificador)
+POOL_SIZE = int(os.environ.get('PENDIENTES_POOL_SIZE', '5'))
+# Segundos que se espera por una conexión libre antes de fallar
+POOL_TIMEOUT = float(os.environ.get('PENDIENTES_POOL_TIMEOUT', '10'))
+
+# PRAGMAs que se aplican una sola vez al abrir cada conexión
+CONNECTION_PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA cache_size = -8000',      # ~8 MB de caché de páginas
+    'PRAGMA mmap_size = 67108864',    # 64 MB mapeados en memoria
+    'PRAGMA temp_store = MEMORY',
+    # Integridad referencial (client_tasks -> clientes); el borrado en cascada lo hace un trigger
+    'PRAGMA foreign_keys = ON',
+)
+
+
+# Medición de cada consulta (tiempo, filas, consultas lentas) para /metrics
+SQL_METRICS = os.environ.get('PENDIENTES_SQL_METRICS', '1') != '0'
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor que registra en metrics el tiempo de cada consulta y las filas leídas/afectadas."""
+
+    _sql = ''
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._sql = sql
+            metrics.record_query(sql, time.perf_counter() - start, self.rowcount)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._sql = sql
+            metrics.record_query(sql, time.perf_counter() - start, self.rowcount)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        metrics.record_fetch(self._sql, time.perf_counter() - start, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        metrics.record_fetch(self._sql, time.perf_counter() - start, len(rows))
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        metrics.record_fetch(self._sql, time.perf_counter() - start, len(rows))
+        return rows
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    # conn.execute() de sqlite3 crea un Cursor base; se redirige al cursor instrumentado
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def tuple_rows(conn, query, params=()):
+    """
+    fetchall() con filas como tuplas en vez de sqlite3.Row: para listas grandes que se
+    serializan directamente (exportación, JSON por bloques).
+    """
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    return cursor.execute(query, params).fetchall()
+
+
 def get_db_connection():
-    # Aumentar timeout a 10s para evitar "database is locked" en concurrencia
-    conn = sqlite3.connect(DB_NAME, timeout=10)
+    # Aumentar timeout a 10s para evitar "database is locked" en concurrencia.
+    # check_same_thread=False: la conexión vuelve al pool y puede usarla otro hilo.
+    factory = InstrumentedConnection if SQL_METRICS else sqlite3.Connection
+    conn = sqlite3.connect(DB_NAME, timeout=10, check_same_thread=False, factory=factory)
     conn.row_factory = sqlite3.Row
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
     return conn
 
-def init_db():
-    conn = get_db_connection()
-    try:
-        # Estructura basada en la imagen del usuario
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS pendientes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                fecha TEXT NOT NULL,
-                actividad TEXT NOT NULL,
-                descripcion TEXT,
-                empresa TEXT,
-                estado TEXT DEFAULT 'Pendiente',
-                observaciones TEXT,
-                fecha_limite TEXT,
-                email_notificacion TEXT
-            )
-        ''')
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS clientes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                empresa TEXT NOT NULL,
-                observaciones TEXT,
-                check_estado INTEGER DEFAULT 0,
-                procedimiento TEXT
-            )
-        ''')
-        
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS client_tasks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                client_id INTEGER NOT NULL,
-                description TEXT NOT NULL,
-                completed INTEGER DEFAULT 0,
-                FOREIGN KEY (client_id) REFERENCES clientes (id)
-            )
-        ''')
-        
-        # Migración manual para columnas nuevas
+
+class ConnectionPool:
+    """
+    Pool acotado de conexiones SQLite reutilizables.
+    Lleva contadores de aciertos/fallos y del tiempo de espera por una conexión libre.
+    """
+
+    def __init__(self, db_name, size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self.db_name = db_name
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    def acquire(self):
         try:
-            conn.execute('ALTER TABLE clientes ADD COLUMN check_estado INTEGER DEFAULT 0')
-        except sqlite3.OperationalError:
-            pass # Ya existe
-            
+            conn = self._idle.get_nowait()
+            with self._lock:
+                self.hits += 1
+            return conn
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+                self.misses += 1
+
+        if can_create:
+            try:
+                return get_db_connection()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        # Pool lleno: esperar a que otro hilo libere una conexión
+        start = time.perf_counter()
         try:
-            conn.execute('ALTER TABLE clientes ADD COLUMN procedimiento TEXT')
-        except sqlite3.OperationalError:
-            pass # Ya existe
+            conn = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                f'Timeout esperando una conexión libre del pool ({self.size} en uso)'
+            )
+        waited = time.perf_counter() - start
+        with self._lock:
+            self.waits += 1
+            self.wait_time += waited
+            self.max_wait_time = max(self.max_wait_time, waited)
+        return conn
 
+    def release(self, conn):
         try:
-            conn.execute("ALTER TABLE clientes ADD COLUMN estado TEXT DEFAULT 'Pendiente'")
-        except sqlite3.OperationalError:
-            pass # Ya existe
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # Conexión inservible: se descarta y se libera su hueco
+            conn.close()
+            with self._lock:
+                self._created -= 1
+            return
+        self._idle.put(conn)
+
+    def close_all(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'db_name': self.db_name,
+                'size': self.size,
+                'open_connections': self._created,
+                'idle_connections': self._idle.qsize(),
+                'hits': self.hits,
+                'misses': self.misses,
+                'waits': self.waits,
+                'wait_time_total': round(self.wait_time, 6),
+                'wait_time_max': round(self.max_wait_time, 6),
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_local = threading.local()
+
+
+def get_pool():
+    """Devuelve el pool del DB_NAME actual (se recrea si DB_NAME cambió)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.db_name != DB_NAME:
+            if _pool is not None:
+                _pool.close_all()
+            _pool = ConnectionPool(DB_NAME)
+        return _pool
 
+
+def get_pool_stats():
+    return get_pool().stats()
+
+
+def reset_pool():
+    """Cierra todas las conexiones libres y reinicia los contadores."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+        _pool = None
+
+
+def begin_request():
+    """
+    Marca el inicio de una petición (Flask) en el hilo actual. La primera llamada a
+    connection() reserva una conexión del pool que todas las funciones de este módulo
+    reutilizan hasta end_request(). Si la petición no usa la base, no se toma ninguna.
+    """
+    _local.in_request = True
+
+
+def end_request():
+    _local.in_request = False
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        _local.conn = None
+        _local.pool.release(conn)
+
+
+@contextmanager
+def connection():
+    """
+    Entrega la conexión de la petición en curso o, fuera de una petición,
+    una conexión prestada del pool que se devuelve al terminar.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is None and getattr(_local, 'in_request', False):
+        _local.pool = get_pool()
+        conn = _local.conn = _local.pool.acquire()
+    if conn is not None:
+        yield conn
+        return
+
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+
+# --- VERSIONES DE DATOS ---
+#
+# Contador en memoria por tabla que sube con cada función de escritura de este módulo.
+# Permite responder 304 / servir desde caché sin consultar SQLite. Los cambios hechos
+# por otros procesos se detectan revisando sync_state.seq como máximo cada
+# DATA_VERSION_RECHECK_SECONDS.
+
+DATA_VERSION_RECHECK_SECONDS = 2.0
+
+# Identifica esta instancia del proceso (las versiones reinician al arrancar)
+DATA_EPOCH = os.urandom(4).hex()
+
+_data_versions = {}
+_data_versions_lock = threading.Lock()
+_external_check = {'at': 0.0, 'seq': None}
+
+
+def bump_data_version(*tables):
+    with _data_versions_lock:
+        for table in tables:
+            _data_versions[table] = _data_versions.get(table, 0) + 1
+
+
+# --- AVISOS DE CAMBIOS ---
+#
+# Las funciones de escritura llaman a notify_change() después del commit. Además de
+# subir la versión de la tabla, avisa a los listeners registrados (p. ej. el hub de
+# eventos SSE en events.py) con un dict {'table', 'op', 'ids', ...}.
+
+_change_listeners = []
+
+
+def add_change_listener(fn):
+    if fn not in _change_listeners:
+        _change_listeners.append(fn)
+
+
+def remove_change_listener(fn):
+    if fn in _change_listeners:
+        _change_listeners.remove(fn)
+
+
+def notify_change(table, op, ids=(), **extra):
+    """op: 'insert', 'update' o 'delete'. ids vacío = varias filas sin detallar."""
+    bump_data_version(table)
+    if not _change_listeners:
+        return
+    change = {'table': table, 'op': op, 'ids': list(ids), **extra}
+    for fn in list(_change_listeners):
         try:
-            conn.execute("ALTER TABLE pendientes ADD COLUMN dias_antes_notificacion INTEGER DEFAULT 3")
-        except sqlite3.OperationalError:
-            pass # Ya existe
+            fn(change)
+        except Exception:
+            # Un listener con errores no debe romper la escritura ya confirmada
+            pass
+
+
+def _check_external_changes():
+    now = time.monotonic()
+    if now - _external_check['at'] < DATA_VERSION_RECHECK_SECONDS:
+        return
+    _external_check['at'] = now
+    try:
+        seq = get_sync_cursor()
+    except sqlite3.Error:
+        return
+    if _external_check['seq'] is not None and seq != _external_check['seq']:
+        # Hubo escrituras (propias u de otro proceso): se invalida todo una vez
+        bump_data_version(*SYNC_TABLES)
+    _external_check['seq'] = seq
+
+
+def get_data_versions(tables, check=True):
+    """
+    Tupla con la versión actual de cada tabla (en el orden recibido).
+    check=False no consulta SQLite (para el event loop de asgi.py, que revisa los
+    cambios externos aparte, desde un hilo).
+    """
+    if check:
+        _check_external_changes()
+    with _data_versions_lock:
+        return tuple(_data_versions.get(table, 0) for table in tables)
+
+
+# --- ESQUEMA Y MIGRACIONES ---
+#
+# La versión del esquema se guarda en PRAGMA user_version. Cada migración se
+# aplica una única vez, en orden, dentro de su propia transacción. Para cambiar
+# el esquema se agrega una función nueva al final de MIGRATIONS; nunca se
+# modifica una migración ya publicada.
+
+def _column_names(conn, table):
+    return {row['name'] for row in conn.execute(f'PRAGMA table_info({table})')}
+
+def _ensure_column(conn, table, column, ddl):
+    if column not in _column_names(conn, table):
+        conn.execute(f'ALTER TABLE {table} ADD COLUMN {ddl}')
+
+def _migration_base_schema(conn):
+    """Tablas base. Reconoce bases creadas antes del control de versiones."""
+    # Estructura basada en la imagen del usuario
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS pendientes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fecha TEXT NOT NULL,
+            actividad TEXT NOT NULL,
+            descripcion TEXT,
+            empresa TEXT,
+            estado TEXT DEFAULT 'Pendiente',
+            observaciones TEXT,
+            fecha_limite TEXT,
+            email_notificacion TEXT,
+            dias_antes_notificacion INTEGER DEFAULT 3
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS clientes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            empresa TEXT NOT NULL,
+            observaciones TEXT,
+            check_estado INTEGER DEFAULT 0,
+            procedimiento TEXT,
+            estado TEXT DEFAULT 'Pendiente'
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS client_tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            client_id INTEGER NOT NULL,
+            description TEXT NOT NULL,
+            completed INTEGER DEFAULT 0,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (client_id) REFERENCES clientes (id)
+        )
+    ''')
+
+    # Columnas agregadas a mano en versiones anteriores (bases antiguas)
+    _ensure_column(conn, 'clientes', 'check_estado', 'check_estado INTEGER DEFAULT 0')
+    _ensure_column(conn, 'clientes', 'procedimiento', 'procedimiento TEXT')
+    _ensure_column(conn, 'clientes', 'estado', "estado TEXT DEFAULT 'Pendiente'")
+    _ensure_column(conn, 'pendientes', 'dias_antes_notificacion', 'dias_antes_notificacion INTEGER DEFAULT 3')
+    # SQLite no permite DEFAULT CURRENT_TIMESTAMP en ALTER TABLE sobre una tabla con filas
+    _ensure_column(conn, 'client_tasks', 'created_at', 'created_at TEXT')
+
+def _migration_indexes(conn):
+    """Índices para las consultas de listado, tareas pendientes y notificaciones."""
+    # get_client_tasks, get_pending_tasks_by_client y los contadores de get_clientes
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_client_tasks_client_completed_created
+        ON client_tasks (client_id, completed, created_at)
+    ''')
+    # ORDER BY empresa en get_clientes
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_clientes_empresa ON clientes (empresa)')
+    # ORDER BY fecha_limite en get_pendientes
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_pendientes_fecha_limite ON pendientes (fecha_limite)')
+    # Filtro estado = 'Pendiente' por rango de fecha_limite en check_deadlines_and_notify
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_pendientes_estado_fecha_limite
+        ON pendientes (estado, fecha_limite)
+    ''')
+    conn.execute('ANALYZE')
+
+def _migration_pendientes_counts(conn):
+    """Contador de pendientes por estado mantenido por triggers (total sin escanear la tabla)."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS pendientes_estado_counts (
+            estado TEXT PRIMARY KEY,
+            total INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute('DELETE FROM pendientes_estado_counts')
+    conn.execute('''
+        INSERT INTO pendientes_estado_counts (estado, total)
+        SELECT COALESCE(estado, ''), COUNT(*) FROM pendientes GROUP BY COALESCE(estado, '')
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_pendientes_count_insert AFTER INSERT ON pendientes
+        BEGIN
+            INSERT INTO pendientes_estado_counts (estado, total) VALUES (COALESCE(NEW.estado, ''), 1)
+            ON CONFLICT(estado) DO UPDATE SET total = total + 1;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_pendientes_count_delete AFTER DELETE ON pendientes
+        BEGIN
+            UPDATE pendientes_estado_counts SET total = total - 1 WHERE estado = COALESCE(OLD.estado, '');
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_pendientes_count_update AFTER UPDATE OF estado ON pendientes
+        WHEN COALESCE(OLD.estado, '') <> COALESCE(NEW.estado, '')
+        BEGIN
+            UPDATE pendientes_estado_counts SET total = total - 1 WHERE estado = COALESCE(OLD.estado, '');
+            INSERT INTO pendientes_estado_counts (estado, total) VALUES (COALESCE(NEW.estado, ''), 1)
+            ON CONFLICT(estado) DO UPDATE SET total = total + 1;
+        END
+    ''')
+    # Filtro por empresa ordenado por fecha_limite
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_pendientes_empresa_fecha_limite
+        ON pendientes (empresa, fecha_limite)
+    ''')
+
+def _migration_client_task_stats(conn):
+    """Contadores de tareas por cliente mantenidos por triggers (get_clientes en O(clientes))."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS client_task_stats (
+            client_id INTEGER PRIMARY KEY,
+            total_tasks INTEGER NOT NULL DEFAULT 0,
+            completed_tasks INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute('DELETE FROM client_task_stats')
+    conn.execute('''
+        INSERT INTO client_task_stats (client_id, total_tasks, completed_tasks)
+        SELECT client_id, COUNT(*), SUM(CASE WHEN completed = 1 THEN 1 ELSE 0 END)
+        FROM client_tasks
+        GROUP BY client_id
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_client_task_stats_insert AFTER INSERT ON client_tasks
+        BEGIN
+            INSERT INTO client_task_stats (client_id, total_tasks, completed_tasks)
+            VALUES (NEW.client_id, 1, NEW.completed = 1)
+            ON CONFLICT(client_id) DO UPDATE SET
+                total_tasks = total_tasks + 1,
+                completed_tasks = completed_tasks + (NEW.completed = 1);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_client_task_stats_delete AFTER DELETE ON client_tasks
+        BEGIN
+            UPDATE client_task_stats SET
+                total_tasks = total_tasks - 1,
+                completed_tasks = completed_tasks - (OLD.completed = 1)
+            WHERE client_id = OLD.client_id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_client_task_stats_update AFTER UPDATE OF completed, client_id ON client_tasks
+        BEGIN
+            UPDATE client_task_stats SET
+                total_tasks = total_tasks - 1,
+                completed_tasks = completed_tasks - (OLD.completed = 1)
+            WHERE client_id = OLD.client_id;
+            INSERT INTO client_task_stats (client_id, total_tasks, completed_tasks)
+            VALUES (NEW.client_id, 1, NEW.completed = 1)
+            ON CONFLICT(client_id) DO UPDATE SET
+                total_tasks = total_tasks + 1,
+                completed_tasks = completed_tasks + (NEW.completed = 1);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_client_task_stats_client_delete AFTER DELETE ON clientes
+        BEGIN
+            DELETE FROM client_task_stats WHERE client_id = OLD.id;
+        END
+    ''')
+
+def _migration_due_index(conn):
+    """MAX(dias_antes_notificacion) de los pendientes abiertos sin recorrer la tabla (get_due_pendientes)."""
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_pendientes_estado_dias
+        ON pendientes (estado, dias_antes_notificacion)
+    ''')
 
+def _migration_notification_log(conn):
+    """Registro de recordatorios enviados: evita reenvíos y permite reanudar una corrida."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS notification_log (
+            pendiente_id INTEGER NOT NULL,
+            recipient TEXT NOT NULL,
+            notify_date TEXT NOT NULL,
+            status TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (pendiente_id, recipient, notify_date)
+        ) WITHOUT ROWID
+    ''')
+
+def _migration_jobs(conn):
+    """Cola persistente de trabajos en segundo plano (envío de correos)."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL DEFAULT '{}',
+            status TEXT NOT NULL DEFAULT 'queued',
+            progress_done INTEGER NOT NULL DEFAULT 0,
+            progress_total INTEGER,
+            result TEXT,
+            error TEXT,
+            created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, id)')
+
+def _fts_table_sql(name, content, columns):
+    return (
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {name} USING fts5("
+        f"{', '.join(columns)}, content='{content}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+
+def _fts_triggers(conn, name, content, columns):
+    cols = ', '.join(columns)
+    new_values = ', '.join(f'NEW.{c}' for c in columns)
+    old_values = ', '.join(f'OLD.{c}' for c in columns)
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{name}_insert AFTER INSERT ON {content}
+        BEGIN
+            INSERT INTO {name} (rowid, {cols}) VALUES (NEW.id, {new_values});
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{name}_delete AFTER DELETE ON {content}
+        BEGIN
+            INSERT INTO {name} ({name}, rowid, {cols}) VALUES ('delete', OLD.id, {old_values});
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{name}_update AFTER UPDATE OF {cols} ON {content}
+        BEGIN
+            INSERT INTO {name} ({name}, rowid, {cols}) VALUES ('delete', OLD.id, {old_values});
+            INSERT INTO {name} (rowid, {cols}) VALUES (NEW.id, {new_values});
+        END
+    ''')
+
+FTS_TABLES = {
+    'clientes_fts': ('clientes', ('empresa', 'observaciones', 'procedimiento')),
+    'client_tasks_fts': ('client_tasks', ('description',)),
+    'pendientes_fts': ('pendientes', ('actividad', 'descripcion', 'empresa')),
+}
+
+def _migration_search_index(conn):
+    """Índices FTS5 (external content) sincronizados por triggers para /api/search y q=."""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+        conn.execute("DROP TABLE temp.fts5_probe")
+    except sqlite3.OperationalError:
+        # SQLite sin FTS5: las búsquedas usan LIKE (ver has_search_index)
+        return
+
+    for name, (content, columns) in FTS_TABLES.items():
+        conn.execute(_fts_table_sql(name, content, columns))
+        _fts_triggers(conn, name, content, columns)
+        conn.execute(f"INSERT INTO {name} ({name}) VALUES ('rebuild')")
+
+SYNC_TABLES = ('pendientes', 'clientes', 'client_tasks')
+
+def _migration_sync(conn):
+    """
+    Sincronización incremental: cada fila lleva row_version (valor de un contador global
+    que crece con cada escritura) y updated_at; los borrados quedan en tombstones.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sync_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            seq INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('INSERT OR IGNORE INTO sync_state (id, seq) VALUES (1, 0)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tombstones (
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            version INTEGER NOT NULL,
+            deleted_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_tombstones_table_version ON tombstones (table_name, version)')
+
+    next_version = "(SELECT seq FROM sync_state WHERE id = 1)"
+    bump = "UPDATE sync_state SET seq = seq + 1 WHERE id = 1;"
+
+    for table in SYNC_TABLES:
+        _ensure_column(conn, table, 'row_version', 'row_version INTEGER NOT NULL DEFAULT 0')
+        _ensure_column(conn, table, 'updated_at', 'updated_at TEXT')
+        conn.execute(f'UPDATE {table} SET updated_at = CURRENT_TIMESTAMP WHERE updated_at IS NULL')
+        conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_row_version ON {table} (row_version)')
+
+        # Los cambios en tareas también cambian los contadores del cliente
+        touch_client = ''
+        if table == 'client_tasks':
+            touch_client = f'''
+                UPDATE clientes SET row_version = {next_version}, updated_at = CURRENT_TIMESTAMP
+                WHERE id = {{row}}.client_id;
+            '''
+
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_sync_insert AFTER INSERT ON {table}
+            BEGIN
+                {bump}
+                UPDATE {table} SET row_version = {next_version}, updated_at = CURRENT_TIMESTAMP
+                WHERE id = NEW.id;
+                {touch_client.format(row='NEW')}
+            END
+        ''')
+        # WHEN evita volver a disparar por el propio UPDATE de row_version
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_sync_update AFTER UPDATE ON {table}
+            WHEN NEW.row_version IS OLD.row_version
+            BEGIN
+                {bump}
+                UPDATE {table} SET row_version = {next_version}, updated_at = CURRENT_TIMESTAMP
+                WHERE id = NEW.id;
+                {touch_client.format(row='NEW')}
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_sync_delete AFTER DELETE ON {table}
+            BEGIN
+                {bump}
+                INSERT INTO tombstones (table_name, row_id, version) VALUES ('{table}', OLD.id, {next_version});
+                {touch_client.format(row='OLD')}
+            END
+        ''')
+
+def _migration_cascade_deletes(conn):
+    """
+    Borrado en cascada de las tareas (y del registro de avisos de los pendientes) por
+    trigger: la FOREIGN KEY de client_tasks no tiene ON DELETE CASCADE y cambiarla
+    obligaría a reconstruir la tabla. Limpia los huérfanos que dejaron los borrados
+    anteriores y agrega a sync_state el piso de tombstones purgados (ver purge_tombstones).
+    """
+    conn.execute('DELETE FROM client_tasks WHERE client_id NOT IN (SELECT id FROM clientes)')
+    conn.execute('DELETE FROM client_task_stats WHERE client_id NOT IN (SELECT id FROM clientes)')
+    conn.execute('DELETE FROM notification_log WHERE pendiente_id NOT IN (SELECT id FROM pendientes)')
+    # BEFORE: las tareas se van antes que el cliente, así la FOREIGN KEY nunca falla
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_clientes_cascade_delete BEFORE DELETE ON clientes
+        BEGIN
+            DELETE FROM client_tasks WHERE client_id = OLD.id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_pendientes_cascade_delete AFTER DELETE ON pendientes
+        BEGIN
+            DELETE FROM notification_log WHERE pendiente_id = OLD.id;
+        END
+    ''')
+    _ensure_column(conn, 'sync_state', 'tombstone_floor', 'tombstone_floor INTEGER NOT NULL DEFAULT 0')
+
+# client_id del cliente cuyo nombre coincide con el texto (sin mayúsculas ni espacios de
+# más); NULL si no hay ninguno o si hay más de uno con ese nombre
+_CLIENT_ID_FOR_EMPRESA = (
+    "(SELECT CASE WHEN COUNT(*) = 1 THEN MIN(id) END FROM clientes "
+    "WHERE lower(trim(empresa)) = lower(trim({empresa})))"
+)
+
+def _migration_pendientes_client(conn):
+    """
+    pendientes.client_id: vínculo real con el cliente en vez del texto de empresa.
+    Se completa a partir del texto en las filas existentes y, por trigger, en cada alta o
+    cambio de empresa sin client_id. Renombrar un cliente actualiza el texto de sus
+    pendientes; borrarlo deja client_id en NULL (el pendiente queda como historial).
+    """
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_clientes_empresa_key ON clientes (lower(trim(empresa)))')
+    _ensure_column(
+        conn, 'pendientes', 'client_id',
+        'client_id INTEGER REFERENCES clientes (id) ON DELETE SET NULL'
+    )
+    conn.execute(f'''
+        UPDATE pendientes SET client_id = {_CLIENT_ID_FOR_EMPRESA.format(empresa='pendientes.empresa')}
+        WHERE client_id IS NULL AND COALESCE(empresa, '') != ''
+    ''')
+    # /api/clients/<id>/pendientes (orden por fecha_limite) y los resúmenes por cliente
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_pendientes_client_estado_fecha_limite
+        ON pendientes (client_id, estado, fecha_limite)
+    ''')
+
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_pendientes_link_client_insert AFTER INSERT ON pendientes
+        WHEN NEW.client_id IS NULL AND COALESCE(NEW.empresa, '') != ''
+        BEGIN
+            UPDATE pendientes SET client_id = {_CLIENT_ID_FOR_EMPRESA.format(empresa='NEW.empresa')}
+            WHERE id = NEW.id;
+        END
+    ''')
+    # Si el texto ya es el nombre del cliente vinculado (p. ej. por un renombre) no se toca
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_pendientes_link_client_update AFTER UPDATE OF empresa ON pendientes
+        WHEN NEW.empresa IS NOT OLD.empresa
+             AND NOT EXISTS (SELECT 1 FROM clientes WHERE id = NEW.client_id AND empresa = NEW.empresa)
+        BEGIN
+            UPDATE pendientes SET client_id = {_CLIENT_ID_FOR_EMPRESA.format(empresa='NEW.empresa')}
+            WHERE id = NEW.id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_clientes_rename_pendientes AFTER UPDATE OF empresa ON clientes
+        WHEN NEW.empresa IS NOT OLD.empresa
+        BEGIN
+            UPDATE pendientes SET empresa = NEW.empresa WHERE client_id = NEW.id;
+        END
+    ''')
+
+def _migration_pendientes_touch_client(conn):
+    """
+    Los resúmenes de pendientes abiertos de cada cliente (get_clientes) cambian con los
+    pendientes vinculados: como con las tareas, se sube row_version del cliente para que
+    /api/clientes?since= los traiga. Solo cuando el cambio toca un pendiente abierto.
+    """
+    next_version = "(SELECT seq FROM sync_state WHERE id = 1)"
+    bump = "UPDATE sync_state SET seq = seq + 1 WHERE id = 1;"
+    open_estados = ', '.join(f"'{estado}'" for estado in OPEN_ESTADOS)
+
+    def touch(*rows):
+        ids = ', '.join(f'{row}.client_id' for row in rows)
+        return f'''
+            {bump}
+            UPDATE clientes SET row_version = {next_version}, updated_at = CURRENT_TIMESTAMP
+            WHERE id IN ({ids});
+        '''
+
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_pendientes_touch_client_insert AFTER INSERT ON pendientes
+        WHEN NEW.client_id IS NOT NULL AND NEW.estado IN ({open_estados})
+        BEGIN
+            {touch('NEW')}
+        END
+    ''')
+    # El UPDATE de row_version del trigger de sincronización no cambia estas columnas
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_pendientes_touch_client_update AFTER UPDATE ON pendientes
+        WHEN (NEW.client_id IS NOT OLD.client_id OR NEW.estado IS NOT OLD.estado
+              OR NEW.fecha_limite IS NOT OLD.fecha_limite)
+             AND (OLD.estado IN ({open_estados}) OR NEW.estado IN ({open_estados}))
+        BEGIN
+            {touch('OLD', 'NEW')}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_pendientes_touch_client_delete AFTER DELETE ON pendientes
+        WHEN OLD.client_id IS NOT NULL AND OLD.estado IN ({open_estados})
+        BEGIN
+            {touch('OLD')}
+        END
+    ''')
+
+MIGRATIONS = [
+    _migration_base_schema,
+    _migration_indexes,
+    _migration_pendientes_counts,
+    _migration_client_task_stats,
+    _migration_due_index,
+    _migration_notification_log,
+    _migration_jobs,
+    _migration_search_index,
+    _migration_sync,
+    _migration_cascade_deletes,
+    _migration_pendientes_client,
+    _migration_pendientes_touch_client,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def get_schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def migrate(conn, target_version=SCHEMA_VERSION):
+    """Aplica las migraciones pendientes hasta target_version. Retorna la versión final."""
+    current = get_schema_version(conn)
+    for version in range(current + 1, target_version + 1):
+        conn.execute('BEGIN IMMEDIATE')
         try:
-            conn.execute("ALTER TABLE client_tasks ADD COLUMN created_at TEXT DEFAULT CURRENT_TIMESTAMP")
-        except sqlite3.OperationalError:
-            pass # Ya existe
+            # Otro proceso pudo migrar mientras esperábamos el bloqueo
+            if get_schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            MIGRATIONS[version - 1](conn)
+            conn.execute(f'PRAGMA user_version = {version}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        current = version
+    return current
 
-        conn.commit()
+def _prepare_new_db():
+    """
+    En una base sin tablas deja auto_vacuum=INCREMENTAL (ver incremental_vacuum). Se hace
+    con una conexión propia, antes de que las del pool pasen a WAL: ese PRAGMA ya escribe
+    el encabezado del archivo y después auto_vacuum solo cambia con un VACUUM.
+    """
+    conn = sqlite3.connect(DB_NAME, timeout=10)
+    try:
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table'").fetchone():
+            return
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            # Otra conexión ya escribió el encabezado; con la base vacía el VACUUM es inmediato
+            conn.execute('VACUUM')
     finally:
         conn.close()
 
+def init_db():
+    _prepare_new_db()
+    with connection() as conn:
+        # Camino rápido: el esquema ya está al día, no hay nada que hacer
+        if get_schema_version(conn) >= SCHEMA_VERSION:
+            return
+        migrate(conn)
+
 def add_pendiente(fecha, actividad, descripcion, empresa, estado, observaciones, fecha_limite, email_notificacion, dias_antes_notificacion=3):
-    conn = get_db_connection()
-    try:
-        conn.execute('''
+    with connection() as conn:
+        cursor = conn.execute('''
             INSERT INTO pendientes (fecha, actividad, descripcion, empresa, estado, observaciones, fecha_limite, email_notificacion, dias_antes_notificacion)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (fecha, actividad, descripcion, empresa, estado, observaciones, fecha_limite, email_notificacion, dias_antes_notificacion))
         conn.commit()
-    finally:
-        conn.close()
+        notify_change('pendientes', 'insert', [cursor.lastrowid])
+        return cursor.lastrowid
+
+def add_pendientes_bulk(rows):
+    """
+    Inserta varios pendientes en una sola transacción.
+    rows: iterable de tuplas (fecha, actividad, descripcion, empresa, estado,
+          observaciones, fecha_limite, email_notificacion, dias_antes_notificacion, client_id)
+    Con client_id None lo completa el trigger a partir de la empresa.
+    Retorna la cantidad de filas insertadas.
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+
+    with connection() as conn:
+        with conn:
+            conn.executemany('''
+                INSERT INTO pendientes (fecha, actividad, descripcion, empresa, estado, observaciones, fecha_limite, email_notificacion, dias_antes_notificacion, client_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+    notify_change('pendientes', 'insert', count=len(rows))
+    return len(rows)
 
 def get_pendientes():
-    conn = get_db_connection()
-    try:
-        pendientes = conn.execute('SELECT * FROM pendientes ORDER BY fecha_limite ASC').fetchall()
+    with connection() as conn:
+        pendientes = conn.execute('SELECT * FROM pendientes ORDER BY fecha_limite ASC, id ASC').fetchall()
         return pendientes
+
+# Filas por consulta al recorrer listas completas por bloques (iter_pendientes, iter_client_tasks)
+LIST_BATCH_SIZE = 1000
+
+PENDIENTE_FIELDS = (
+    'id', 'fecha', 'actividad', 'descripcion', 'empresa', 'estado', 'observaciones',
+    'fecha_limite', 'email_notificacion', 'dias_antes_notificacion', 'client_id', 'row_version', 'updated_at'
+)
+
+# Estados de un pendiente que todavía requiere trabajo
+OPEN_ESTADOS = ('Pendiente', 'En Progreso')
+
+def _pendientes_filters(estados=None, empresa=None, fecha_desde=None, fecha_hasta=None, q=None, client_id=None):
+    clauses = []
+    params = []
+    if client_id is not None:
+        clauses.append('client_id = ?')
+        params.append(client_id)
+    if q:
+        clause, match_params = _match_clause('pendientes_fts', 'id', q)
+        clauses.append(clause)
+        params.extend(match_params)
+    if estados:
+        clauses.append(f"estado IN ({','.join('?' * len(estados))})")
+        params.extend(estados)
+    if empresa:
+        clauses.append('empresa = ?')
+        params.append(empresa)
+    if fecha_desde:
+        clauses.append('fecha_limite >= ?')
+        params.append(fecha_desde)
+    if fecha_hasta:
+        clauses.append('fecha_limite <= ?')
+        params.append(fecha_hasta)
+    return clauses, params
+
+def pendientes_columns(fields=None):
+    """Columnas que devuelve get_pendientes_page para 'fields', en orden."""
+    return [f for f in PENDIENTE_FIELDS if not fields or f in fields or f in ('id', 'fecha_limite')]
+
+def get_pendientes_page(estados=None, empresa=None, fecha_desde=None, fecha_hasta=None, q=None,
+                        client_id=None, fields=None, limit=None, after=None, tuples=False):
+    """
+    Lista filtrada de pendientes ordenada por (fecha_limite, id).
+
+    fields: columnas a devolver (id y fecha_limite se incluyen siempre, se usan para el cursor)
+    limit:  máximo de filas; None devuelve todas
+    after:  tupla (fecha_limite, id) de la última fila de la página anterior (paginación keyset)
+    tuples: filas como tuplas en el orden de pendientes_columns(fields)
+    """
+    query, params = _pendientes_page_query(fields, limit, after, estados, empresa, fecha_desde, fecha_hasta, q, client_id)
+    with connection() as conn:
+        if tuples:
+            return tuple_rows(conn, query, params)
+        return conn.execute(query, params).fetchall()
+
+def _pendientes_page_query(fields, limit, after, estados=None, empresa=None, fecha_desde=None, fecha_hasta=None,
+                           q=None, client_id=None):
+    columns = pendientes_columns(fields)
+    clauses, params = _pendientes_filters(estados, empresa, fecha_desde, fecha_hasta, q, client_id)
+
+    if after is not None:
+        after_fecha, after_id = after
+        # En SQLite los NULL se ordenan primero
+        if after_fecha is None:
+            clauses.append('((fecha_limite IS NULL AND id > ?) OR fecha_limite IS NOT NULL)')
+            params.append(after_id)
+        else:
+            clauses.append('(fecha_limite > ? OR (fecha_limite = ? AND id > ?))')
+            params.extend([after_fecha, after_fecha, after_id])
+
+    query = f"SELECT {', '.join(columns)} FROM pendientes"
+    if clauses:
+        query += ' WHERE ' + ' AND '.join(clauses)
+    query += ' ORDER BY fecha_limite ASC, id ASC'
+    if limit is not None:
+        query += ' LIMIT ?'
+        params.append(limit)
+    return query, params
+
+def iter_pendientes(fields=None, batch_size=LIST_BATCH_SIZE, **filters):
+    """
+    Todas las filas de get_pendientes_page (mismo orden y filtros) como tuplas, leídas por
+    páginas keyset de batch_size, así que recorrer 100k filas no las carga en memoria.
+
+    Las páginas se leen dentro de una sola transacción de lectura: el orden es por
+    fecha_limite, que puede cambiar mientras dura el recorrido, y con transacciones
+    separadas una fila editada entre dos páginas saldría dos veces o ninguna. La conexión
+    sale del pool (acotado, visible en /api/db/pool) y queda tomada mientras el cliente
+    descarga; en WAL esa lectura no bloquea a los escritores.
+    """
+    columns = pendientes_columns(fields)
+    fecha_index, id_index = columns.index('fecha_limite'), columns.index('id')
+    after = None
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        conn.execute('BEGIN')
+        while True:
+            rows = tuple_rows(conn, *_pendientes_page_query(fields, batch_size, after, **filters))
+            yield from rows
+            if len(rows) < batch_size:
+                return
+            after = (rows[-1][fecha_index], rows[-1][id_index])
     finally:
-        conn.close()
+        # Solo lectura: release() descarta la transacción
+        pool.release(conn)
+
+def count_pendientes(estados=None, empresa=None, fecha_desde=None, fecha_hasta=None, q=None, client_id=None):
+    """
+    Total de pendientes para los filtros dados.
+    Sin filtros o filtrando solo por estado se lee del contador mantenido por triggers.
+    """
+    with connection() as conn:
+        if not (empresa or fecha_desde or fecha_hasta or q or client_id is not None):
+            query = 'SELECT COALESCE(SUM(total), 0) FROM pendientes_estado_counts'
+            params = []
+            if estados:
+                query += f" WHERE estado IN ({','.join('?' * len(estados))})"
+                params = list(estados)
+            return conn.execute(query, params).fetchone()[0]
+
+        clauses, params = _pendientes_filters(estados, empresa, fecha_desde, fecha_hasta, q, client_id)
+        query = 'SELECT COUNT(*) FROM pendientes WHERE ' + ' AND '.join(clauses)
+        return conn.execute(query, params).fetchone()[0]
+
+def get_due_pendientes(today, batch_size=500, include_sent=False):
+    """
+    Genera los pendientes abiertos (estado 'Pendiente', con correo) cuya ventana de aviso
+    incluye 'today' (date o 'YYYY-MM-DD'):
+
+        fecha_limite - dias_antes_notificacion <= today <= fecha_limite + 1
+
+    Cada fila trae además days_remaining. El rango de fecha_limite se acota con
+    idx_pendientes_estado_fecha_limite, de modo que el costo depende de los pendientes
+    próximos a vencer y no del historial completo. Las filas se leen del cursor por lotes.
+    Salvo include_sent=True, omite los ya enviados hoy según notification_log.
+    """
+    today = today.isoformat() if hasattr(today, 'isoformat') else today
+
+    with connection() as conn:
+        max_dias = conn.execute(
+            "SELECT MAX(dias_antes_notificacion) FROM pendientes WHERE estado = 'Pendiente'"
+        ).fetchone()[0]
+        # NULL en dias_antes_notificacion equivale al defecto de 3
+        max_dias = max(max_dias or 0, 3)
+
+        cursor = conn.execute('''
+            SELECT *,
+                   CAST(julianday(fecha_limite) - julianday(:today) AS INTEGER) AS days_remaining
+            FROM pendientes
+            WHERE estado = 'Pendiente'
+              AND fecha_limite BETWEEN date(:today, '-1 day') AND date(:today, printf('%d days', :max_dias))
+              AND date(fecha_limite, printf('%d days', -COALESCE(dias_antes_notificacion, 3))) <= :today
+              AND email_notificacion IS NOT NULL AND email_notificacion <> ''
+              AND (:include_sent OR NOT EXISTS (
+                  SELECT 1 FROM notification_log l
+                  WHERE l.pendiente_id = pendientes.id
+                    AND l.recipient = pendientes.email_notificacion
+                    AND l.notify_date = :today
+                    AND l.status = 'sent'
+              ))
+            ORDER BY fecha_limite ASC, id ASC
+        ''', {'today': today, 'max_dias': max_dias, 'include_sent': int(include_sent)})
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cursor.close()
+
+# --- NOTIFICATION LOG ---
+
+# Un envío marcado 'sending' por más de estos minutos se considera abandonado (corrida caída)
+NOTIFICATION_CLAIM_TIMEOUT_MINUTES = 15
+
+def claim_notifications(keys, notify_date):
+    """
+    Reserva los envíos (pendiente_id, recipient) del día para esta corrida.
+    Solo se reservan los que no existen, fallaron o quedaron abandonados en 'sending';
+    así dos corridas simultáneas no envían el mismo recordatorio.
+    Retorna el set de claves reservadas.
+    """
+    notify_date = notify_date.isoformat() if hasattr(notify_date, 'isoformat') else notify_date
+    claimed = set()
+    with connection() as conn:
+        with conn:
+            for pendiente_id, recipient in keys:
+                cursor = conn.execute('''
+                    INSERT INTO notification_log (pendiente_id, recipient, notify_date, status)
+                    VALUES (?, ?, ?, 'sending')
+                    ON CONFLICT (pendiente_id, recipient, notify_date) DO UPDATE SET
+                        status = 'sending',
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE status = 'failed'
+                       OR (status = 'sending' AND updated_at < datetime('now', ?))
+                ''', (pendiente_id, recipient, notify_date, f'-{NOTIFICATION_CLAIM_TIMEOUT_MINUTES} minutes'))
+                if cursor.rowcount:
+                    claimed.add((pendiente_id, recipient))
+    return claimed
+
+def log_notifications(entries, notify_date):
+    """
+    Registra en una sola transacción el resultado de varios envíos.
+    entries: iterable de (pendiente_id, recipient, success, error)
+    """
+    notify_date = notify_date.isoformat() if hasattr(notify_date, 'isoformat') else notify_date
+    data = [
+        (pendiente_id, recipient, notify_date, 'sent' if success else 'failed', error)
+        for pendiente_id, recipient, success, error in entries
+    ]
+    if not data:
+        return
+
+    with connection() as conn:
+        with conn:
+            conn.executemany('''
+                INSERT INTO notification_log (pendiente_id, recipient, notify_date, status, attempts, last_error)
+                VALUES (?, ?, ?, ?, 1, ?)
+                ON CONFLICT (pendiente_id, recipient, notify_date) DO UPDATE SET
+                    status = excluded.status,
+                    attempts = attempts + 1,
+                    last_error = excluded.last_error,
+                    updated_at = CURRENT_TIMESTAMP
+            ''', data)
 
 def get_pendiente(pendiente_id):
-    conn = get_db_connection()
-    try:
+    with connection() as conn:
         pendiente = conn.execute('SELECT * FROM pendientes WHERE id = ?', (pendiente_id,)).fetchone()
         return pendiente
-    finally:
-        conn.close()
 
 def update_pendiente(pendiente_id, fecha, actividad, descripcion, empresa, estado, observaciones, fecha_limite, email_notificacion, dias_antes_notificacion=3):
-    conn = get_db_connection()
-    try:
+    with connection() as conn:
         conn.execute('''
             UPDATE pendientes
             SET fecha = ?, actividad = ?, descripcion = ?, empresa = ?, estado = ?, observaciones = ?, fecha_limite = ?, email_notificacion = ?, dias_antes_notificacion = ?
             WHERE id = ?
         ''', (fecha, actividad, descripcion, empresa, estado, observaciones, fecha_limite, email_notificacion, dias_antes_notificacion, pendiente_id))
         conn.commit()
-    finally:
-        conn.close()
+    notify_change('pendientes', 'update', [pendiente_id])
 
 def delete_pendiente(pendiente_id):
-    conn = get_db_connection()
-    try:
+    with connection() as conn:
         conn.execute('DELETE FROM pendientes WHERE id = ?', (pendiente_id,))
         conn.commit()
-    finally:
-        conn.close()
+    notify_change('pendientes', 'delete', [pendiente_id])
 
 # --- CLIENTES ---
 
-def get_clientes():
-    conn = get_db_connection()
-    try:
-        # Recuperar clientes junto con sus tareas y contadores para calcular estado dinámico
-        query = '''
-            SELECT c.*, 
-                   GROUP_CONCAT(ct.description, '|||') as task_list,
-                   COUNT(ct.id) as total_tasks,
-                   SUM(CASE WHEN ct.completed = 1 THEN 1 ELSE 0 END) as completed_tasks
+# Estado dinámico del cliente según el avance de sus tareas
+CLIENT_STATUSES = ('Sin Tareas', 'Pendiente', 'En Proceso', 'Finalizado')
+
+CLIENT_STATUS_SQL = '''
+    CASE
+        WHEN COALESCE(s.total_tasks, 0) = 0 THEN 'Sin Tareas'
+        WHEN COALESCE(s.completed_tasks, 0) = 0 THEN 'Pendiente'
+        WHEN s.completed_tasks < s.total_tasks THEN 'En Proceso'
+        ELSE 'Finalizado'
+    END
+'''
+
+def _clientes_filters(q=None, status=None, since=None, client_id=None):
+    """Condiciones sobre clientes c LEFT JOIN client_task_stats s."""
+    clauses = []
+    params = []
+    if since is not None:
+        clauses.append('c.row_version > ?')
+        params.append(since)
+    if client_id is not None:
+        clauses.append('c.id = ?')
+        params.append(client_id)
+    if q:
+        client_clause, client_params = _match_clause('clientes_fts', 'c.id', q)
+        task_clause, task_params = _match_clause('client_tasks_fts', 'id', q)
+        clauses.append(f'({client_clause} OR c.id IN (SELECT client_id FROM client_tasks WHERE {task_clause}))')
+        params.extend(client_params + task_params)
+    if status:
+        clauses.append(f'{CLIENT_STATUS_SQL} = ?')
+        params.append(status)
+    return clauses, params
+
+def _pendientes_rollup_sql(client_id=None, today=None):
+    """
+    Subconsulta agrupada con los pendientes abiertos de cada cliente: abiertos, vencidos y
+    que vencen esta semana (hasta el domingo). Recorre solo el índice
+    (client_id, estado, fecha_limite). Retorna (sql, params).
+    """
+    today = today or date.today()
+    week_end = today + timedelta(days=6 - today.weekday())
+    where = ['client_id IS NOT NULL' if client_id is None else 'client_id = ?',
+             f"estado IN ({','.join('?' * len(OPEN_ESTADOS))})"]
+    sql = f'''
+        SELECT client_id,
+               COUNT(*) AS open_pendientes,
+               SUM(fecha_limite != '' AND fecha_limite < ?) AS overdue_pendientes,
+               SUM(fecha_limite >= ? AND fecha_limite <= ?) AS due_week_pendientes
+        FROM pendientes
+        WHERE {' AND '.join(where)}
+        GROUP BY client_id
+    '''
+    params = [today.isoformat(), today.isoformat(), week_end.isoformat()]
+    params += ([] if client_id is None else [client_id]) + list(OPEN_ESTADOS)
+    return sql, params
+
+def get_clientes(q=None, status=None, since=None, client_id=None, today=None):
+    """
+    q:         texto a buscar en empresa, observaciones, procedimiento o en las tareas del cliente
+    status:    uno de CLIENT_STATUSES (estado dinámico calculado en SQL)
+    since:     solo clientes modificados después de esa versión de sincronización
+    client_id: un solo cliente (con sus contadores)
+    today:     fecha de referencia de los resúmenes de pendientes (por defecto hoy)
+    """
+    clauses, params = _clientes_filters(q, status, since, client_id)
+    rollup_sql, rollup_params = _pendientes_rollup_sql(client_id, today)
+
+    with connection() as conn:
+        # Clientes con sus contadores de tareas (client_task_stats) para calcular estado dinámico
+        # y el resumen de sus pendientes abiertos. El detalle de tareas se pide aparte con get_client_tasks.
+        query = f'''
+            SELECT c.*,
+                   COALESCE(s.total_tasks, 0) as total_tasks,
+                   COALESCE(s.completed_tasks, 0) as completed_tasks,
+                   {CLIENT_STATUS_SQL} as dynamic_status,
+                   COALESCE(r.open_pendientes, 0) as open_pendientes,
+                   COALESCE(r.overdue_pendientes, 0) as overdue_pendientes,
+                   COALESCE(r.due_week_pendientes, 0) as due_week_pendientes
             FROM clientes c
-            LEFT JOIN client_tasks ct ON c.id = ct.client_id
-            GROUP BY c.id
+            LEFT JOIN client_task_stats s ON s.client_id = c.id
+            LEFT JOIN ({rollup_sql}) r ON r.client_id = c.id
+            {'WHERE ' + ' AND '.join(clauses) if clauses else ''}
             ORDER BY c.empresa ASC
         '''
-        clientes = conn.execute(query).fetchall()
+        clientes = conn.execute(query, rollup_params + params).fetchall()
         return clientes
-    finally:
-        conn.close()
+
+def get_cliente_summary(cliente_id):
+    """Cliente con total_tasks, completed_tasks y dynamic_status (igual que en get_clientes)."""
+    rows = get_clientes(client_id=cliente_id)
+    return rows[0] if rows else None
 
 def get_cliente(cliente_id):
-    conn = get_db_connection()
-    try:
+    with connection() as conn:
         cliente = conn.execute('SELECT * FROM clientes WHERE id = ?', (cliente_id,)).fetchone()
         return cliente
-    finally:
-        conn.close()
 
 def add_cliente(empresa, observaciones, check_estado=0, procedimiento='', estado='Pendiente'):
-    conn = get_db_connection()
-    try:
-        conn.execute('''
+    with connection() as conn:
+        cursor = conn.execute('''
             INSERT INTO clientes (empresa, observaciones, check_estado, procedimiento, estado)
             VALUES (?, ?, ?, ?, ?)
         ''', (empresa, observaciones, check_estado, procedimiento, estado))
         conn.commit()
-    finally:
-        conn.close()
+        notify_change('clientes', 'insert', [cursor.lastrowid])
+        return cursor.lastrowid
 
 def update_cliente(cliente_id, empresa, observaciones, check_estado, procedimiento, estado):
-    conn = get_db_connection()
-    try:
-        conn.execute('''
-            UPDATE clientes
-            SET empresa = ?, observaciones = ?, check_estado = ?, procedimiento = ?, estado = ?
-            WHERE id = ?
-        ''', (empresa, observaciones, check_estado, procedimiento, estado, cliente_id))
-        conn.commit()
-    finally:
-        conn.close()
+    with connection() as conn:
+        with conn:
+            old = conn.execute('SELECT empresa FROM clientes WHERE id = ?', (cliente_id,)).fetchone()
+            conn.execute('''
+                UPDATE clientes
+                SET empresa = ?, observaciones = ?, check_estado = ?, procedimiento = ?, estado = ?
+                WHERE id = ?
+            ''', (empresa, observaciones, check_estado, procedimiento, estado, cliente_id))
+            # Un cambio de empresa se propaga a sus pendientes (trg_clientes_rename_pendientes);
+            # si no hubo renombre o no tiene pendientes, las respuestas cacheadas siguen valiendo
+            renamed = old is not None and old['empresa'] != empresa and conn.execute(
+                'SELECT 1 FROM pendientes WHERE client_id = ? LIMIT 1', (cliente_id,)
+            ).fetchone() is not None
+    notify_change('clientes', 'update', [cliente_id])
+    if renamed:
+        notify_change('pendientes', 'update', client_id=cliente_id)
 
 def delete_cliente(cliente_id):
-    conn = get_db_connection()
-    try:
+    # Las tareas del cliente se borran por trigger (trg_clientes_cascade_delete)
+    with connection() as conn:
         conn.execute('DELETE FROM clientes WHERE id = ?', (cliente_id,))
         conn.commit()
-    finally:
-        conn.close()
+    notify_change('clientes', 'delete', [cliente_id])
+    notify_change('client_tasks', 'delete', client_id=cliente_id)
+    # Sus pendientes quedan sin cliente (ON DELETE SET NULL)
+    notify_change('pendientes', 'update', client_id=cliente_id)
+
+def delete_all_clientes(chunk_size=500, pause=0.0, progress=None):
+    """
+    Borra todos los clientes (y sus tareas) en transacciones de chunk_size clientes, de
+    modo que la API no quede bloqueada mientras tanto. Retorna cuántos se borraron.
+    """
+    deleted = 0
+    with connection() as conn:
+        while True:
+            with conn:
+                cursor = conn.execute(
+                    'DELETE FROM clientes WHERE id IN (SELECT id FROM clientes ORDER BY id LIMIT ?)', (chunk_size,)
+                )
+            if cursor.rowcount <= 0:
+                break
+            deleted += cursor.rowcount
+            if progress:
+                progress(deleted)
+            time.sleep(pause)
+    if deleted:
+        notify_change('clientes', 'delete', count=deleted)
+        notify_change('client_tasks', 'delete')
+        notify_change('pendientes', 'update')
+    return deleted
 
 # --- CLIENT TASKS ---
 
-def get_client_tasks(client_id):
-    conn = get_db_connection()
-    try:
+CLIENT_TASK_FIELDS = ('id', 'client_id', 'description', 'completed', 'created_at', 'row_version', 'updated_at')
+
+def iter_client_tasks(client_id, batch_size=LIST_BATCH_SIZE):
+    """Tareas del cliente como tuplas (CLIENT_TASK_FIELDS), id descendente, por bloques keyset."""
+    query = f"""
+        SELECT {', '.join(CLIENT_TASK_FIELDS)} FROM client_tasks
+        WHERE client_id = ? AND id < ? ORDER BY id DESC LIMIT ?
+    """
+    last_id = 2 ** 63 - 1  # mayor id posible en SQLite
+    while True:
+        with connection() as conn:
+            rows = tuple_rows(conn, query, (client_id, last_id, batch_size))
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        last_id = rows[-1][0]
+
+def get_client_tasks(client_id, since=None):
+    with connection() as conn:
+        if since is not None:
+            return conn.execute(
+                'SELECT * FROM client_tasks WHERE client_id = ? AND row_version > ? ORDER BY id DESC',
+                (client_id, since)
+            ).fetchall()
         tasks = conn.execute('SELECT * FROM client_tasks WHERE client_id = ? ORDER BY id DESC', (client_id,)).fetchall()
         return tasks
-    finally:
-        conn.close()
 
 def add_client_task(client_id, description):
-    conn = get_db_connection()
-    try:
-        conn.execute('INSERT INTO client_tasks (client_id, description) VALUES (?, ?)', (client_id, description))
+    with connection() as conn:
+        cursor = conn.execute('INSERT INTO client_tasks (client_id, description) VALUES (?, ?)', (client_id, description))
         conn.commit()
-    finally:
-        conn.close()
+        notify_change('client_tasks', 'insert', [cursor.lastrowid], client_id=client_id)
+        return cursor.lastrowid
+
+def get_task(task_id):
+    with connection() as conn:
+        return conn.execute('SELECT * FROM client_tasks WHERE id = ?', (task_id,)).fetchone()
 
 def add_client_tasks_bulk(client_id, descriptions):
     """
@@ -210,50 +1367,212 @@ def add_client_tasks_bulk(client_id, descriptions):
     if not descriptions:
         return
         
-    conn = get_db_connection()
-    try:
+    with connection() as conn:
         data = [(client_id, desc) for desc in descriptions]
         conn.executemany('INSERT INTO client_tasks (client_id, description) VALUES (?, ?)', data)
         conn.commit()
-    finally:
-        conn.close()
+    notify_change('client_tasks', 'insert', client_id=client_id, count=len(data))
 
 def update_task_status(task_id, completed):
-    conn = get_db_connection()
-    try:
+    with connection() as conn:
         conn.execute('UPDATE client_tasks SET completed = ? WHERE id = ?', (1 if completed else 0, task_id))
         conn.commit()
-    finally:
-        conn.close()
+    notify_change('client_tasks', 'update', [task_id])
 
 def delete_task(task_id):
-    conn = get_db_connection()
-    try:
+    with connection() as conn:
         conn.execute('DELETE FROM client_tasks WHERE id = ?', (task_id,))
         conn.commit()
-    finally:
-        conn.close()
+    notify_change('client_tasks', 'delete', [task_id])
 
-def add_task_to_all_clients(description):
-    conn = get_db_connection()
-    try:
-        # Get all client IDs
-        clients = conn.execute('SELECT id FROM clientes').fetchall()
-        
-        # Batch insert
-        data = [(client['id'], description) for client in clients]
-        conn.executemany('INSERT INTO client_tasks (client_id, description) VALUES (?, ?)', data)
-        conn.commit()
-    finally:
-        conn.close()
+# Operaciones aceptadas por apply_task_operations
+TASK_OPERATIONS = ('complete', 'uncomplete', 'delete', 'edit', 'complete_all')
+
+def apply_task_operations(operations, atomic=False):
+    """
+    Aplica un lote de operaciones sobre tareas en una sola transacción.
+
+    operations: lista de dicts ya validados en forma:
+        {'op': 'complete' | 'uncomplete' | 'delete', 'id': n}
+        {'op': 'edit', 'id': n, 'description': '...'}
+        {'op': 'complete_all', 'client_id': n}   (UPDATE por conjunto de las pendientes del cliente)
+    atomic: si alguna operación no encuentra su tarea/cliente no se aplica nada.
+
+    Las operaciones se agrupan por tipo y cada grupo va en un executemany; los borrados
+    se aplican al final. Retorna {'results', 'applied', 'updated_ids', 'deleted_ids', 'client_ids'}:
+    results tiene un resultado por operación, en el mismo orden.
+    """
+    task_ids = {op['id'] for op in operations if 'id' in op}
+    client_ids = {op['client_id'] for op in operations if op['op'] == 'complete_all'}
+    results = [None] * len(operations)
+
+    with connection() as conn:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            owners = {}
+            for start in range(0, len(task_ids), 500):
+                chunk = list(task_ids)[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT id, client_id FROM client_tasks WHERE id IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                owners.update((row['id'], row['client_id']) for row in rows)
+            existing_clients = set()
+            if client_ids:
+                rows = conn.execute(
+                    f"SELECT id FROM clientes WHERE id IN ({','.join('?' * len(client_ids))})", list(client_ids)
+                ).fetchall()
+                existing_clients = {row['id'] for row in rows}
+
+            groups = {'edit': [], 'status': [], 'delete': []}
+            for index, op in enumerate(operations):
+                if op['op'] == 'complete_all':
+                    found = op['client_id'] in existing_clients
+                elif op['id'] in owners:
+                    found = True
+                    if op['op'] == 'edit':
+                        groups['edit'].append((op['description'], op['id']))
+                    elif op['op'] == 'delete':
+                        groups['delete'].append((op['id'],))
+                    else:
+                        groups['status'].append((1 if op['op'] == 'complete' else 0, op['id']))
+                else:
+                    found = False
+                results[index] = {'op': op['op'], 'status': 'ok' if found else 'not_found'}
+                results[index].update({k: op[k] for k in ('id', 'client_id') if k in op})
+
+            failed = any(r['status'] != 'ok' for r in results)
+            if atomic and failed:
+                conn.rollback()
+                for r in results:
+                    if r['status'] == 'ok':
+                        r['status'] = 'skipped'
+                return {'results': results, 'applied': False, 'updated_ids': [], 'deleted_ids': [], 'client_ids': []}
+
+            if groups['edit']:
+                conn.executemany('UPDATE client_tasks SET description = ? WHERE id = ?', groups['edit'])
+            if groups['status']:
+                conn.executemany('UPDATE client_tasks SET completed = ? WHERE id = ?', groups['status'])
+            for index, op in enumerate(operations):
+                if op['op'] == 'complete_all' and results[index]['status'] == 'ok':
+                    cursor = conn.execute(
+                        'UPDATE client_tasks SET completed = 1 WHERE client_id = ? AND completed = 0',
+                        (op['client_id'],)
+                    )
+                    results[index]['count'] = cursor.rowcount
+            if groups['delete']:
+                conn.executemany('DELETE FROM client_tasks WHERE id = ?', groups['delete'])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    deleted_ids = sorted({row[0] for row in groups['delete']})
+    updated_ids = sorted({row[1] for row in groups['edit'] + groups['status']} - set(deleted_ids))
+    touched_clients = {owners[i] for i in task_ids if i in owners} | existing_clients
+    if updated_ids or existing_clients:
+        notify_change('client_tasks', 'update', updated_ids, client_ids=sorted(existing_clients))
+    if deleted_ids:
+        notify_change('client_tasks', 'delete', deleted_ids)
+    return {
+        'results': results,
+        'applied': True,
+        'updated_ids': updated_ids,
+        'deleted_ids': deleted_ids,
+        'client_ids': sorted(touched_clients),
+    }
+
+def get_tasks_by_ids(task_ids):
+    task_ids = list(task_ids)
+    if not task_ids:
+        return []
+    with connection() as conn:
+        rows = []
+        for start in range(0, len(task_ids), 500):
+            chunk = task_ids[start:start + 500]
+            rows.extend(conn.execute(
+                f"SELECT * FROM client_tasks WHERE id IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall())
+        return rows
+
+# Clientes por transacción al repartir tareas globales (los lectores no quedan bloqueados)
+GLOBAL_TASK_CHUNK = 2000
+
+def add_task_to_all_clients(descriptions, estados=None, empresa_like=None, client_ids=None,
+                            chunk_size=GLOBAL_TASK_CHUNK):
+    """
+    Agrega una o varias tareas a todos los clientes (o a los que cumplan los filtros)
+    con INSERT ... SELECT, sin pasar los ids por Python.
+
+    descriptions: string o lista de strings
+    estados:      lista de valores de clientes.estado
+    empresa_like: patrón LIKE sobre el nombre de la empresa (p. ej. 'Transportes%')
+    client_ids:   lista explícita de clientes
+
+    Un cliente que ya tiene una tarea con la misma descripción no la recibe de nuevo, así
+    que repetir la llamada no duplica. Se confirma cada chunk_size clientes (por rangos de id).
+    Retorna la cantidad de tareas insertadas.
+    """
+    if isinstance(descriptions, str):
+        descriptions = [descriptions]
+    descriptions = list(dict.fromkeys(d.strip() for d in descriptions if d and d.strip()))
+    if not descriptions:
+        return 0
+
+    clauses = []
+    params = []
+    if estados:
+        clauses.append(f"c.estado IN ({','.join('?' * len(estados))})")
+        params.extend(estados)
+    if empresa_like:
+        clauses.append('c.empresa LIKE ?')
+        params.append(empresa_like)
+    if client_ids is not None:
+        if not client_ids:
+            return 0
+        # Lista como JSON: evita el límite de parámetros con miles de ids
+        clauses.append('c.id IN (SELECT value FROM json_each(?))')
+        params.append(json.dumps(list(client_ids)))
+
+    query = f'''
+        INSERT INTO client_tasks (client_id, description)
+        WITH d(description) AS (VALUES {', '.join('(?)' for _ in descriptions)})
+        SELECT c.id, d.description
+        FROM clientes c CROSS JOIN d
+        WHERE c.id > ? AND (? IS NULL OR c.id <= ?)
+          {''.join(f'AND {clause} ' for clause in clauses)}
+          AND NOT EXISTS (
+              SELECT 1 FROM client_tasks t WHERE t.client_id = c.id AND t.description = d.description
+          )
+        ORDER BY c.id
+    '''
+
+    inserted = 0
+    last_id = 0
+    with connection() as conn:
+        while True:
+            # Límite superior del rango: el id número chunk_size a partir de last_id
+            row = conn.execute(
+                'SELECT id FROM clientes WHERE id > ? ORDER BY id LIMIT 1 OFFSET ?',
+                (last_id, chunk_size - 1)
+            ).fetchone()
+            upper = row[0] if row else None
+            with conn:
+                cursor = conn.execute(query, [*descriptions, last_id, upper, upper, *params])
+                inserted += cursor.rowcount
+            if upper is None:
+                break
+            last_id = upper
+
+    if inserted:
+        notify_change('client_tasks', 'insert', count=inserted)
+    return inserted
 
 def get_pending_tasks_by_client(client_id):
     """
     Obtiene todas las tareas pendientes (no completadas) de un cliente
     incluyendo la fecha de creación
     """
-    conn = get_db_connection()
-    try:
+    with connection() as conn:
         tasks = conn.execute('''
             SELECT id, description, created_at, completed
             FROM client_tasks 
@@ -261,5 +1580,654 @@ def get_pending_tasks_by_client(client_id):
             ORDER BY created_at DESC
         ''', (client_id,)).fetchall()
         return tasks
+
+def get_pending_tasks_by_clients(client_ids):
+    """
+    Igual que get_pending_tasks_by_client pero para varios clientes en una sola consulta.
+    Cada fila incluye client_id y empresa del cliente.
+    """
+    client_ids = list(client_ids)
+    if not client_ids:
+        return []
+
+    placeholders = ','.join('?' * len(client_ids))
+    with connection() as conn:
+        tasks = conn.execute(f'''
+            SELECT ct.id, ct.client_id, c.empresa, ct.description, ct.created_at, ct.completed
+            FROM client_tasks ct
+            JOIN clientes c ON c.id = ct.client_id
+            WHERE ct.client_id IN ({placeholders}) AND ct.completed = 0
+            ORDER BY ct.client_id, ct.created_at DESC
+        ''', client_ids).fetchall()
+        return tasks
+
+def get_clientes_by_ids(client_ids):
+    client_ids = list(client_ids)
+    if not client_ids:
+        return []
+
+    placeholders = ','.join('?' * len(client_ids))
+    with connection() as conn:
+        clientes = conn.execute(f'SELECT * FROM clientes WHERE id IN ({placeholders})', client_ids).fetchall()
+        return clientes
+
+# --- JOBS ---
+
+def _job_to_dict(row):
+    if row is None:
+        return None
+    job = dict(row)
+    job['payload'] = json.loads(job['payload']) if job['payload'] else {}
+    job['result'] = json.loads(job['result']) if job['result'] else None
+    return job
+
+def enqueue_job(kind, payload=None):
+    with connection() as conn:
+        cursor = conn.execute(
+            'INSERT INTO jobs (kind, payload) VALUES (?, ?)',
+            (kind, json.dumps(payload or {}))
+        )
+        conn.commit()
+        return cursor.lastrowid
+
+def get_job(job_id):
+    with connection() as conn:
+        return _job_to_dict(conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone())
+
+def claim_next_job():
+    """Toma el trabajo en cola más antiguo y lo marca 'running' de forma atómica."""
+    with connection() as conn:
+        row = conn.execute('''
+            UPDATE jobs SET status = 'running', updated_at = CURRENT_TIMESTAMP
+            WHERE id = (SELECT id FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1)
+            RETURNING *
+        ''').fetchone()
+        conn.commit()
+        return _job_to_dict(row)
+
+def update_job_progress(job_id, done, total=None):
+    with connection() as conn:
+        conn.execute('''
+            UPDATE jobs SET progress_done = ?, progress_total = COALESCE(?, progress_total),
+                            updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (done, total, job_id))
+        conn.commit()
+
+def finish_job(job_id, status, result=None, error=None):
+    with connection() as conn:
+        conn.execute('''
+            UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (status, json.dumps(result) if result is not None else None, error, job_id))
+        conn.commit()
+
+def requeue_stale_jobs(older_than_minutes=30):
+    """Devuelve a la cola los trabajos 'running' sin avances recientes (proceso caído)."""
+    with connection() as conn:
+        cursor = conn.execute('''
+            UPDATE jobs SET status = 'queued', updated_at = CURRENT_TIMESTAMP
+            WHERE status = 'running' AND updated_at < datetime('now', ?)
+        ''', (f'-{older_than_minutes} minutes',))
+        conn.commit()
+        return cursor.rowcount
+
+# --- BÚSQUEDA ---
+
+_search_index_ready = set()
+
+def has_search_index():
+    """True si la base tiene los índices FTS5 (SQLite compilado con FTS5)."""
+    if DB_NAME in _search_index_ready:
+        return True
+    with connection() as conn:
+        found = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'clientes_fts'"
+        ).fetchone()
+    if found:
+        _search_index_ready.add(DB_NAME)
+    return bool(found)
+
+def _search_terms(text):
+    return re.findall(r'\w+', text or '')
+
+def fts_query(text):
+    """Convierte texto libre en una consulta FTS5: todos los términos, por prefijo."""
+    return ' '.join(f'"{term}"*' for term in _search_terms(text))
+
+def _match_clause(fts_name, id_expr, text):
+    """
+    Condición SQL '<id_expr> IN (...)' con las filas que coinciden con 'text'.
+    Usa el índice FTS5 si existe y si no, LIKE sobre las mismas columnas.
+    """
+    content, columns = FTS_TABLES[fts_name]
+    terms = _search_terms(text)
+    if not terms:
+        return '1 = 1', []
+
+    if has_search_index():
+        return f'{id_expr} IN (SELECT rowid FROM {fts_name} WHERE {fts_name} MATCH ?)', [fts_query(text)]
+
+    term_clauses = []
+    params = []
+    for term in terms:
+        term_clauses.append('(' + ' OR '.join(f'{c} LIKE ?' for c in columns) + ')')
+        params.extend([f'%{term}%'] * len(columns))
+    return f"{id_expr} IN (SELECT id FROM {content} WHERE {' AND '.join(term_clauses)})", params
+
+def search(text, limit=20):
+    """
+    Busca en clientes, tareas de clientes y pendientes.
+    Retorna {'clientes': [...], 'tasks': [...], 'pendientes': [...]} ordenados por relevancia.
+    """
+    result = {'clientes': [], 'tasks': [], 'pendientes': []}
+    if not _search_terms(text):
+        return result
+
+    use_fts = has_search_index()
+    with connection() as conn:
+        def run(fts_name, select, table, order, extra_join=''):
+            if use_fts:
+                query = f'''
+                    SELECT {select}, snippet({fts_name}, -1, '[', ']', '…', 12) AS snippet
+                    FROM {fts_name}
+                    JOIN {table} ON t.id = {fts_name}.rowid
+                    {extra_join}
+                    WHERE {fts_name} MATCH ?
+                    ORDER BY rank
+                    LIMIT ?
+                '''
+                return conn.execute(query, (fts_query(text), limit)).fetchall()
+            clause, params = _match_clause(fts_name, 't.id', text)
+            query = f'SELECT {select}, NULL AS snippet FROM {table} {extra_join} WHERE {clause} ORDER BY {order} LIMIT ?'
+            return conn.execute(query, params + [limit]).fetchall()
+
+        result['clientes'] = run(
+            'clientes_fts', 't.id, t.empresa, t.observaciones', 'clientes t', 't.empresa'
+        )
+        result['tasks'] = run(
+            'client_tasks_fts', 't.id, t.client_id, c.empresa, t.description, t.completed',
+            'client_tasks t', 't.id DESC', 'JOIN clientes c ON c.id = t.client_id'
+        )
+        result['pendientes'] = run(
+            'pendientes_fts', 't.id, t.actividad, t.descripcion, t.empresa, t.estado, t.fecha_limite',
+            'pendientes t', 't.fecha_limite'
+        )
+    return result
+
+# --- ESTADÍSTICAS ---
+
+# Cantidad de filas en los rankings de get_stats
+STATS_TOP = 10
+
+def get_stats(today=None, due_days=7, top=STATS_TOP):
+    """
+    Resumen para el tablero, todo agregado en SQL dentro de una misma transacción de lectura:
+
+        pendientes_by_estado   contador por estado (pendientes_estado_counts)
+        overdue / due_soon     pendientes abiertos vencidos y que vencen en los próximos due_days
+        overdue_by_empresa     los 'top' empresas con más vencidos
+        due_soon_by_recipient  los 'top' destinatarios con más vencimientos próximos
+        clientes_by_status     clientes por estado dinámico (client_task_stats)
+        tasks                  tareas totales, completadas y tasa de completado
+
+    Vencidos y próximos recorren solo el rango de fecha_limite que corresponde dentro de
+    idx_pendientes_estado_fecha_limite; los demás leen los contadores mantenidos por triggers.
+    """
+    today = today or date.today()
+    due_end = today + timedelta(days=due_days)
+    open_marks = ','.join('?' * len(OPEN_ESTADOS))
+
+    with connection() as conn:
+        with conn:
+            # Todas las lecturas sobre la misma instantánea de la base
+            conn.execute('BEGIN')
+            by_estado = conn.execute(
+                'SELECT estado, total FROM pendientes_estado_counts WHERE total > 0 ORDER BY estado'
+            ).fetchall()
+            overdue = conn.execute(f'''
+                SELECT empresa, MAX(client_id) AS client_id, COUNT(*) AS count
+                FROM pendientes
+                WHERE estado IN ({open_marks}) AND fecha_limite > '' AND fecha_limite < ?
+                GROUP BY empresa
+                ORDER BY count DESC, empresa
+            ''', (*OPEN_ESTADOS, today.isoformat())).fetchall()
+            due_soon = conn.execute(f'''
+                SELECT email_notificacion AS recipient, COUNT(*) AS count
+                FROM pendientes
+                WHERE estado IN ({open_marks}) AND fecha_limite BETWEEN ? AND ?
+                GROUP BY email_notificacion
+                ORDER BY count DESC, recipient
+            ''', (*OPEN_ESTADOS, today.isoformat(), due_end.isoformat())).fetchall()
+            by_status = conn.execute(f'''
+                SELECT {CLIENT_STATUS_SQL} AS status, COUNT(*) AS count
+                FROM clientes c
+                LEFT JOIN client_task_stats s ON s.client_id = c.id
+                GROUP BY status
+            ''').fetchall()
+            total_tasks, completed_tasks = conn.execute(
+                'SELECT COALESCE(SUM(total_tasks), 0), COALESCE(SUM(completed_tasks), 0) FROM client_task_stats'
+            ).fetchone()
+
+    pendientes_by_estado = {row['estado']: row['total'] for row in by_estado}
+    return {
+        'today': today.isoformat(),
+        'due_days': due_days,
+        'pendientes_total': sum(pendientes_by_estado.values()),
+        'pendientes_by_estado': pendientes_by_estado,
+        'open': sum(pendientes_by_estado.get(estado, 0) for estado in OPEN_ESTADOS),
+        'overdue': sum(row['count'] for row in overdue),
+        'due_soon': sum(row['count'] for row in due_soon),
+        'overdue_by_empresa': [dict(row) for row in overdue[:top]],
+        'due_soon_by_recipient': [dict(row) for row in due_soon[:top]],
+        'clientes_total': sum(row['count'] for row in by_status),
+        'clientes_by_status': {status: 0 for status in CLIENT_STATUSES} | {row['status']: row['count'] for row in by_status},
+        'tasks': {
+            'total': total_tasks,
+            'completed': completed_tasks,
+            'completion_rate': round(completed_tasks / total_tasks, 4) if total_tasks else None,
+        },
+    }
+
+# --- SINCRONIZACIÓN ---
+
+def get_sync_cursor():
+    """Versión actual de sincronización (crece con cada escritura en las tablas sincronizadas)."""
+    with connection() as conn:
+        row = conn.execute('SELECT seq FROM sync_state WHERE id = 1').fetchone()
+        return row[0] if row else 0
+
+def get_tombstone_floor():
+    """Versión hasta la que se purgaron tombstones: un cursor anterior ya no ve todos los borrados."""
+    with connection() as conn:
+        row = conn.execute('SELECT tombstone_floor FROM sync_state WHERE id = 1').fetchone()
+        return row[0] if row else 0
+
+def get_pendientes_since(since):
+    with connection() as conn:
+        return conn.execute(
+            'SELECT * FROM pendientes WHERE row_version > ? ORDER BY row_version', (since,)
+        ).fetchall()
+
+def get_deleted_since(table, since):
+    """Ids borrados de 'table' después de la versión 'since'."""
+    with connection() as conn:
+        rows = conn.execute(
+            'SELECT row_id FROM tombstones WHERE table_name = ? AND version > ? ORDER BY version',
+            (table, since)
+        ).fetchall()
+        return [row['row_id'] for row in rows]
+
+
+# --- EXPORTACIÓN / IMPORTACIÓN ---
+
+# Columnas que se exportan y se aceptan al importar (mismo formato en ambos sentidos)
+EXPORT_COLUMNS = {
+    'pendientes': ('id', 'fecha', 'actividad', 'descripcion', 'empresa', 'estado', 'observaciones',
+                   'fecha_limite', 'email_notificacion', 'dias_antes_notificacion', 'client_id'),
+    'clientes': ('id', 'empresa', 'observaciones', 'check_estado', 'procedimiento', 'estado'),
+    'client_tasks': ('id', 'client_id', 'description', 'completed', 'created_at'),
+}
+
+EXPORT_BATCH_SIZE = 1000
+
+def _iter_export(table, source, alias, clauses, params, batch_size):
+    """
+    Filas (tuplas) en orden de id, leídas por bloques keyset (id > último).
+    Cada bloque es una consulta corta con una conexión del pool: una descarga larga
+    no mantiene abierta una transacción de lectura ni carga la tabla en memoria.
+    """
+    columns = ', '.join(f'{alias}.{c}' for c in EXPORT_COLUMNS[table])
+    where = ''.join(f' AND {clause}' for clause in clauses)
+    query = f'SELECT {columns} FROM {source} WHERE {alias}.id > ?{where} ORDER BY {alias}.id LIMIT ?'
+
+    last_id = 0
+    while True:
+        with connection() as conn:
+            rows = tuple_rows(conn, query, [last_id, *params, batch_size])
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        last_id = rows[-1][0]
+
+def export_pendientes(estados=None, empresa=None, fecha_desde=None, fecha_hasta=None, q=None,
+                      client_id=None, batch_size=EXPORT_BATCH_SIZE):
+    clauses, params = _pendientes_filters(estados, empresa, fecha_desde, fecha_hasta, q, client_id)
+    return _iter_export('pendientes', 'pendientes', 'pendientes', clauses, params, batch_size)
+
+def export_clientes(q=None, status=None, batch_size=EXPORT_BATCH_SIZE):
+    clauses, params = _clientes_filters(q, status)
+    source = 'clientes c LEFT JOIN client_task_stats s ON s.client_id = c.id'
+    return _iter_export('clientes', source, 'c', clauses, params, batch_size)
+
+def export_client_tasks(client_id=None, batch_size=EXPORT_BATCH_SIZE):
+    clauses, params = ([], []) if client_id is None else (['client_id = ?'], [client_id])
+    return _iter_export('client_tasks', 'client_tasks', 'client_tasks', clauses, params, batch_size)
+
+def existing_ids(table, ids):
+    """Subconjunto de ids que ya existen en la tabla."""
+    ids = [i for i in set(ids) if i is not None]
+    if not ids:
+        return set()
+    found = set()
+    with connection() as conn:
+        # Por tandas para no pasar el límite de parámetros de SQLite
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            rows = conn.execute(
+                f"SELECT id FROM {table} WHERE id IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            found.update(row[0] for row in rows)
+    return found
+
+def insert_rows(table, columns, rows):
+    """
+    Inserta un bloque de filas importadas en una transacción. Las filas cuyo id ya
+    existe se ignoran. Retorna cuántas se insertaron.
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+    with connection() as conn:
+        with conn:
+            cursor = conn.executemany(
+                f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                rows
+            )
+            inserted = cursor.rowcount
+    if inserted:
+        notify_change(table, 'insert', count=inserted)
+    return inserted
+
+# --- MANTENIMIENTO ---
+#
+# Todo corre con la app en línea: cada lote es una transacción corta (BEGIN IMMEDIATE
+# toma el bloqueo de escritura solo mientras dura el lote) y entre lotes se hace una
+# pausa para que las escrituras de la API pasen primero.
+
+MAINTENANCE_CHUNK = 500
+MAINTENANCE_PAUSE = 0.05
+
+# Filas terminadas que pueden pasar al archivo: (tabla, condición). updated_at la
+# mantienen los triggers de sincronización, así que "hace N días" es desde el último cambio.
+ARCHIVE_RULES = {
+    'pendientes': "estado IN ('Completado', 'Cancelado') AND updated_at < :cutoff",
+    'client_tasks': 'completed = 1 AND updated_at < :cutoff',
+}
+
+def archive_path():
+    """Base de archivo por defecto: pendientes.db -> pendientes_archive.db"""
+    return os.path.splitext(DB_NAME)[0] + '_archive.db'
+
+def _cutoff(conn, days):
+    # Mismo formato y zona (UTC) que CURRENT_TIMESTAMP en updated_at / deleted_at
+    return conn.execute("SELECT datetime('now', ?)", (f'-{int(days)} days',)).fetchone()[0]
+
+def _maintenance_connection():
+    """Conexión propia (fuera del pool): ATTACH y PRAGMAs no deben quedar en conexiones compartidas."""
+    conn = get_db_connection()
+    conn.isolation_level = None
+    return conn
+
+def _ensure_archive_table(conn, table):
+    """Crea archive.<table> con las columnas actuales de main.<table> más archived_at."""
+    columns = [row['name'] for row in conn.execute(f'PRAGMA main.table_info({table})')]
+    existing = {row['name'] for row in conn.execute(f'PRAGMA archive.table_info({table})')}
+    if not existing:
+        conn.execute(f"CREATE TABLE archive.{table} ({', '.join(columns)}, archived_at TEXT)")
+        conn.execute(f'CREATE UNIQUE INDEX archive.idx_{table}_id ON {table} (id)')
+    else:
+        # La tabla viva ganó columnas desde el último archivado
+        for column in columns:
+            if column not in existing:
+                conn.execute(f'ALTER TABLE archive.{table} ADD COLUMN {column}')
+    return columns
+
+def _ensure_archive_table_like(conn, table):
+    """Copia fiel (mismas claves) de una tabla auxiliar en la base de archivo."""
+    columns = [row['name'] for row in conn.execute(f'PRAGMA main.table_info({table})')]
+    if not conn.execute('SELECT 1 FROM archive.sqlite_master WHERE name = ?', (table,)).fetchone():
+        sql = conn.execute('SELECT sql FROM main.sqlite_master WHERE name = ?', (table,)).fetchone()[0]
+        conn.execute(re.sub(r'^CREATE TABLE (IF NOT EXISTS )?\S+', f'CREATE TABLE archive.{table}', sql))
+    return columns
+
+def archive_finished(days, path=None, tables=tuple(ARCHIVE_RULES), chunk_size=MAINTENANCE_CHUNK,
+                     pause=MAINTENANCE_PAUSE, dry_run=False, progress=None):
+    """
+    Mueve a la base de archivo (ATTACH) los pendientes completados/cancelados y las tareas
+    completadas sin cambios hace más de 'days' días. Con los pendientes viaja su
+    notification_log.
+
+    Por lote: se eligen ids sin bloquear, y dentro de BEGIN IMMEDIATE se copian con
+    INSERT OR REPLACE y se borran de la tabla viva, volviendo a aplicar la condición (si
+    la fila cambió entretanto, se queda). En WAL el commit no es atómico entre las dos
+    bases; si el proceso se corta entre ambas, la próxima corrida reemplaza la copia y
+    termina el borrado.
+
+    Los borrados dejan tombstones (los clientes sincronizados quitan esas filas). Las tareas
+    archivadas siguen contando en client_task_stats (total y completadas), así que el
+    estado del cliente en /api/clientes y /api/stats no cambia. Retorna {tabla: filas movidas}.
+    """
+    path = path or archive_path()
+    moved = {}
+    conn = _maintenance_connection()
+    try:
+        cutoff = _cutoff(conn, days)
+        conn.execute('ATTACH DATABASE ? AS archive', (path,))
+        conn.execute('PRAGMA archive.journal_mode = WAL')
+        for table in tables:
+            condition = ARCHIVE_RULES[table]
+            if dry_run:
+                moved[table] = conn.execute(
+                    f'SELECT COUNT(*) FROM main.{table} WHERE {condition}', {'cutoff': cutoff}
+                ).fetchone()[0]
+                continue
+
+            columns = _ensure_archive_table(conn, table)
+            if table == 'pendientes':
+                log_columns = _ensure_archive_table_like(conn, 'notification_log')
+            cols = ', '.join(columns)
+            moved[table] = 0
+            last_id = 0
+            while True:
+                ids = [row[0] for row in conn.execute(
+                    f'SELECT id FROM main.{table} WHERE id > :after AND {condition} ORDER BY id LIMIT :limit',
+                    {'after': last_id, 'cutoff': cutoff, 'limit': chunk_size}
+                )]
+                if not ids:
+                    break
+                last_id = ids[-1]
+                params = {'ids': json.dumps(ids), 'cutoff': cutoff}
+                selected = f'main.{table} WHERE id IN (SELECT value FROM json_each(:ids)) AND {condition}'
+
+                conn.execute('BEGIN IMMEDIATE')
+                try:
+                    conn.execute(
+                        f'INSERT OR REPLACE INTO archive.{table} ({cols}, archived_at) '
+                        f'SELECT {cols}, CURRENT_TIMESTAMP FROM {selected}', params
+                    )
+                    if table == 'pendientes':
+                        conn.execute(
+                            f"INSERT OR REPLACE INTO archive.notification_log ({', '.join(log_columns)}) "
+                            f"SELECT {', '.join(log_columns)} FROM main.notification_log "
+                            f"WHERE pendiente_id IN (SELECT id FROM {selected})", params
+                        )
+                    if table == 'client_tasks':
+                        # Compensa lo que descuenta trg_client_task_stats_delete: una tarea
+                        # archivada sigue contando como hecha (el cliente no pasa a 'Sin Tareas')
+                        conn.execute(
+                            f'UPDATE client_task_stats SET '
+                            f'total_tasks = total_tasks + (SELECT COUNT(*) FROM {selected} AND client_id = client_task_stats.client_id), '
+                            f'completed_tasks = completed_tasks + (SELECT COUNT(*) FROM {selected} AND client_id = client_task_stats.client_id) '
+                            f'WHERE client_id IN (SELECT client_id FROM {selected})', params
+                        )
+                    cursor = conn.execute(f'DELETE FROM {selected}', params)
+                    conn.execute('COMMIT')
+                except Exception:
+                    conn.execute('ROLLBACK')
+                    raise
+                moved[table] += cursor.rowcount
+                if progress:
+                    progress(table, moved[table])
+                time.sleep(pause)
+            if moved[table]:
+                notify_change(table, 'delete', count=moved[table])
     finally:
         conn.close()
+    return moved
+
+# Tabla -> (columna por la que se recorre en bloques, condición de huérfano)
+ORPHAN_RULES = {
+    'client_tasks': ('id', 'client_id NOT IN (SELECT id FROM clientes)'),
+    'client_task_stats': ('client_id', 'client_id NOT IN (SELECT id FROM clientes)'),
+    # notification_log es WITHOUT ROWID: se recorre por pendiente
+    'notification_log': ('pendiente_id', 'pendiente_id NOT IN (SELECT id FROM pendientes)'),
+}
+
+def purge_orphans(chunk_size=MAINTENANCE_CHUNK, pause=MAINTENANCE_PAUSE):
+    """
+    Borra tareas, contadores y registros de avisos que apuntan a filas inexistentes.
+    Igual que archive_finished: bloques keyset de chunk_size claves, cada uno en su propio
+    BEGIN IMMEDIATE que vuelve a aplicar la condición, con una pausa entre bloques.
+    Retorna {tabla: filas}.
+    """
+    purged = {}
+    conn = _maintenance_connection()
+    try:
+        for table, (key, condition) in ORPHAN_RULES.items():
+            purged[table] = 0
+            last_key = 0
+            while True:
+                keys = [row[0] for row in conn.execute(
+                    f'SELECT DISTINCT {key} FROM {table} WHERE {key} > ? AND {condition} ORDER BY {key} LIMIT ?',
+                    (last_key, chunk_size)
+                )]
+                if not keys:
+                    break
+                last_key = keys[-1]
+
+                conn.execute('BEGIN IMMEDIATE')
+                try:
+                    cursor = conn.execute(
+                        f'DELETE FROM {table} WHERE {key} IN (SELECT value FROM json_each(?)) AND {condition}',
+                        (json.dumps(keys),)
+                    )
+                    conn.execute('COMMIT')
+                except Exception:
+                    conn.execute('ROLLBACK')
+                    raise
+                purged[table] += cursor.rowcount
+                time.sleep(pause)
+    finally:
+        conn.close()
+    if purged['client_tasks']:
+        notify_change('client_tasks', 'delete', count=purged['client_tasks'])
+    return purged
+
+def purge_tombstones(days, chunk_size=MAINTENANCE_CHUNK * 10, pause=MAINTENANCE_PAUSE):
+    """
+    Borra tombstones de más de 'days' días y sube sync_state.tombstone_floor a la mayor
+    versión borrada: un cliente con un cursor anterior recibe 410 y recarga la lista
+    completa en vez de perder borrados. Retorna cuántos se borraron.
+    """
+    purged = 0
+    with connection() as conn:
+        cutoff = _cutoff(conn, days)
+        while True:
+            with conn:
+                floor = conn.execute(
+                    'SELECT MAX(version) FROM (SELECT version FROM tombstones WHERE deleted_at < ? '
+                    'ORDER BY version LIMIT ?)', (cutoff, chunk_size)
+                ).fetchone()[0]
+                if floor is None:
+                    break
+                cursor = conn.execute('DELETE FROM tombstones WHERE version <= ? AND deleted_at < ?', (floor, cutoff))
+                conn.execute(
+                    'UPDATE sync_state SET tombstone_floor = MAX(tombstone_floor, ?) WHERE id = 1', (floor,)
+                )
+            purged += cursor.rowcount
+            time.sleep(pause)
+    return purged
+
+def optimize(full=False):
+    """
+    Actualiza las estadísticas del planificador. Por defecto PRAGMA optimize con
+    analysis_limit (solo analiza lo que cambió, en milisegundos); full=True hace ANALYZE
+    completo. Retorna los segundos que tomó.
+    """
+    start = time.perf_counter()
+    conn = _maintenance_connection()
+    try:
+        if full:
+            conn.execute('ANALYZE')
+        else:
+            conn.execute('PRAGMA analysis_limit = 1000')
+            conn.execute('PRAGMA optimize')
+    finally:
+        conn.close()
+    return time.perf_counter() - start
+
+def incremental_vacuum(max_pages=None, step=1000, pause=MAINTENANCE_PAUSE):
+    """
+    Devuelve al sistema las páginas libres de a 'step' por transacción (~4 MB) y hace un
+    checkpoint PASSIVE del WAL (no espera a los lectores). Requiere auto_vacuum=INCREMENTAL,
+    que las bases nuevas ya traen; en una base existente se activa una vez con
+    enable_incremental_vacuum(). Retorna las páginas liberadas (None si no está activo).
+    """
+    conn = _maintenance_connection()
+    try:
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            return None
+        freed = 0
+        while max_pages is None or freed < max_pages:
+            free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            if not free:
+                break
+            pages = min(step, free) if max_pages is None else min(step, free, max_pages - freed)
+            # Con execute() el módulo sqlite3 da un solo paso y libera una única página
+            conn.executescript(f'PRAGMA incremental_vacuum({int(pages)})')
+            freed += free - conn.execute('PRAGMA freelist_count').fetchone()[0]
+            time.sleep(pause)
+        conn.execute('PRAGMA wal_checkpoint(PASSIVE)').fetchall()
+        return freed
+    finally:
+        conn.close()
+
+def enable_incremental_vacuum():
+    """
+    Pasa una base existente a auto_vacuum=INCREMENTAL. Necesita un VACUUM completo, que
+    reescribe el archivo y bloquea las escrituras mientras dura: hacerlo una sola vez,
+    fuera de horario.
+    """
+    conn = _maintenance_connection()
+    try:
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+    finally:
+        conn.close()
+
+def get_maintenance_stats(path=None):
+    """Filas vivas y archivadas, tombstones, páginas libres y tamaños de archivo."""
+    path = path or archive_path()
+    with connection() as conn:
+        stats = {
+            'tables': {t: conn.execute(f'SELECT COUNT(*) FROM {t}').fetchone()[0]
+                       for t in ('pendientes', 'clientes', 'client_tasks', 'notification_log', 'tombstones')},
+            'tombstone_floor': conn.execute('SELECT tombstone_floor FROM sync_state WHERE id = 1').fetchone()[0],
+            'page_size': conn.execute('PRAGMA page_size').fetchone()[0],
+            'page_count': conn.execute('PRAGMA page_count').fetchone()[0],
+            'freelist_count': conn.execute('PRAGMA freelist_count').fetchone()[0],
+            'auto_vacuum': ('none', 'full', 'incremental')[conn.execute('PRAGMA auto_vacuum').fetchone()[0]],
+        }
+    stats['db_bytes'] = os.path.getsize(DB_NAME)
+    stats['wal_bytes'] = os.path.getsize(DB_NAME + '-wal') if os.path.exists(DB_NAME + '-wal') else 0
+    stats['archive'] = {}
+    if os.path.exists(path):
+        archive = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+        try:
+            for (table,) in archive.execute("SELECT name FROM sqlite_master WHERE type = 'table'"):
+                stats['archive'][table] = archive.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+        finally:
+            archive.close()
+        stats['archive_bytes'] = os.path.getsize(path)
+    return stats
@@ -0,0 +1,246 @@
+"""
+Hub de eventos de cambios para /api/events (Server-Sent Events).
+
+Las funciones de escritura de database.py avisan cada cambio (tabla, operación, ids) y
+el hub lo reparte a todas las conexiones abiertas. Cada suscriptor es solo una cola
+acotada: una conexión inactiva no consume CPU. Con el servidor gevent (serve_gevent.py)
+cada conexión es una greenlet, así que cientos de clientes caben en un proceso.
+
+Un único hilo vigila además sync_state.seq para avisar cambios hechos por otros
+procesos (scheduler, otro worker, scripts).
+
+Con asgi.py las conexiones no usan hilos: LoopRelay se suscribe una sola vez al hub y
+reparte cada evento, ya dentro del event loop, a la cola asyncio de cada conexión.
+"""
+import asyncio
+import itertools
+import json
+import queue
+import threading
+import time
+from collections import deque
+
+import database
+
+# Eventos recientes que se reenvían a un cliente que reconecta con Last-Event-ID
+HISTORY_SIZE = 500
+# Eventos pendientes por conexión antes de considerarla atrasada
+SUBSCRIBER_QUEUE_SIZE = 200
+# Segundos entre comentarios keep-alive (evita que proxies corten la conexión)
+KEEPALIVE_SECONDS = 15
+# Segundos entre revisiones de cambios de otros procesos
+EXTERNAL_POLL_SECONDS = 1.0
+
+
+class Subscriber:
+    def __init__(self):
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflow = False
+        self.connections = 1
+
+    def put(self, item):
+        """False si la cola está llena."""
+        try:
+            self.queue.put_nowait(item)
+            return True
+        except queue.Full:
+            # Cliente lento: se le pedirá recargar en vez de acumular eventos sin límite
+            self.overflow = True
+            return False
+
+
+class LoopRelay:
+    """
+    Suscriptor del hub para todas las conexiones SSE de un event loop: cada evento cruza
+    de hilo una sola vez (call_soon_threadsafe) y se reparte en el loop.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.subscribers = set()
+        self.dropped = 0
+
+    @property
+    def connections(self):
+        return len(self.subscribers)
+
+    def put(self, item):
+        self.loop.call_soon_threadsafe(self._fanout, item)
+        return True
+
+    def _fanout(self, item):
+        for sub in list(self.subscribers):
+            try:
+                sub.queue.put_nowait(item)
+            except asyncio.QueueFull:
+                sub.overflow = True
+                self.dropped += 1
+
+    def subscribe(self):
+        sub = AsyncSubscriber()
+        self.subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        self.subscribers.discard(sub)
+
+
+class AsyncSubscriber:
+    def __init__(self):
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflow = False
+
+
+class EventHub:
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._history = deque(maxlen=HISTORY_SIZE)
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, sub=None):
+        sub = sub or Subscriber()
+        with self._lock:
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def publish(self, data, event='change'):
+        with self._lock:
+            item = (next(self._ids), event, json.dumps(data))
+            self._history.append(item)
+            subscribers = list(self._subscribers)
+            self.published += 1
+
+        for sub in subscribers:
+            if not sub.put(item):
+                self.dropped += 1
+
+    def replay_since(self, last_id):
+        """Eventos posteriores a last_id, o None si ya no están en el historial."""
+        with self._lock:
+            if not self._history:
+                return []
+            if last_id < self._history[0][0] - 1:
+                return None
+            return [item for item in self._history if item[0] > last_id]
+
+    def stats(self):
+        with self._lock:
+            relays = [sub for sub in self._subscribers if isinstance(sub, LoopRelay)]
+            return {
+                'subscribers': sum(sub.connections for sub in self._subscribers),
+                'published': self.published,
+                'dropped': self.dropped + sum(relay.dropped for relay in relays),
+                'history': len(self._history),
+            }
+
+
+hub = EventHub()
+
+
+def _format(event_id, event, data):
+    return f'id: {event_id}\nevent: {event}\ndata: {data}\n\n'
+
+
+def parse_last_event_id(value):
+    """Valor del header Last-Event-ID (o ?lastEventId=) como int, None si falta o no es válido."""
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+def _preamble(last_event_id):
+    yield 'retry: 3000\n\n'
+    if last_event_id is not None:
+        missed = hub.replay_since(last_event_id)
+        if missed is None:
+            yield _format(0, 'resync', '{}')
+        else:
+            for item in missed:
+                yield _format(*item)
+
+
+def stream(last_event_id=None):
+    """Generador de texto SSE para una conexión."""
+    sub = hub.subscribe()
+    try:
+        yield from _preamble(last_event_id)
+
+        while True:
+            if sub.overflow:
+                sub.overflow = False
+                yield _format(0, 'resync', '{}')
+            try:
+                item = sub.queue.get(timeout=KEEPALIVE_SECONDS)
+            except queue.Empty:
+                yield ': keep-alive\n\n'
+                continue
+            yield _format(*item)
+    finally:
+        hub.unsubscribe(sub)
+
+
+async def astream(relay, last_event_id=None):
+    """Igual que stream(), como generador asíncrono sobre el LoopRelay del event loop."""
+    sub = relay.subscribe()
+    try:
+        for chunk in _preamble(last_event_id):
+            yield chunk
+
+        while True:
+            if sub.overflow:
+                sub.overflow = False
+                yield _format(0, 'resync', '{}')
+            try:
+                item = await asyncio.wait_for(sub.queue.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+            yield _format(*item)
+    finally:
+        relay.unsubscribe(sub)
+
+
+def _on_database_change(change):
+    hub.publish(change)
+
+
+_watcher = None
+_watcher_lock = threading.Lock()
+
+
+def _watch_external_changes():
+    last_seq = None
+    last_published = hub.published
+    while True:
+        time.sleep(EXTERNAL_POLL_SECONDS)
+        try:
+            seq = database.get_sync_cursor()
+        except Exception:
+            continue
+        published = hub.published
+        # Si en el intervalo hubo eventos propios, el seq ya se movió por ellos y los
+        # clientes van a pedir el delta igual; solo se avisa si el cambio vino de afuera
+        if last_seq is not None and seq != last_seq and published == last_published:
+            hub.publish({'table': '*', 'op': 'sync', 'cursor': seq})
+            published = hub.published
+        last_seq = seq
+        last_published = published
+
+
+def start():
+    """Conecta el hub a database.py y arranca (una vez) el vigilante de otros procesos."""
+    global _watcher
+    with _watcher_lock:
+        if _watcher is not None:
+            return
+        database.add_change_listener(_on_database_change)
+        _watcher = threading.Thread(target=_watch_external_changes, name='events-watcher', daemon=True)
+        _watcher.start()
@@ -13,21 +13,55 @@ export const api = axios.create({
 });
 
 export const getPendientes = () => api.get('/pendientes');
+export const getPendientesPage = (params) => api.get('/pendientes', { params });
+export const getPendiente = (id) => api.get(`/pendientes/${id}`);
+export const getPendientesSince = (since) => api.get('/pendientes', { params: { since } });
 export const addPendiente = (data) => api.post('/pendientes', data);
 export const updatePendiente = (id, data) => api.put(`/pendientes/${id}`, data);
 export const deletePendiente = (id) => api.delete(`/pendientes/${id}`);
 export const notifyPendiente = (id) => api.post(`/notify/${id}`);
+export const getJob = (jobId) => api.get(`/jobs/${jobId}`);
+// Contadores del tablero calculados en el servidor: { open, overdue, due_soon, clientes_by_status, tasks, ... }
+export const getStats = (params) => api.get('/stats', { params });
 
-export const getClientes = () => api.get('/clientes');
+// Exportación en streaming (se descarga con una navegación normal, no con axios)
+export const exportUrl = (table, params = {}) => `${API_URL}/export/${table}?${new URLSearchParams(params)}`;
+export const importTable = (table, file, dryRun = false) => {
+    const form = new FormData();
+    form.append('file', file);
+    return api.post(`/import/${table}`, form, {
+        params: dryRun ? { dry_run: 1 } : {},
+        headers: { 'Content-Type': 'multipart/form-data' },
+    });
+};
+
+// Cambios en vivo (Server-Sent Events). onChange recibe {table, op, ids, ...};
+// onResync se llama si se perdieron eventos y conviene recargar. Retorna la función para cerrar.
+export const subscribeEvents = (onChange, onResync) => {
+    const source = new EventSource(`${API_URL}/events`);
+    source.addEventListener('change', (e) => onChange(JSON.parse(e.data)));
+    source.addEventListener('resync', () => onResync && onResync());
+    return () => source.close();
+};
+
+export const getClientes = (params) => api.get('/clientes', { params });
+export const getClientesSince = (since) => api.get('/clientes', { params: { since } });
+export const search = (q, limit = 20) => api.get('/search', { params: { q, limit } });
 export const addCliente = (data) => api.post('/clientes', data);
 export const updateCliente = (id, data) => api.put(`/clientes/${id}`, data);
 export const deleteCliente = (id) => api.delete(`/clientes/${id}`);
 
 export const getClientTasks = (clientId) => api.get(`/clients/${clientId}/tasks`);
+// params: los mismos filtros y paginación que getPendientesPage
+export const getClientPendientes = (clientId, params) => api.get(`/clients/${clientId}/pendientes`, { params });
 export const addClientTask = (clientId, description) => api.post(`/clients/${clientId}/tasks`, { description });
 export const addClientTasksBulk = (clientId, tasks) => api.post(`/clients/${clientId}/tasks/bulk`, { tasks });
 export const updateTaskStatus = (taskId, completed) => api.put(`/tasks/${taskId}`, { completed });
 export const deleteTask = (taskId) => api.delete(`/tasks/${taskId}`);
-export const addGlobalTask = (description) => api.post('/tasks/global', { description });
+// Lote de operaciones en una transacción: complete / uncomplete / delete / edit / complete_all
+export const patchTasks = (operations, atomic = false) => api.patch('/tasks', { operations, atomic });
+// filters: { estado, empresa_like, client_ids }
+export const addGlobalTask = (descriptions, filters = {}) => api.post('/tasks/global', { descriptions, ...filters });
 export const createPendingTasks = (clientId, data) => api.post(`/clients/${clientId}/create-pending-tasks`, data);
+export const createPendingTasksMulti = (data) => api.post('/clients/create-pending-tasks', data);
 
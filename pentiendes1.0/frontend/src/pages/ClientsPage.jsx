@@ -1,8 +1,6 @@
 import React, { useEffect, useState } from 'react';
 import { UserPlus, Trash2, Edit2, Building, Search, Download, ListChecks, CheckSquare, Plus, Upload, MoreHorizontal, Mail, Filter, Calendar } from 'lucide-react';
-import { getClientes, addCliente, updateCliente, deleteCliente, getClientTasks, addClientTask, updateTaskStatus, deleteTask, addGlobalTask, addClientTasksBulk, createPendingTasks } from '../api';
-import ExcelJS from 'exceljs';
-import { saveAs } from 'file-saver';
+import { getClientes, addCliente, updateCliente, deleteCliente, getClientTasks, addClientTask, updateTaskStatus, deleteTask, patchTasks, addGlobalTask, addClientTasksBulk, createPendingTasks, subscribeEvents, exportUrl, importTable, getStats } from '../api';
 
 export default function ClientsPage() {
     const [clientes, setClientes] = useState([]);
@@ -11,6 +9,8 @@ export default function ClientsPage() {
     const [editingItem, setEditingItem] = useState(null);
     const [searchTerm, setSearchTerm] = useState('');
     const [statusFilter, setStatusFilter] = useState('Todos'); // New filter state
+    const [remoteVersion, setRemoteVersion] = useState(0); // Sube con cada cambio avisado por el servidor
+    const [stats, setStats] = useState(null); // Contadores por estado (GET /api/stats)
 
     // Task Modal State
     const [showTasksModal, setShowTasksModal] = useState(false);
@@ -26,6 +26,7 @@ export default function ClientsPage() {
     const [fechaLimite, setFechaLimite] = useState(''); // Deadline for pending tasks
 
     const [globalTaskDescription, setGlobalTaskDescription] = useState('');
+    const [globalOnlyListed, setGlobalOnlyListed] = useState(false); // Solo clientes de la lista filtrada
 
     const [formData, setFormData] = useState({
         empresa: '',
@@ -58,13 +59,31 @@ export default function ClientsPage() {
         display: 'inline-block'
     });
 
+    // Búsqueda y filtro de estado se resuelven en el servidor (con un pequeño debounce al escribir)
     useEffect(() => {
-        loadData();
-    }, []);
+        const timer = setTimeout(() => loadData(), 250);
+        return () => clearTimeout(timer);
+    }, [searchTerm, statusFilter, remoteVersion]);
+
+    // Totales por estado para el filtro; no dependen de la búsqueda (304 si no hubo cambios)
+    useEffect(() => {
+        getStats().then(res => setStats(res.data)).catch(err => console.error(err));
+    }, [remoteVersion]);
+
+    // Cambios de otros usuarios: recarga la lista filtrada (responde 304 si no cambió nada)
+    useEffect(() => subscribeEvents(
+        (change) => {
+            if (['clientes', 'client_tasks', 'pendientes', '*'].includes(change.table)) setRemoteVersion(v => v + 1);
+        },
+        () => setRemoteVersion(v => v + 1)
+    ), []);
 
     const loadData = async () => {
         try {
-            const res = await getClientes();
+            const params = {};
+            if (searchTerm.trim()) params.q = searchTerm.trim();
+            if (statusFilter !== 'Todos') params.status = statusFilter;
+            const res = await getClientes(params);
             setClientes(res.data);
         } catch (err) {
             console.error(err);
@@ -89,93 +108,62 @@ export default function ClientsPage() {
         }
     };
 
-    const filteredClientes = clientes
-        .map(client => ({
-            ...client,
-            dynamicStatus: getClientDynamicStatus(client)
-        }))
-        .filter(item => {
-            // Search filter
-            const matchesSearch = item.empresa.toLowerCase().includes(searchTerm.toLowerCase()) ||
-                (item.observaciones && item.observaciones.toLowerCase().includes(searchTerm.toLowerCase()));
-
-            // Status filter
-            const matchesStatus = statusFilter === 'Todos' || item.dynamicStatus === statusFilter;
-
-            return matchesSearch && matchesStatus;
-        });
-
-    const handleExport = async () => {
-        const workbook = new ExcelJS.Workbook();
-        const worksheet = workbook.addWorksheet('Clientes');
-
-        // Definir columnas
-        worksheet.columns = [
-            { header: 'Empresa', key: 'empresa', width: 20 },
-            { header: 'Estado', key: 'estado', width: 15 },
-            { header: 'Procedimiento', key: 'procedimiento', width: 30 },
-            { header: 'Observaciones', key: 'observaciones', width: 30 },
-        ];
-
-        // Agregar filas
-        filteredClientes.forEach(client => {
-            worksheet.addRow({
-                empresa: client.empresa,
-                estado: client.estado || (client.check_estado ? 'Finalizado' : 'Pendiente'),
-                procedimiento: client.procedimiento,
-                observaciones: client.observaciones
-            });
-        });
-
-        // Estilos: Bordes y Ancho Automático
-        worksheet.eachRow((row, rowNumber) => {
-            row.eachCell((cell) => {
-                // Bordes negros
-                cell.border = {
-                    top: { style: 'thin', color: { argb: '000000' } },
-                    left: { style: 'thin', color: { argb: '000000' } },
-                    bottom: { style: 'thin', color: { argb: '000000' } },
-                    right: { style: 'thin', color: { argb: '000000' } }
-                };
-            });
-        });
+    // La lista ya viene filtrada; el estado se recalcula localmente para reflejar cambios optimistas
+    const filteredClientes = clientes.map(client => ({
+        ...client,
+        dynamicStatus: getClientDynamicStatus(client)
+    }));
+
+    // El servidor genera el Excel en streaming con los mismos filtros de la lista
+    const handleExport = () => {
+        const params = { format: 'xlsx' };
+        if (searchTerm.trim()) params.q = searchTerm.trim();
+        if (statusFilter !== 'Todos') params.status = statusFilter;
+        window.location.href = exportUrl('clientes', params);
+    };
 
-        // Ajustar ancho de columnas basado en contenido
-        worksheet.columns.forEach(column => {
-            let maxLength = 0;
-            // Header
-            if (column.header) {
-                maxLength = column.header.length;
+    // Importa clientes desde CSV/XLSX: primero valida (dry run) y pide confirmación
+    const handleImport = async (e) => {
+        const file = e.target.files[0];
+        e.target.value = '';
+        if (!file) return;
+        try {
+            const check = (await importTable('clientes', file, true)).data;
+            const errores = check.errors.slice(0, 5).map(err => `Fila ${err.row}: ${err.error}`).join('\n');
+            const resumen = `${check.inserted} clientes nuevos, ${check.skipped} ya existentes, ${check.invalid} con errores.`;
+            if (!check.inserted) {
+                alert(`Nada para importar. ${resumen}${errores ? '\n\n' + errores : ''}`);
+                return;
             }
-            // Datos
-            column.eachCell({ includeEmpty: true }, (cell) => {
-                const columnLength = cell.value ? cell.value.toString().length : 0;
-                if (columnLength > maxLength) {
-                    maxLength = columnLength;
-                }
-            });
-            // Set width (aprox 1.2 char width padding)
-            column.width = maxLength < 10 ? 10 : maxLength + 2;
-        });
+            if (!window.confirm(`${resumen}${errores ? '\n\n' + errores : ''}\n\n¿Importar?`)) return;
+            const res = (await importTable('clientes', file, false)).data;
+            alert(`Importados ${res.inserted} clientes.`);
+            loadData();
+        } catch (err) {
+            alert(err.response?.data?.error || 'Error al importar el archivo');
+        }
+    };
 
-        // Generar archivo
-        const buffer = await workbook.xlsx.writeBuffer();
-        const blob = new Blob([buffer], { type: 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet' });
-        saveAs(blob, 'Clientes.xlsx');
+    // Reemplaza/agrega un cliente con la fila devuelta por el servidor
+    const applyClient = (client) => {
+        if (!client) return;
+        setClientes(prev => {
+            const others = prev.filter(c => c.id !== client.id);
+            return [...others, client].sort((a, b) => a.empresa.localeCompare(b.empresa));
+        });
+        setSelectedClient(prev => (prev && prev.id === client.id ? { ...prev, ...client } : prev));
     };
 
     const handleSubmit = async (e) => {
         e.preventDefault();
         try {
-            if (editingItem) {
-                await updateCliente(editingItem.id, formData);
-            } else {
-                await addCliente(formData);
-            }
+            const res = editingItem
+                ? await updateCliente(editingItem.id, formData)
+                : await addCliente(formData);
+            applyClient(res.data.item);
             setShowModal(false);
             setEditingItem(null);
             resetForm();
-            loadData();
         } catch (err) {
             alert('Error al guardar cliente');
         }
@@ -185,7 +173,7 @@ export default function ClientsPage() {
         if (!confirm('¿Eliminar cliente?')) return;
         try {
             await deleteCliente(id);
-            loadData();
+            setClientes(prev => prev.filter(c => c.id !== id));
         } catch (err) {
             alert('Error al eliminar');
         }
@@ -225,9 +213,10 @@ export default function ClientsPage() {
         e.preventDefault();
         if (!newTaskDescription.trim()) return;
         try {
-            await addClientTask(selectedClient.id, newTaskDescription);
+            const res = await addClientTask(selectedClient.id, newTaskDescription);
             setNewTaskDescription('');
-            loadTasks(selectedClient.id);
+            setClientTasks(prev => [res.data.item, ...prev]);
+            applyClient(res.data.cliente);
         } catch (err) {
             alert('Error al agregar tarea');
         }
@@ -242,10 +231,11 @@ export default function ClientsPage() {
         if (tasks.length === 0) return;
 
         try {
-            await addClientTasksBulk(selectedClient.id, tasks);
+            const res = await addClientTasksBulk(selectedClient.id, tasks);
             setBulkTasks('');
             setActiveTaskTab('list');
-            loadTasks(selectedClient.id);
+            setClientTasks(prev => [...res.data.items, ...prev]);
+            applyClient(res.data.cliente);
             alert(`${tasks.length} tareas agregadas.`);
         } catch (err) {
             alert('Error al cargar tareas masivas');
@@ -269,7 +259,8 @@ export default function ClientsPage() {
 
             // 3. Check if we should auto-update Client Status
             if (updatedTasks.length > 0) {
-                const allCompleted = updatedTasks.every(t => t.completed === 1 || t.completed === true);
+                const completedTasks = updatedTasks.filter(t => t.completed === 1 || t.completed === true).length;
+                const allCompleted = completedTasks === updatedTasks.length;
                 const hasSomeProgress = updatedTasks.some(t => t.completed === 1 || t.completed === true);
 
                 let newClientStatus = selectedClient.estado;
@@ -335,22 +326,40 @@ export default function ClientsPage() {
     const handleDeleteTask = async (taskId) => {
         if (!confirm('¿Eliminar tarea?')) return;
         try {
-            await deleteTask(taskId);
-            loadTasks(selectedClient.id);
+            const res = await deleteTask(taskId);
+            setClientTasks(prev => prev.filter(t => t.id !== taskId));
+            applyClient(res.data.cliente);
         } catch (err) {
             alert('Error al eliminar tarea');
         }
     };
 
+    // Marca todas las pendientes del cliente en una sola operación del servidor
+    const handleCompleteAllTasks = async () => {
+        try {
+            const res = await patchTasks([{ op: 'complete_all', client_id: selectedClient.id }]);
+            const changed = new Map(res.data.items.map(t => [t.id, t]));
+            setClientTasks(prev => prev.map(t => changed.get(t.id) || t));
+            res.data.clientes.forEach(applyClient);
+        } catch (err) {
+            alert('Error al completar tareas');
+        }
+    };
+
     const handleAddGlobalTask = async (e) => {
         e.preventDefault();
-        if (!globalTaskDescription.trim()) return;
+        // Una tarea por línea
+        const descriptions = globalTaskDescription.split('\n').map(d => d.trim()).filter(Boolean);
+        if (!descriptions.length) return;
         try {
-            if (!confirm(`¿Agregar esta tarea a TODOS los ${clientes.length} clientes?`)) return;
-            await addGlobalTask(globalTaskDescription);
+            const destino = globalOnlyListed ? `los ${clientes.length} clientes de la lista` : 'TODOS los clientes';
+            if (!confirm(`¿Agregar ${descriptions.length} tarea(s) a ${destino}?`)) return;
+            const filters = globalOnlyListed ? { client_ids: clientes.map(c => c.id) } : {};
+            const res = await addGlobalTask(descriptions, filters);
             setGlobalTaskDescription('');
             setShowGlobalTaskModal(false);
-            alert('Tarea global agregada correctamente');
+            alert(`Se agregaron ${res.data.inserted} tareas (los clientes que ya las tenían no se duplicaron)`);
+            loadData();
         } catch (err) {
             alert('Error al agregar tarea global');
         }
@@ -395,6 +404,8 @@ export default function ClientsPage() {
 
     if (loading) return <div className="loading">Cargando...</div>;
 
+    const openTaskCount = clientTasks.filter(t => !t.completed).length;
+
     return (
         <div>
             <div style={{ display: 'flex', justifyContent: 'space-between', alignItems: 'center', marginBottom: '1rem', flexWrap: 'wrap', gap: '10px' }}>
@@ -403,6 +414,10 @@ export default function ClientsPage() {
                     <button className="btn" onClick={handleExport} style={{ background: '#10b981' }}>
                         <Download size={18} /> Excel
                     </button>
+                    <label className="btn" style={{ background: '#0ea5e9', cursor: 'pointer' }}>
+                        <Upload size={18} /> Importar
+                        <input type="file" accept=".csv,.xlsx" onChange={handleImport} style={{ display: 'none' }} />
+                    </label>
                     <button className="btn" onClick={() => setShowGlobalTaskModal(true)} style={{ background: '#6366f1' }}>
                         <ListChecks size={18} /> Tarea Global
                     </button>
@@ -433,7 +448,9 @@ export default function ClientsPage() {
                         className="input"
                     >
                         {filterOptions.map(opt => (
-                            <option key={opt} value={opt}>{opt}</option>
+                            <option key={opt} value={opt}>
+                                {opt}{stats && ` (${opt === 'Todos' ? stats.clientes_total : stats.clientes_by_status[opt] ?? 0})`}
+                            </option>
                         ))}
                     </select>
                 </div>
@@ -466,15 +483,24 @@ export default function ClientsPage() {
                                         </span>
                                     </td>
                                     <td>
-                                        {item.task_list ? (
-                                            <ul style={{ paddingLeft: '20px', margin: 0, fontSize: '0.85rem' }}>
-                                                {item.task_list.split('|||').map((task, idx) => (
-                                                    <li key={idx}>{task}</li>
-                                                ))}
-                                            </ul>
+                                        {item.total_tasks > 0 ? (
+                                            <button
+                                                onClick={() => handleOpenTasks(item)}
+                                                style={{ background: 'none', border: 'none', padding: 0, cursor: 'pointer', color: '#6366f1', fontSize: '0.85rem' }}
+                                                title="Ver Tareas"
+                                            >
+                                                {item.completed_tasks} / {item.total_tasks} tareas completadas
+                                            </button>
                                         ) : (
                                             <span style={{ color: '#9ca3af', fontStyle: 'italic' }}>Sin tareas</span>
                                         )}
+                                        {item.open_pendientes > 0 && (
+                                            <div style={{ display: 'flex', gap: '4px', marginTop: '5px', fontSize: '0.75rem' }} title="Pendientes abiertos del cliente">
+                                                <span style={{ color: '#6b7280' }}>{item.open_pendientes} pendiente(s)</span>
+                                                {item.overdue_pendientes > 0 && <span style={{ color: '#ef4444' }}>· {item.overdue_pendientes} vencido(s)</span>}
+                                                {item.due_week_pendientes > 0 && <span style={{ color: '#f59e0b' }}>· {item.due_week_pendientes} esta semana</span>}
+                                            </div>
+                                        )}
                                         {/* Show manual text if exists, though tasks are preferred */}
                                         {item.procedimiento && <div style={{ marginTop: '5px', fontSize: '0.8rem', color: '#6b7280' }}>Nota: {item.procedimiento}</div>}
                                     </td>
@@ -595,9 +621,18 @@ export default function ClientsPage() {
 
                                     <div style={{ display: 'flex', justifyContent: 'space-between', alignItems: 'center', marginBottom: '0.5rem' }}>
                                         <h4 style={{ margin: 0, color: '#6b7280', fontSize: '0.9rem' }}>
-                                            {clientTasks.filter(t => t.completed).length} / {clientTasks.length} Completadas
+                                            {clientTasks.length - openTaskCount} / {clientTasks.length} Completadas
                                         </h4>
-                                        {clientTasks.filter(t => !t.completed).length > 0 && (
+                                        {openTaskCount > 1 && (
+                                            <button
+                                                onClick={handleCompleteAllTasks}
+                                                className="btn"
+                                                style={{ background: '#10b981', fontSize: '0.85rem', padding: '6px 12px' }}
+                                            >
+                                                <CheckSquare size={16} /> Completar todas
+                                            </button>
+                                        )}
+                                        {openTaskCount > 0 && (
                                             <button
                                                 onClick={handleCreatePendingTasks}
                                                 className="btn"
@@ -669,7 +704,7 @@ export default function ClientsPage() {
                         </p>
                         <form onSubmit={handleAddGlobalTask}>
                             <div className="form-group">
-                                <label>Descripción de la Tarea</label>
+                                <label>Descripción de la Tarea (una por línea)</label>
                                 <textarea
                                     required
                                     value={globalTaskDescription}
@@ -678,6 +713,10 @@ export default function ClientsPage() {
                                     rows="3"
                                 />
                             </div>
+                            <label style={{ display: 'flex', alignItems: 'center', gap: '8px', color: '#4b5563' }}>
+                                <input type="checkbox" checked={globalOnlyListed} onChange={e => setGlobalOnlyListed(e.target.checked)} />
+                                Solo los clientes de la lista actual ({clientes.length})
+                            </label>
                             <div style={{ display: 'flex', justifyContent: 'flex-end', gap: '1rem', marginTop: '1rem' }}>
                                 <button type="button" className="btn" style={{ background: '#e5e7eb', color: '#374151' }} onClick={() => setShowGlobalTaskModal(false)}>Cancelar</button>
                                 <button type="submit" className="btn" style={{ background: '#6366f1' }}>Confirmar y Agregar</button>
@@ -731,7 +770,7 @@ export default function ClientsPage() {
                             </div>
                         </div>
                         <small style={{ color: 'var(--text-secondary)', fontSize: '0.85rem', display: 'block', marginBottom: '1rem' }}>
-                            Se crearán {clientTasks.filter(t => !t.completed).length} registro(s) en Pendientes con la fecha de hoy.
+                            Se crearán {openTaskCount} registro(s) en Pendientes con la fecha de hoy.
                         </small>
                         <div style={{ display: 'flex', justifyContent: 'flex-end', gap: '1rem', marginTop: '1rem' }}>
                             <button type="button" className="btn" style={{ background: '#e5e7eb', color: '#374151' }} onClick={() => setShowEmailModal(false)}>Cancelar</button>
@@ -1,11 +1,39 @@
 
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import { Plus, Bell, Trash2, Edit2, Search } from 'lucide-react';
-import { getPendientes, addPendiente, updatePendiente, deletePendiente, notifyPendiente } from '../api';
+import { getPendientesPage, getPendientesSince, getPendiente, addPendiente, updatePendiente, deletePendiente, notifyPendiente, subscribeEvents, getStats } from '../api';
+
+// Solo las columnas que pinta la tabla; el detalle completo se pide al editar
+const LIST_FIELDS = 'id,fecha,actividad,descripcion,empresa,estado,fecha_limite';
+const PAGE_SIZE = 200;
+
+// Mismo orden que el servidor: (fecha_limite, id)
+const comparePendientes = (a, b) =>
+    (a.fecha_limite || '').localeCompare(b.fecha_limite || '') || a.id - b.id;
+
+const sortPendientes = (list) => [...list].sort(comparePendientes);
+
+// Aplica filas nuevas/modificadas y borrados a la lista local. pageEnd: última fila de la
+// última página cargada (null si ya está todo); lo que queda después llega con "Cargar más"
+const applyDelta = (list, items = [], deleted = [], pageEnd = null) => {
+    const byId = new Map(list.map(item => [item.id, item]));
+    items.forEach(item => {
+        const merged = { ...byId.get(item.id), ...item };
+        if (pageEnd && comparePendientes(merged, pageEnd) > 0) byId.delete(item.id);
+        else byId.set(item.id, merged);
+    });
+    deleted.forEach(id => byId.delete(id));
+    return sortPendientes([...byId.values()]);
+};
 
 export default function PendingPage() {
     const [pendientes, setPendientes] = useState([]);
     const [loading, setLoading] = useState(true);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [total, setTotal] = useState(0);
+    const [stats, setStats] = useState(null); // Resumen calculado en el servidor (GET /api/stats)
+    const syncCursor = useRef(null);
+    const pageEnd = useRef(null); // (fecha_limite, id) hasta donde llega la lista cargada
     const [showModal, setShowModal] = useState(false);
     const [editingItem, setEditingItem] = useState(null);
 
@@ -24,12 +52,36 @@ export default function PendingPage() {
 
     useEffect(() => {
         loadData();
+        // El servidor avisa cada cambio; solo entonces se pide el delta
+        return subscribeEvents(
+            (change) => {
+                if (change.table === 'pendientes' || change.table === '*') {
+                    syncChanges();
+                    loadStats();
+                }
+            },
+            loadData
+        );
     }, []);
 
+    const loadStats = async () => {
+        try {
+            const res = await getStats();
+            setStats(res.data);
+        } catch (err) {
+            console.error(err);
+        }
+    };
+
     const loadData = async () => {
+        loadStats();
         try {
-            const res = await getPendientes();
-            setPendientes(res.data);
+            const res = await getPendientesPage({ fields: LIST_FIELDS, limit: PAGE_SIZE });
+            setPendientes(res.data.items);
+            setNextCursor(res.data.next_cursor);
+            pageEnd.current = res.data.next_cursor ? res.data.items[res.data.items.length - 1] : null;
+            setTotal(res.data.total);
+            syncCursor.current = Number(res.headers['x-sync-cursor']);
         } catch (err) {
             console.error(err);
         } finally {
@@ -37,18 +89,49 @@ export default function PendingPage() {
         }
     };
 
+    // Trae solo lo que cambió desde la última sincronización (otros usuarios)
+    const syncChanges = async () => {
+        if (syncCursor.current === null) return;
+        try {
+            const res = await getPendientesSince(syncCursor.current);
+            const { items, deleted, cursor } = res.data;
+            if (items.length || deleted.length) {
+                setPendientes(prev => applyDelta(prev, items, deleted, pageEnd.current));
+            }
+            syncCursor.current = cursor;
+        } catch (err) {
+            // 410: el servidor ya purgó borrados posteriores a nuestro cursor
+            if (err.response?.status === 410) loadData();
+            else console.error(err);
+        }
+    };
+
+    const loadMore = async () => {
+        try {
+            const res = await getPendientesPage({ fields: LIST_FIELDS, limit: PAGE_SIZE, cursor: nextCursor });
+            // Una fila pudo llegar antes por el delta (p. ej. si cambió su fecha límite)
+            setPendientes(prev => {
+                const loaded = new Set(prev.map(item => item.id));
+                return [...prev, ...res.data.items.filter(item => !loaded.has(item.id))];
+            });
+            setNextCursor(res.data.next_cursor);
+            pageEnd.current = res.data.next_cursor ? res.data.items[res.data.items.length - 1] : null;
+        } catch (err) {
+            console.error(err);
+        }
+    };
+
     const handleSubmit = async (e) => {
         e.preventDefault();
         try {
-            if (editingItem) {
-                await updatePendiente(editingItem.id, formData);
-            } else {
-                await addPendiente(formData);
-            }
+            const res = editingItem
+                ? await updatePendiente(editingItem.id, formData)
+                : await addPendiente(formData);
+            setPendientes(prev => applyDelta(prev, [res.data.item], [], pageEnd.current));
+            if (!editingItem) setTotal(prev => prev + 1);
             setShowModal(false);
             setEditingItem(null);
             resetForm();
-            loadData();
         } catch (err) {
             alert('Error al guardar');
         }
@@ -58,7 +141,8 @@ export default function PendingPage() {
         if (!confirm('¿Eliminar pendiente?')) return;
         try {
             await deletePendiente(id);
-            loadData();
+            setPendientes(prev => applyDelta(prev, [], [id]));
+            setTotal(prev => prev - 1);
         } catch (err) {
             alert('Error al eliminar');
         }
@@ -73,7 +157,15 @@ export default function PendingPage() {
         }
     };
 
-    const handleEdit = (item) => {
+    const handleEdit = async (listItem) => {
+        let item;
+        try {
+            const res = await getPendiente(listItem.id);
+            item = res.data;
+        } catch (err) {
+            alert('Error al cargar el pendiente');
+            return;
+        }
         setEditingItem(item);
         setFormData({
             fecha: item.fecha,
@@ -121,6 +213,17 @@ export default function PendingPage() {
                 </button>
             </div>
 
+            {stats && (
+                <div style={{ display: 'flex', gap: '1.5rem', marginBottom: '1rem', fontSize: '0.9rem', color: 'var(--text-secondary)' }}>
+                    <span><strong>{stats.open}</strong> abiertos de {stats.pendientes_total}</span>
+                    <span style={{ color: stats.overdue ? '#ef4444' : undefined }}><strong>{stats.overdue}</strong> vencidos</span>
+                    <span><strong>{stats.due_soon}</strong> vencen en {stats.due_days} días</span>
+                    {stats.tasks.completion_rate !== null && (
+                        <span><strong>{Math.round(stats.tasks.completion_rate * 100)}%</strong> de tareas de clientes completadas</span>
+                    )}
+                </div>
+            )}
+
             <div className="table-container glass-panel">
                 <table>
                     <thead>
@@ -157,6 +260,14 @@ export default function PendingPage() {
                         ))}
                     </tbody>
                 </table>
+                {nextCursor && (
+                    <div style={{ display: 'flex', justifyContent: 'center', alignItems: 'center', gap: '1rem', padding: '1rem' }}>
+                        <span style={{ color: 'var(--text-secondary)', fontSize: '0.85rem' }}>
+                            Mostrando {pendientes.length} de {total}
+                        </span>
+                        <button className="btn" onClick={loadMore}>Cargar más</button>
+                    </div>
+                )}
             </div>
 
             {showModal && (
@@ -0,0 +1,33 @@
+"""
+Configuración de gunicorn (Linux):  gunicorn -c gunicorn.conf.py
+
+Cada worker es un proceso con su propia app (pool de conexiones, caché, hub de eventos);
+los cambios hechos por otro worker llegan a los EventSource por el cursor de
+sincronización. Las migraciones se aplican una sola vez en el proceso maestro antes de
+crear los workers, que al arrancar solo leen user_version.
+"""
+import multiprocessing
+import os
+
+wsgi_app = 'wsgi:app'
+bind = os.environ.get('PENDIENTES_BIND', '0.0.0.0:5001')
+
+# SQLite admite un solo escritor: más procesos que núcleos solo agregan espera por el bloqueo
+workers = int(os.environ.get('PENDIENTES_WORKERS', min(4, multiprocessing.cpu_count())))
+worker_class = 'gthread'
+threads = int(os.environ.get('PENDIENTES_THREADS', '8'))
+
+# Con gthread el latido del worker no depende de las peticiones: las conexiones SSE
+# abiertas no disparan el timeout
+graceful_timeout = 30
+keepalive = 5
+
+# Cada worker importa la app por su cuenta: los hilos (eventos, trabajos) no sobreviven a un fork
+preload_app = False
+
+
+def on_starting(server):
+    import database
+    database.init_db()
+    # La conexión que usó init_db queda en el pool; no debe heredarla ningún worker (fork)
+    database.reset_pool()
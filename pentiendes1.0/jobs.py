@@ -0,0 +1,140 @@
+"""
+Cola de trabajos en segundo plano respaldada por la tabla 'jobs' de SQLite.
+
+Los endpoints encolan con enqueue() y responden de inmediato; un grupo de hilos
+(dentro de la app) o un proceso aparte (python jobs.py) ejecuta los trabajos.
+"""
+import os
+import threading
+import time
+import traceback
+
+import database
+import metrics
+import notifications
+
+# Hilos que procesan la cola dentro del proceso de la app
+WORKERS = 2
+# Segundos entre revisiones de la cola cuando no hay avisos de trabajos nuevos
+POLL_INTERVAL = 5
+
+HANDLERS = {}
+
+
+def handler(kind):
+    """Registra la función que ejecuta los trabajos de tipo 'kind': fn(payload, progress) -> dict"""
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+_wakeup = threading.Event()
+_threads = []
+_start_lock = threading.Lock()
+
+
+def enqueue(kind, payload=None):
+    if kind not in HANDLERS:
+        raise ValueError(f'Tipo de trabajo desconocido: {kind}')
+    job_id = database.enqueue_job(kind, payload)
+    start_workers()
+    _wakeup.set()
+    return job_id
+
+
+def run_job(job):
+    job_id = job['id']
+    fn = HANDLERS.get(job['kind'])
+    if fn is None:
+        database.finish_job(job_id, 'failed', error=f"Tipo de trabajo desconocido: {job['kind']}")
+        return
+
+    def progress(done, total=None):
+        database.update_job_progress(job_id, done, total)
+
+    start = time.perf_counter()
+    try:
+        result = fn(job['payload'], progress)
+    except Exception as e:
+        traceback.print_exc()
+        metrics.observe_job(job['kind'], 'failed', time.perf_counter() - start)
+        database.finish_job(job_id, 'failed', error=str(e))
+        return
+
+    status = 'done' if not isinstance(result, dict) or result.get('success', True) else 'failed'
+    metrics.observe_job(job['kind'], status, time.perf_counter() - start)
+    database.finish_job(job_id, status, result=result)
+
+
+def run_pending_jobs():
+    """Ejecuta trabajos en cola hasta vaciarla. Retorna cuántos se procesaron."""
+    processed = 0
+    while True:
+        job = database.claim_next_job()
+        if job is None:
+            return processed
+        run_job(job)
+        processed += 1
+
+
+def _worker_loop():
+    while True:
+        try:
+            run_pending_jobs()
+        except Exception:
+            traceback.print_exc()
+        _wakeup.wait(POLL_INTERVAL)
+        _wakeup.clear()
+
+
+def start_workers(count=None):
+    """Arranca (una sola vez) los hilos que procesan la cola en este proceso."""
+    with _start_lock:
+        if _threads:
+            return
+        database.requeue_stale_jobs()
+        for i in range(count or WORKERS):
+            thread = threading.Thread(target=_worker_loop, name=f'jobs-worker-{i}', daemon=True)
+            thread.start()
+            _threads.append(thread)
+
+
+# --- HANDLERS ---
+
+@handler('notify_pendiente')
+def _notify_pendiente(payload, progress):
+    progress(0, 1)
+    result = notifications.notify_pendiente(payload['id'])
+    progress(1 if result['success'] else 0, 1)
+    return result
+
+
+@handler('check_deadlines')
+def _check_deadlines(payload, progress):
+    report = notifications.check_deadlines_and_notify(payload.get('mode'), progress=progress)
+    if report is None:
+        return {'success': True, 'message': 'No hay notificaciones para enviar', 'sent': 0}
+    progress(report['sent'], report['total'])
+    report['success'] = report['failed'] == 0
+    return report
+
+
+@handler('client_pending_tasks_email')
+def _client_pending_tasks_email(payload, progress):
+    client = database.get_cliente(payload['client_id'])
+    if not client:
+        return {'success': False, 'message': 'Cliente no encontrado'}
+    tasks = [dict(task) for task in database.get_pending_tasks_by_client(payload['client_id'])]
+    return notifications.send_pending_tasks_email(client['empresa'], tasks, payload['emails'])
+
+
+if __name__ == '__main__':
+    database.init_db()
+    # Métricas de este proceso en http://<host>:<puerto>/metrics
+    if os.environ.get('PENDIENTES_METRICS_PORT'):
+        metrics.serve(int(os.environ['PENDIENTES_METRICS_PORT']))
+    print('🕒 Procesando cola de trabajos...')
+    start_workers()
+    for thread in _threads:
+        thread.join()
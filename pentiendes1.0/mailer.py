@@ -0,0 +1,236 @@
+import queue
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+import metrics
+
+
+def build_message(sender, to_email, subject, body):
+    msg = MIMEMultipart()
+    msg['From'] = sender
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, 'plain'))
+    return msg
+
+
+class SMTPSessionPool:
+    """
+    Sesiones SMTP autenticadas y persistentes que se reutilizan entre mensajes.
+    Evita repetir conexión + STARTTLS + login por cada correo.
+    """
+
+    def __init__(self, host, port, username=None, password=None, starttls=True, size=4, timeout=30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._open = 0
+        self.connects = 0
+        self.reuses = 0
+        self.connect_time = 0.0
+
+    def _connect(self):
+        start = time.perf_counter()
+        try:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        except Exception:
+            metrics.smtp_connect_seconds.observe(time.perf_counter() - start, result='error')
+            raise
+        try:
+            if self.starttls:
+                server.starttls()
+            if self.username and self.password:
+                server.login(self.username, self.password)
+        except Exception:
+            server.close()
+            metrics.smtp_connect_seconds.observe(time.perf_counter() - start, result='error')
+            raise
+        elapsed = time.perf_counter() - start
+        metrics.smtp_connect_seconds.observe(elapsed, result='ok')
+        with self._lock:
+            self.connects += 1
+            self.connect_time += elapsed
+        return server
+
+    def acquire(self):
+        try:
+            server = self._idle.get_nowait()
+            with self._lock:
+                self.reuses += 1
+            return server
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_open = self._open < self.size
+            if can_open:
+                self._open += 1
+
+        if not can_open:
+            try:
+                server = self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                raise TimeoutError('No hay sesiones SMTP libres en el pool')
+            with self._lock:
+                self.reuses += 1
+            return server
+
+        try:
+            return self._connect()
+        except Exception:
+            with self._lock:
+                self._open -= 1
+            raise
+
+    def release(self, server, broken=False):
+        if broken:
+            try:
+                server.close()
+            finally:
+                with self._lock:
+                    self._open -= 1
+            return
+        self._idle.put(server)
+
+    def close(self):
+        while True:
+            try:
+                server = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                server.quit()
+            except Exception:
+                server.close()
+            with self._lock:
+                self._open -= 1
+
+
+class DeliveryEngine:
+    """
+    Envía lotes de correos en paralelo sobre un pool acotado de sesiones SMTP.
+
+    send() recibe tuplas (to_email, subject, body) y devuelve un reporte con el
+    resultado de cada mensaje y métricas de rendimiento del lote.
+    """
+
+    def __init__(self, host, port, sender, password=None, starttls=True, workers=4, timeout=30, retries=1):
+        self.sender = sender
+        self.workers = max(1, workers)
+        self.retries = retries
+        self.pool = SMTPSessionPool(
+            host, port, username=sender, password=password,
+            starttls=starttls, size=self.workers, timeout=timeout
+        )
+
+    def _deliver(self, to_email, subject, body):
+        start = time.perf_counter()
+        attempts = 0
+        error = None
+        try:
+            text = build_message(self.sender, to_email, subject, body).as_string()
+        except Exception as e:
+            # Mensaje imposible de armar (encabezado inválido...): falla solo este destinatario
+            return self._result(to_email, subject, str(e) or repr(e), attempts, start)
+
+        while attempts <= self.retries:
+            attempts += 1
+            server = None
+            try:
+                server = self.pool.acquire()
+                send_start = time.perf_counter()
+                try:
+                    server.sendmail(self.sender, to_email, text)
+                except Exception:
+                    metrics.smtp_send_seconds.observe(time.perf_counter() - send_start, result='error')
+                    raise
+                metrics.smtp_send_seconds.observe(time.perf_counter() - send_start, result='ok')
+                self.pool.release(server)
+                error = None
+                break
+            except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError) as e:
+                # Sesión caída (timeout del servidor): se descarta y se reintenta con una nueva
+                if server is not None:
+                    self.pool.release(server, broken=True)
+                error = str(e)
+            except smtplib.SMTPException as e:
+                # Rechazo del servidor (destinatario inválido, etc.): la sesión sigue sirviendo
+                if server is not None:
+                    self.pool.release(server)
+                error = str(e)
+                break
+            except OSError as e:
+                # Error de red
+                if server is not None:
+                    self.pool.release(server, broken=True)
+                error = str(e)
+            except Exception as e:
+                # Cualquier otro error (p. ej. UnicodeEncodeError) se reporta para este mensaje
+                # sin cortar el lote; la sesión queda en estado desconocido y se descarta
+                if server is not None:
+                    self.pool.release(server, broken=True)
+                error = str(e) or repr(e)
+                break
+
+        return self._result(to_email, subject, error, attempts, start)
+
+    @staticmethod
+    def _result(to_email, subject, error, attempts, start):
+        return {
+            'to': to_email,
+            'subject': subject,
+            'success': error is None,
+            'error': error,
+            'attempts': attempts,
+            'elapsed': round(time.perf_counter() - start, 6),
+        }
+
+    def send(self, messages, on_result=None):
+        """
+        on_result(index, result): se llama desde el hilo que invoca send() apenas termina
+        cada mensaje, en orden de finalización (útil para registrar avances por lotes).
+        """
+        messages = list(messages)
+        start = time.perf_counter()
+        results = [None] * len(messages)
+        if messages:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(messages))) as executor:
+                futures = {executor.submit(self._deliver, *m): i for i, m in enumerate(messages)}
+                for future in as_completed(futures):
+                    index = futures[future]
+                    results[index] = future.result()
+                    if on_result:
+                        on_result(index, results[index])
+        elapsed = time.perf_counter() - start
+
+        sent = sum(1 for r in results if r['success'])
+        return {
+            'results': results,
+            'total': len(results),
+            'sent': sent,
+            'failed': len(results) - sent,
+            'elapsed': round(elapsed, 6),
+            'throughput': round(len(results) / elapsed, 2) if elapsed > 0 else 0.0,
+            'smtp_connections': self.pool.connects,
+            'smtp_reuses': self.pool.reuses,
+            'smtp_connect_time': round(self.pool.connect_time, 6),
+        }
+
+    def close(self):
+        self.pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,121 @@
+"""
+Mantenimiento de pendientes.db con la app en línea.
+
+    python maintenance.py stats
+    python maintenance.py archive --days 180 [--archive ruta.db] [--dry-run]
+    python maintenance.py orphans
+    python maintenance.py tombstones --days 30
+    python maintenance.py optimize [--full]
+    python maintenance.py vacuum [--max-pages N] [--enable-incremental]
+    python maintenance.py all --days 180        (archive, orphans, tombstones, optimize, vacuum)
+
+Cada paso trabaja en lotes cortos (--chunk, --pause) para no retener el bloqueo de
+escritura: la API y el scheduler siguen funcionando mientras corre. Se puede programar
+igual que el scheduler (cron / tarea programada de Windows), p. ej. una vez por semana.
+"""
+import argparse
+import json
+import time
+
+import database
+
+
+def _progress(table, moved):
+    print(f'  {table}: {moved} fila(s) movidas...', end='\r')
+
+
+def cmd_stats(args):
+    print(json.dumps(database.get_maintenance_stats(args.archive), indent=2))
+
+
+def cmd_archive(args):
+    start = time.perf_counter()
+    moved = database.archive_finished(
+        args.days, path=args.archive, chunk_size=args.chunk, pause=args.pause,
+        dry_run=args.dry_run, progress=None if args.dry_run else _progress
+    )
+    verb = 'se archivarían' if args.dry_run else 'archivadas'
+    for table, count in moved.items():
+        print(f'{table}: {count} fila(s) {verb}          ')
+    print(f'Archivo: {args.archive or database.archive_path()} ({time.perf_counter() - start:.1f}s)')
+
+
+def cmd_orphans(args):
+    for table, count in database.purge_orphans(chunk_size=args.chunk, pause=args.pause).items():
+        print(f'{table}: {count} fila(s) huérfanas borradas')
+
+
+def cmd_tombstones(args):
+    purged = database.purge_tombstones(args.tombstone_days, chunk_size=args.chunk * 10, pause=args.pause)
+    print(f'{purged} tombstone(s) de más de {args.tombstone_days} días borrados')
+
+
+def cmd_optimize(args):
+    elapsed = database.optimize(full=args.full)
+    print(f"{'ANALYZE' if args.full else 'PRAGMA optimize'} en {elapsed:.2f}s")
+
+
+def cmd_vacuum(args):
+    if args.enable_incremental:
+        print('VACUUM completo para activar auto_vacuum=INCREMENTAL (bloquea escrituras mientras dura)...')
+        database.enable_incremental_vacuum()
+    freed = database.incremental_vacuum(max_pages=args.max_pages, pause=args.pause)
+    if freed is None:
+        print('auto_vacuum no es INCREMENTAL: ejecuta una vez "vacuum --enable-incremental" fuera de horario')
+    else:
+        print(f'{freed} página(s) libres devueltas al sistema')
+
+
+def cmd_all(args):
+    for step in (cmd_archive, cmd_orphans, cmd_tombstones, cmd_optimize, cmd_vacuum):
+        step(args)
+
+
+def main():
+    # Opciones comunes, válidas después del subcomando
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--db', default=database.DB_NAME)
+    common.add_argument('--archive', help='base de archivo (por defecto <db>_archive.db)')
+    common.add_argument('--chunk', type=int, default=database.MAINTENANCE_CHUNK, help='filas por transacción')
+    common.add_argument('--pause', type=float, default=database.MAINTENANCE_PAUSE, help='segundos entre lotes')
+
+    parser = argparse.ArgumentParser(description='Mantenimiento de pendientes.db')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def command(name, fn, help=None):
+        sub = commands.add_parser(name, help=help, parents=[common])
+        sub.set_defaults(fn=fn)
+        return sub
+
+    command('stats', cmd_stats)
+
+    archive = command('archive', cmd_archive, 'mover filas terminadas a la base de archivo '
+                      '(las tareas archivadas siguen contando para el estado del cliente)')
+    archive.add_argument('--days', type=int, required=True)
+    archive.add_argument('--dry-run', action='store_true')
+
+    command('orphans', cmd_orphans, 'borrar tareas y registros huérfanos')
+
+    tombstones = command('tombstones', cmd_tombstones, 'purgar tombstones viejos')
+    tombstones.add_argument('--days', dest='tombstone_days', type=int, default=30)
+
+    optimize = command('optimize', cmd_optimize, 'actualizar estadísticas del planificador')
+    optimize.add_argument('--full', action='store_true')
+
+    vacuum = command('vacuum', cmd_vacuum, 'devolver páginas libres al sistema')
+    vacuum.add_argument('--max-pages', type=int)
+    vacuum.add_argument('--enable-incremental', action='store_true')
+
+    run_all = command('all', cmd_all, 'archive + orphans + tombstones + optimize + vacuum')
+    run_all.add_argument('--days', type=int, required=True)
+    run_all.add_argument('--tombstone-days', type=int, default=30)
+    run_all.set_defaults(dry_run=False, full=False, max_pages=None, enable_incremental=False)
+
+    args = parser.parse_args()
+    database.DB_NAME = args.db
+    database.init_db()
+    args.fn(args)
+
+
+if __name__ == '__main__':
+    main()
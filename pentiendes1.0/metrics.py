@@ -0,0 +1,270 @@
+"""
+Métricas en memoria con salida en formato de texto de Prometheus.
+
+Sin dependencias: contadores, histogramas y gauges con etiquetas, protegidos por un
+lock. La app las expone en GET /metrics; un proceso aparte (scheduler.py, jobs.py)
+puede exponer las suyas con serve(puerto).
+
+Consultas lentas: si SLOW_QUERY_MS > 0, las consultas que tardan más se registran en el
+logger 'pendientes.slow_query' (variable de entorno PENDIENTES_SLOW_QUERY_MS).
+"""
+import logging
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Límites de los histogramas de latencia (segundos)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SLOW_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+
+SLOW_QUERY_MS = float(os.environ.get('PENDIENTES_SLOW_QUERY_MS', '0'))
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+slow_query_log = logging.getLogger('pendientes.slow_query')
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(labels.get(n, '') for n in self.labelnames)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f'{self.name}{_labels(self.labelnames, key)} {value}' for key, value in items]
+
+
+class Gauge(_Metric):
+    """Valor fijado con set() o calculado al exportar con fn() -> número o {labels_tuple: número}."""
+    kind = 'gauge'
+
+    def __init__(self, name, help, labelnames=(), fn=None):
+        super().__init__(name, help, labelnames)
+        self.fn = fn
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def _samples(self):
+        if self.fn is not None:
+            try:
+                value = self.fn()
+            except Exception:
+                return []
+            values = value if isinstance(value, dict) else {(): value}
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [f'{self.name}{_labels(self.labelnames, key)} {v}' for key, v in values.items()]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0, 0.0]
+            counts = entry[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            entry[1] += 1
+            entry[2] += value
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def _samples(self):
+        with self._lock:
+            items = [(key, (list(c), n, s)) for key, (c, n, s) in self._values.items()]
+        lines = []
+        for key, (counts, count, total) in items:
+            cumulative = 0
+            for bound, c in zip(self.buckets, counts):
+                cumulative += c
+                le = _labels(self.labelnames, key, [f'le="{bound}"'])
+                lines.append(f'{self.name}_bucket{le} {cumulative}')
+            le = _labels(self.labelnames, key, ['le="+Inf"'])
+            lines.append(f'{self.name}_bucket{le} {count}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, key)} {total}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, key)} {count}')
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.elapsed = time.perf_counter() - self.start
+        self.histogram.observe(self.elapsed, **self.labels)
+
+
+def render():
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+# --- MÉTRICAS DE LA APLICACIÓN ---
+
+http_request_seconds = Histogram(
+    'pendientes_http_request_duration_seconds', 'Latencia de las peticiones HTTP por ruta',
+    ('method', 'route', 'status')
+)
+db_query_seconds = Histogram(
+    'pendientes_db_query_duration_seconds', 'Tiempo de ejecución de consultas SQL (sin lectura de filas)',
+    ('statement',)
+)
+db_fetch_seconds = Counter(
+    'pendientes_db_fetch_seconds_total', 'Tiempo leyendo filas de resultados', ('statement',)
+)
+db_rows = Counter(
+    'pendientes_db_rows_total', 'Filas leídas (SELECT) o afectadas (INSERT/UPDATE/DELETE)', ('statement',)
+)
+db_slow_queries = Counter(
+    'pendientes_db_slow_queries_total', 'Consultas que superaron SLOW_QUERY_MS', ('statement',)
+)
+smtp_connect_seconds = Histogram(
+    'pendientes_smtp_connect_duration_seconds', 'Conexión + STARTTLS + login SMTP', ('result',)
+)
+smtp_send_seconds = Histogram(
+    'pendientes_smtp_send_duration_seconds', 'Envío de un mensaje sobre una sesión SMTP abierta', ('result',)
+)
+job_run_seconds = Histogram(
+    'pendientes_job_duration_seconds', 'Duración de trabajos en segundo plano y corridas programadas',
+    ('kind', 'status'), buckets=SLOW_BUCKETS
+)
+job_last_run = Gauge(
+    'pendientes_job_last_run_timestamp_seconds', 'Fin de la última corrida por tipo', ('kind',)
+)
+
+
+def observe_job(kind, status, elapsed):
+    job_run_seconds.observe(elapsed, kind=kind, status=status)
+    job_last_run.set(time.time(), kind=kind)
+
+
+# --- SQL ---
+
+_TABLE_RE = {
+    'SELECT': re.compile(r'\bFROM\s+(\w+)', re.IGNORECASE),
+    'DELETE': re.compile(r'\bFROM\s+(\w+)', re.IGNORECASE),
+    'INSERT': re.compile(r'\bINTO\s+(\w+)', re.IGNORECASE),
+    'REPLACE': re.compile(r'\bINTO\s+(\w+)', re.IGNORECASE),
+    'UPDATE': re.compile(r'\bUPDATE\s+(?:OR\s+\w+\s+)?(\w+)', re.IGNORECASE),
+}
+_statement_names = {}
+
+
+def statement_name(sql):
+    """Etiqueta de baja cardinalidad para una consulta: 'SELECT pendientes', 'UPDATE client_tasks'..."""
+    name = _statement_names.get(sql)
+    if name is None:
+        words = sql.split(None, 1)
+        verb = words[0].upper() if words else 'OTHER'
+        if verb == 'WITH':
+            match = re.search(r'\)\s*(SELECT|INSERT|UPDATE|DELETE)\b', sql, re.IGNORECASE)
+            verb = match.group(1).upper() if match else 'SELECT'
+        table = _TABLE_RE.get(verb)
+        table = table.search(sql) if table else None
+        name = f'{verb} {table.group(1)}' if table else verb
+        if len(_statement_names) < 4096:
+            _statement_names[sql] = name
+    return name
+
+
+def record_fetch(sql, elapsed, rows):
+    name = statement_name(sql)
+    db_fetch_seconds.inc(elapsed, statement=name)
+    if rows:
+        db_rows.inc(rows, statement=name)
+
+
+def record_query(sql, elapsed, rows=None):
+    name = statement_name(sql)
+    db_query_seconds.observe(elapsed, statement=name)
+    if rows is not None and rows > 0:
+        db_rows.inc(rows, statement=name)
+    if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+        db_slow_queries.inc(statement=name)
+        slow_query_log.warning('%.1f ms %s', elapsed * 1000, ' '.join(sql.split())[:500])
+
+
+# --- SERVIDOR PARA PROCESOS SIN FLASK ---
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port, host='0.0.0.0'):
+    """Expone /metrics en un hilo aparte (scheduler.py, jobs.py)."""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    thread = threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True)
+    thread.start()
+    return server
@@ -1,9 +1,10 @@
 
 import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import time
 import database
-from datetime import datetime, date, timedelta
+import mailer
+import metrics
+from datetime import datetime, date
 
 # CONFIGURACIÓN DEL SERVIDOR DE CORREO
 # Reemplazar con credenciales reales o usar variables de entorno
@@ -11,62 +12,86 @@ SMTP_SERVER = 'smtp.gmail.com' # Ejemplo Gmail
 SMTP_PORT = 587
 SENDER_EMAIL = 'tu-email'
 SENDER_PASSWORD = 'clave-producto' 
+SMTP_STARTTLS = True
+# Sesiones SMTP / hilos en paralelo para envíos masivos
+SMTP_WORKERS = 4
+# Recordatorios de vencimiento: 'item' = un correo por pendiente,
+# 'digest' = un correo por destinatario con todos sus pendientes
+NOTIFICATION_MODE = 'item'
+# Reintentos de los envíos fallidos dentro de una corrida (espera exponencial, en segundos)
+NOTIFICATION_RETRIES = 3
+NOTIFICATION_BACKOFF = 5
+# Cada cuántos resultados se escribe notification_log
+NOTIFICATION_LOG_BATCH = 50
+
+def get_delivery_engine():
+    return mailer.DeliveryEngine(
+        SMTP_SERVER, SMTP_PORT, SENDER_EMAIL, SENDER_PASSWORD,
+        starttls=SMTP_STARTTLS, workers=SMTP_WORKERS
+    )
+
+def send_emails(messages, on_result=None):
+    """
+    Envía varios correos reutilizando sesiones SMTP y en paralelo.
+    messages: lista de tuplas (to_email, subject, body)
+    on_result: callback opcional (index, result) por cada mensaje terminado
+    Retorna el reporte de mailer.DeliveryEngine.send (resultado por mensaje y métricas).
+    """
+    with get_delivery_engine() as engine:
+        report = engine.send(messages, on_result=on_result)
+
+    for result in report['results']:
+        if result['success']:
+            print(f"Correo enviado a {result['to']}")
+        else:
+            print(f"Error enviando correo a {result['to']}: {result['error']}")
+    print(f"{report['sent']}/{report['total']} correos enviados en {report['elapsed']:.2f}s "
+          f"({report['throughput']} msg/s, {report['smtp_connections']} conexiones SMTP)")
+    return report
 
 def send_email(to_email, subject, body):
+    step = 'connect'
+    start = time.perf_counter()
     try:
-        msg = MIMEMultipart()
-        msg['From'] = SENDER_EMAIL
-        msg['To'] = to_email
-        msg['Subject'] = subject
-
-        msg.attach(MIMEText(body, 'plain'))
+        msg = mailer.build_message(SENDER_EMAIL, to_email, subject, body)
 
         server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-        server.starttls()
+        if SMTP_STARTTLS:
+            server.starttls()
         server.login(SENDER_EMAIL, SENDER_PASSWORD)
+        metrics.smtp_connect_seconds.observe(time.perf_counter() - start, result='ok')
+        step = 'send'
+        start = time.perf_counter()
         text = msg.as_string()
         server.sendmail(SENDER_EMAIL, to_email, text)
+        metrics.smtp_send_seconds.observe(time.perf_counter() - start, result='ok')
         server.quit()
         print(f"Correo enviado a {to_email}")
         return True
     except Exception as e:
+        histogram = metrics.smtp_connect_seconds if step == 'connect' else metrics.smtp_send_seconds
+        histogram.observe(time.perf_counter() - start, result='error')
         print(f"Error enviando correo: {e}")
         return False
 
-def check_deadlines_and_notify():
-    # Bloquear notificaciones en fines de semana (Sábado=5, Domingo=6)
-    if datetime.today().weekday() >= 5:
-        print("Fin de semana: No se envían notificaciones.")
-        return
-
-    pendientes = database.get_pendientes()
-    today = date.today()
-    
-    print(f"Chequeando notificaciones para fecha actual: {today}")
+def _urgency_label(days_remaining):
+    if days_remaining < 0:
+        return "¡Venció hace un día!"
+    if days_remaining == 0:
+        return "¡Vence hoy!"
+    return f"Vence en {days_remaining} días"
 
-    for item in pendientes:
-        if item['estado'] == 'Pendiente' and item['fecha_limite']:
-            deadline_str = item['fecha_limite']
-            try:
-                deadline = datetime.strptime(deadline_str, '%Y-%m-%d').date()
-            except ValueError:
-                continue # Fecha inválida
+def _find_due_items(today):
+    """Genera (item, days_remaining) de los pendientes dentro de su ventana de aviso."""
+    # El filtro (estado, rango de fechas, días de anticipación, correo) se hace en SQL
+    for item in database.get_due_pendientes(today):
+        yield item, item['days_remaining']
 
-            # Calcular días restantes
-            days_remaining = (deadline - today).days
+def _build_item_message(item, days_remaining):
+    subject = f"🔔 Recordatorio: '{item['actividad']}' vence pronto"
+    estado_urgencia = _urgency_label(days_remaining)
 
-            # Lógica Personalizada: Usar valor de la BD o defecto de 3
-            days_threshold = item['dias_antes_notificacion'] if item['dias_antes_notificacion'] is not None else 3
-
-            # Notificar si está dentro del rango especificado
-            if days_remaining <= days_threshold and days_remaining >= -1: 
-                if item['email_notificacion']:
-                    subject = f"🔔 Recordatorio: '{item['actividad']}' vence pronto"
-                    
-                    estado_urgencia = "¡Vence hoy!" if days_remaining == 0 else f"Vence en {days_remaining} días"
-                    if days_remaining < 0: estado_urgencia = "¡Venció hace un día!"
-
-                    body = f"""
+    body = f"""
                     Hola,
 
                     Este es un recordatorio automático de tu Sistema de Pendientes.
@@ -86,12 +111,184 @@ def check_deadlines_and_notify():
                     Saludos,
                     Tu Asistente Virtual
                     """
-                    print(f"Enviando notificación para tarea ID {item['id']}...")
-                    send_email(item['email_notificacion'], subject, body) 
+    return (item['email_notificacion'], subject, body)
+
+def _build_digest_messages(due):
+    """
+    Agrupa los pendientes por destinatario: un correo con todos, del más urgente al menos.
+    Retorna [(mensaje, [pendiente_id, ...])].
+    """
+    by_recipient = {}
+    for item, days_remaining in due:
+        by_recipient.setdefault(item['email_notificacion'], []).append((item, days_remaining))
+
+    messages = []
+    for email, items in by_recipient.items():
+        if len(items) == 1:
+            # Un solo pendiente: se mantiene el formato individual
+            messages.append((_build_item_message(*items[0]), [items[0][0]['id']]))
+            continue
+
+        items.sort(key=lambda pair: (pair[1], pair[0]['fecha_limite'], pair[0]['id']))
+        vencen_hoy = sum(1 for _, days in items if days <= 0)
+        subject = f"🔔 Recordatorio: {len(items)} pendientes por vencer"
+        if vencen_hoy:
+            subject += f" ({vencen_hoy} vencen hoy o ya vencieron)"
+
+        task_list = ""
+        for idx, (item, days_remaining) in enumerate(items, 1):
+            task_list += (
+                f"{idx}. {item['actividad']}\n"
+                f"   📅 Fecha Límite: {item['fecha_limite']} ({_urgency_label(days_remaining)})\n"
+                f"   🏢 Empresa:      {item['empresa']}\n"
+            )
+            if item['descripcion']:
+                task_list += f"   📝 Descripción:  {item['descripcion']}\n"
+            task_list += "\n"
+
+        body = f"""Hola,
+
+Este es un recordatorio automático de tu Sistema de Pendientes.
+
+--------------------------------------------------
+PENDIENTES POR VENCER ({len(items)}):
+--------------------------------------------------
+
+{task_list}
+Por favor, gestiona estos pendientes lo antes posible.
+
+Saludos,
+Tu Asistente Virtual
+"""
+        messages.append(((email, subject, body), [item['id'] for item, _ in items]))
+    return messages
+
+def check_deadlines_and_notify(mode=None, progress=None, today=None):
+    """
+    mode: 'item' (un correo por pendiente) o 'digest' (un correo por destinatario).
+    Por defecto usa NOTIFICATION_MODE.
+    progress: callback opcional (enviados, total) para reportar avance
+    today: fecha de referencia (por defecto hoy; los benchmarks fijan un día hábil)
+    """
+    mode = mode or NOTIFICATION_MODE
+    today = today or date.today()
+
+    # Bloquear notificaciones en fines de semana (Sábado=5, Domingo=6)
+    if today.weekday() >= 5:
+        print("Fin de semana: No se envían notificaciones.")
+        return
+    
+    print(f"Chequeando notificaciones para fecha actual: {today} (modo {mode})")
+
+    due = list(_find_due_items(today))
+
+    # Reservar en notification_log: lo ya enviado hoy o en curso en otra corrida se omite
+    claimed = database.claim_notifications(
+        [(item['id'], item['email_notificacion']) for item, _ in due], today
+    )
+    skipped = len(due) - len(claimed)
+    due = [(item, days) for item, days in due if (item['id'], item['email_notificacion']) in claimed]
+    if skipped:
+        print(f"{skipped} notificación(es) ya enviadas o en curso, se omiten.")
+
+    for item, _ in due:
+        print(f"Enviando notificación para tarea ID {item['id']}...")
+
+    if mode == 'digest':
+        batch = _build_digest_messages(due)
+    else:
+        batch = [(_build_item_message(item, days_remaining), [item['id']]) for item, days_remaining in due]
+
+    if batch:
+        return _send_and_log(batch, today, progress)
+
+def _send_and_log(batch, today, progress=None):
+    """
+    Envía [(mensaje, [pendiente_id, ...])] registrando cada resultado en notification_log
+    por lotes. Los fallidos se reintentan con espera exponencial; si la corrida se cae,
+    la siguiente solo reenvía lo que no quedó como 'sent'.
+    """
+    log_buffer = []
+
+    def flush():
+        database.log_notifications(log_buffer, today)
+        log_buffer.clear()
+
+    remaining = list(range(len(batch)))
+    sent = 0
+    attempt = 0
+    while remaining:
+        if attempt:
+            if attempt > NOTIFICATION_RETRIES:
+                break
+            wait = NOTIFICATION_BACKOFF * 2 ** (attempt - 1)
+            print(f"Reintentando {len(remaining)} envío(s) fallido(s) en {wait}s...")
+            time.sleep(wait)
+
+        failed = []
+
+        def on_result(index, result, current=remaining):
+            nonlocal sent
+            message, pendiente_ids = batch[current[index]]
+            for pendiente_id in pendiente_ids:
+                log_buffer.append((pendiente_id, message[0], result['success'], result['error']))
+            if result['success']:
+                sent += 1
+            else:
+                failed.append(current[index])
+            if len(log_buffer) >= NOTIFICATION_LOG_BATCH:
+                flush()
+                if progress:
+                    progress(sent, len(batch))
+
+        try:
+            send_emails([batch[i][0] for i in remaining], on_result=on_result)
+        finally:
+            flush()
+
+        remaining = sorted(failed)
+        attempt += 1
+
+    return {
+        'total': len(batch),
+        'sent': sent,
+        'failed': len(remaining),
+        'rounds': attempt,
+    }
+
+
+def notify_pendiente(pendiente_id):
+    """Envía el recordatorio manual de un pendiente. Retorna dict con 'success' y 'message'."""
+    item = database.get_pendiente(pendiente_id)
+    if not item:
+        return {'success': False, 'message': 'Pendiente no encontrado'}
+    if not item['email_notificacion']:
+        return {'success': False, 'message': 'No tiene correo configurado'}
+
+    subject = f"🔔 Recordatorio: '{item['actividad']}'"
+    body = f"""Hola,
+        
+Registro de pendiente:
+--------------------------------------------------
+ACTIVIDAD: {item['actividad']}
+--------------------------------------------------
+📅 Fecha Límite: {item['fecha_limite']}
+🏢 Empresa:      {item['empresa']}
+📝 Descripción:  {item['descripcion']}
+⚠️ Estado Actual: {item['estado']}
+        
+Saludos,
+Tu Asistente Virtual"""
+    if send_email(item['email_notificacion'], subject, body):
+        return {'success': True, 'message': f'Correo enviado a {item["email_notificacion"]}'}
+    return {'success': False, 'message': 'Error al enviar el correo'}
 
 
 if __name__ == '__main__':
-    check_deadlines_and_notify()
+    import sys
+    # Tarea programada (run_notifications.bat): puede correr antes que la app tras una actualización
+    database.init_db()
+    check_deadlines_and_notify('digest' if '--digest' in sys.argv else None)
 
 def send_pending_tasks_email(client_name, pending_tasks, recipient_emails):
     """
@@ -165,20 +362,12 @@ Saludos,
 Sistema de Gestión de Pendientes
 """
     
-    # Enviar a cada destinatario
-    failed_emails = []
-    successful_emails = []
-    
-    for email in recipient_emails:
-        email = email.strip()
-        if not email:
-            continue
-            
-        success = send_email(email, subject, body)
-        if success:
-            successful_emails.append(email)
-        else:
-            failed_emails.append(email)
+    # Enviar a todos los destinatarios en un solo lote
+    recipients = [email.strip() for email in recipient_emails if email.strip()]
+    report = send_emails([(email, subject, body) for email in recipients])
+
+    successful_emails = [r['to'] for r in report['results'] if r['success']]
+    failed_emails = [r['to'] for r in report['results'] if not r['success']]
     
     # Preparar mensaje de respuesta
     if len(successful_emails) == len(recipient_emails):
@@ -0,0 +1,97 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """
+    Caché LRU en memoria de respuestas GET, acotada por cantidad de entradas y bytes.
+    Cada entrada guarda las versiones de datos con las que se generó; si al leerla las
+    versiones actuales son otras, se descarta (invalidación por versión, sin TTL).
+    """
+
+    def __init__(self, max_entries=256, max_bytes=32 * 1024 * 1024, max_stream_bytes=4 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # Respuestas por streaming más grandes que esto no se copian a la caché
+        self.max_stream_bytes = max_stream_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, key, versions):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry['versions'] != versions:
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, versions, body, mimetype, headers):
+        size = len(body)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {
+                'versions': versions,
+                'body': body,
+                'mimetype': mimetype,
+                'headers': headers,
+            }
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+
+    def tee(self, key, versions, chunks, mimetype, headers):
+        """
+        Entrega 'chunks' tal cual (respuesta por streaming) y, si el cuerpo completo no
+        pasó de max_stream_bytes, lo guarda al terminar. Si el cliente corta antes, no se guarda.
+        """
+        parts, size = [], 0
+        for chunk in chunks:
+            if parts is not None:
+                size += len(chunk)
+                if size > self.max_stream_bytes:
+                    parts = None
+                else:
+                    parts.append(chunk)
+            yield chunk
+        if parts is not None:
+            self.put(key, versions, b''.join(parts), mimetype, headers)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= len(entry['body'])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'max_stream_bytes': self.max_stream_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'not_modified': self.not_modified,
+            }
+
+
+def make_etag(key, epoch, versions):
+    """ETag fuerte: mismo recurso + mismas versiones de datos => mismo cuerpo."""
+    raw = f'{key}|{epoch}|{",".join(str(v) for v in versions)}'
+    return hashlib.sha1(raw.encode()).hexdigest()
@@ -1,16 +1,30 @@
 from apscheduler.schedulers.blocking import BlockingScheduler
 from datetime import date
+import os
+import time
 import database
+import metrics
 import notifications
 
 def revisar_pendientes():
     print("running scheduler")
     # Usamos la lógica centralizada de notifications.py para mantener la regla de "3 días"
     # y el formato de correo consistente.
-    notifications.check_deadlines_and_notify()
+    start = time.perf_counter()
+    try:
+        notifications.check_deadlines_and_notify()
+    except Exception:
+        metrics.observe_job('scheduler_check_deadlines', 'failed', time.perf_counter() - start)
+        raise
+    elapsed = time.perf_counter() - start
+    metrics.observe_job('scheduler_check_deadlines', 'done', elapsed)
+    print(f"Revisión de pendientes terminada en {elapsed:.2f}s")
 
 if __name__ == "__main__":
     database.init_db()
+    # Métricas de este proceso en http://<host>:<puerto>/metrics
+    if os.environ.get('PENDIENTES_METRICS_PORT'):
+        metrics.serve(int(os.environ['PENDIENTES_METRICS_PORT']))
     scheduler = BlockingScheduler()
 
     # Ejecutar cada día a las 08:00 AM
@@ -0,0 +1,46 @@
+"""
+Servidor gevent para la app (recomendado si se usa /api/events con muchos usuarios).
+
+Con el servidor de desarrollo de Flask cada conexión SSE ocupa un hilo del sistema;
+con gevent cada conexión es una greenlet y cientos de EventSource inactivos cuestan
+unos pocos KB cada uno.
+
+SQLite no es cooperativo: sqlite3 es una extensión en C que gevent no parchea, así que
+mientras corre una consulta (o espera el bloqueo de escritura de otro proceso) se
+detienen todas las greenlets. Por eso el trabajo en la base se mantiene corto: los
+listados completos y las exportaciones leen páginas keyset de a LIST_BATCH_SIZE /
+EXPORT_BATCH_SIZE filas y ceden al escribir cada bloque en el socket, y los envíos de
+correo van a jobs.py. No se mandan las consultas al threadpool de gevent porque el pool
+de conexiones usa queue y Lock, que con el monkey patch no sirven entre hilos nativos.
+Si hay mucha carga de escritura o consultas largas, conviene waitress, gunicorn o asgi.py.
+
+Requiere: pip install gevent
+
+Uso:
+    python serve_gevent.py [--host 0.0.0.0] [--port 5001]
+"""
+# El monkey patch debe aplicarse antes de importar cualquier otro módulo
+# (threading, queue, socket y time pasan a ser cooperativos; sqlite3 no, ver arriba)
+from gevent import monkey
+monkey.patch_all()
+
+import argparse
+
+from gevent.pywsgi import WSGIServer
+
+from app import create_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor gevent para pendientes')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5001)
+    args = parser.parse_args()
+
+    server = WSGIServer((args.host, args.port), create_app())
+    print(f'🚀 Sirviendo en http://{args.host}:{args.port} (gevent)')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
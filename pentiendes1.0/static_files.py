@@ -0,0 +1,159 @@
+"""
+Archivos del frontend (frontend/dist) servidos desde un índice armado al arrancar.
+
+StaticFiles recorre la carpeta una sola vez: cada petición resuelve la ruta con un
+lookup en un dict, sin os.path.exists ni stat por petición, y los archivos chicos (el
+build completo de Vite, en la práctica) se sirven desde memoria. Si junto a un archivo
+existen variantes precomprimidas (app.js.br, app.js.gz) se sirven según el
+Accept-Encoding del navegador.
+
+Los archivos de assets/ llevan el hash del contenido en el nombre (los genera Vite), así
+que se cachean un año como immutable; index.html y el resto se revalidan siempre.
+
+Para generar las variantes después de 'npm run build':
+    python static_files.py [frontend/dist]
+(.br solo si está instalado el paquete brotli: pip install brotli)
+"""
+import gzip
+import mimetypes
+import os
+import sys
+from collections import namedtuple
+
+from flask import Response, request, send_file
+
+DIST_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'frontend', 'dist')
+
+# Carpeta de Vite con nombres que incluyen el hash del contenido
+IMMUTABLE_PREFIX = 'assets/'
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Preferencia de codificación: la primera que acepte el navegador
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+COMPRESSIBLE = {'.js', '.mjs', '.css', '.html', '.svg', '.json', '.map', '.txt', '.xml', '.ico', '.wasm'}
+# Por debajo de este tamaño comprimir no compensa
+MIN_COMPRESS_SIZE = 1024
+# Archivos (y variantes) de hasta este tamaño se leen a memoria al arrancar
+MAX_MEMORY_SIZE = 1024 * 1024
+
+Asset = namedtuple('Asset', 'path mimetype mtime etag immutable variants')
+# Una forma concreta de servir el archivo: original o comprimida; data es None si no está en memoria
+Variant = namedtuple('Variant', 'path encoding etag data')
+
+
+class StaticFiles:
+    def __init__(self, root=DIST_DIR):
+        self.root = root
+        self.files = {}
+        if os.path.isdir(root):
+            self._scan()
+
+    def _scan(self):
+        found = {}
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                full = os.path.join(dirpath, filename)
+                found[os.path.relpath(full, self.root).replace(os.sep, '/')] = os.stat(full)
+
+        for rel, st in found.items():
+            if any(rel.endswith(ext) for _, ext in ENCODINGS) and rel.rsplit('.', 1)[0] in found:
+                continue
+            etag = f'{int(st.st_mtime):x}-{st.st_size:x}'
+            variants = []
+            for encoding, ext in ENCODINGS:
+                variant = found.get(rel + ext)
+                # Una variante más vieja que el original quedó de un build anterior
+                if variant is not None and variant.st_mtime >= st.st_mtime:
+                    variants.append(self._variant(rel + ext, variant, encoding, f'{etag}-{encoding}'))
+            variants.append(self._variant(rel, st, None, etag))
+
+            self.files[rel] = Asset(
+                path=rel,
+                mimetype=mimetypes.guess_type(rel)[0] or 'application/octet-stream',
+                mtime=st.st_mtime,
+                etag=etag,
+                immutable=rel.startswith(IMMUTABLE_PREFIX),
+                variants=variants,
+            )
+
+    def _variant(self, rel, st, encoding, etag):
+        path = os.path.join(self.root, rel)
+        data = None
+        if st.st_size <= MAX_MEMORY_SIZE:
+            with open(path, 'rb') as f:
+                data = f.read()
+        return Variant(path, encoding, etag, data)
+
+    def get(self, path):
+        return self.files.get(path)
+
+    @property
+    def index(self):
+        return self.files.get('index.html')
+
+    def response(self, asset):
+        """Response para 'asset' eligiendo la variante comprimida que acepte el cliente."""
+        accept = request.accept_encodings
+        # La última variante siempre es el original sin comprimir
+        variant = next(v for v in asset.variants if v.encoding is None or accept[v.encoding])
+
+        if variant.data is not None:
+            response = Response(variant.data, mimetype=asset.mimetype)
+            response.set_etag(variant.etag)
+            response.last_modified = asset.mtime
+            response.make_conditional(request, accept_ranges=True, complete_length=len(variant.data))
+        else:
+            response = send_file(variant.path, mimetype=asset.mimetype, etag=variant.etag,
+                                 last_modified=asset.mtime, conditional=True)
+        if variant.encoding:
+            response.headers['Content-Encoding'] = variant.encoding
+        if len(asset.variants) > 1:
+            response.vary.add('Accept-Encoding')
+        if asset.immutable:
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+        return response
+
+
+def precompress(root=DIST_DIR, min_size=MIN_COMPRESS_SIZE):
+    """Escribe las variantes .gz (y .br si hay brotli) de los archivos comprimibles. Retorna (variantes escritas, si hubo brotli)."""
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+
+    written = 0
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            full = os.path.join(dirpath, filename)
+            ext = os.path.splitext(filename)[1].lower()
+            if ext not in COMPRESSIBLE or os.path.getsize(full) < min_size:
+                continue
+            with open(full, 'rb') as f:
+                data = f.read()
+
+            outputs = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                outputs['.br'] = brotli.compress(data, quality=11)
+            for suffix, compressed in outputs.items():
+                # Si no achica, no tiene sentido servirla
+                if len(compressed) >= len(data):
+                    continue
+                with open(full + suffix, 'wb') as f:
+                    f.write(compressed)
+                written += 1
+    return written, brotli is not None
+
+
+if __name__ == '__main__':
+    root = sys.argv[1] if len(sys.argv) > 1 else DIST_DIR
+    if not os.path.isdir(root):
+        sys.exit(f"No existe {root}. Ejecuta 'npm run build' en la carpeta frontend.")
+    written, has_brotli = precompress(root)
+    print(f'{written} variante(s) comprimida(s) en {root}')
+    if not has_brotli:
+        print('Sin brotli instalado: solo se generaron .gz (pip install brotli)')
@@ -0,0 +1,44 @@
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+
+def test_new_db_uses_incremental_auto_vacuum(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, 'DB_NAME', str(tmp_path / 'pendientes.db'))
+    try:
+        database.init_db()
+    finally:
+        database.reset_pool()
+
+    conn = sqlite3.connect(database.DB_NAME)
+    try:
+        assert conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    finally:
+        conn.close()
+
+
+def test_iter_pendientes_is_a_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, 'DB_NAME', str(tmp_path / 'pendientes.db'))
+    try:
+        database.init_db()
+        ids = [
+            database.add_pendiente('2026-01-01', f'tarea {i}', '', 'Empresa', 'Pendiente', '',
+                                   f'2026-02-0{i + 1}', '', 3)
+            for i in range(6)
+        ]
+
+        rows = database.iter_pendientes(fields=['id'], batch_size=2)
+        seen = [next(rows)[0], next(rows)[0]]
+        # La primera fila pasa al final del orden (fecha_limite) mientras se recorre
+        database.update_pendiente(ids[0], '2026-01-01', 'tarea 0', '', 'Empresa', 'Pendiente', '',
+                                  '2026-03-01', '', 3)
+        seen.extend(row[0] for row in rows)
+    finally:
+        database.reset_pool()
+
+    assert seen == ids
@@ -0,0 +1,369 @@
+"""
+Exportación e importación de tablas en CSV / XLSX (y exportación en JSON).
+
+Exportar: csv_stream / xlsx_stream / json_stream son generadores de bytes que se
+alimentan de las filas (tuplas) que va leyendo database por bloques; la memoria usada no
+depende del tamaño de la tabla. json_stream usa orjson si está instalado
+(pip install orjson) y si no el módulo json.
+
+Importar: read_csv / read_xlsx leen el archivo fila por fila e import_rows valida y
+guarda por bloques, cada uno en su propia transacción. Con dry_run=True solo se valida.
+"""
+import codecs
+import csv
+import io
+import itertools
+import json
+import re
+import zipfile
+from datetime import date, datetime
+from xml.sax.saxutils import escape
+
+import database
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'json': 'application/json',
+}
+
+# Filas por bloque de escritura (exportación) y por transacción (importación)
+STREAM_CHUNK_ROWS = 500
+IMPORT_CHUNK_SIZE = 500
+# Errores que se detallan en el reporte de importación (el resto solo se cuenta)
+MAX_REPORTED_ERRORS = 100
+
+
+# --- EXPORTACIÓN ---
+
+class _Buffer:
+    """Destino de escritura que se vacía en cada yield del generador."""
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data):
+        self._parts.append(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def csv_stream(columns, rows):
+    """CSV UTF-8 con BOM (Excel lo abre con los acentos correctos)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    yield codecs.BOM_UTF8
+    writer.writerow(columns)
+    for chunk in _chunks(rows, STREAM_CHUNK_ROWS):
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _json_objects(objects):
+    """Lista de objetos como JSON UTF-8, sin los corchetes."""
+    if orjson is not None:
+        return orjson.dumps(objects)[1:-1]
+    return json.dumps(objects, ensure_ascii=False, separators=(',', ':')).encode('utf-8')[1:-1]
+
+
+def json_stream(columns, rows, fields=None):
+    """
+    Arreglo JSON de objetos {columna: valor} escrito por bloques de STREAM_CHUNK_ROWS
+    filas. fields: subconjunto de columnas a incluir (por defecto todas).
+    """
+    keep = [(i, c) for i, c in enumerate(columns) if not fields or c in fields]
+    yield b'['
+    separator = b''
+    for chunk in _chunks(rows, STREAM_CHUNK_ROWS):
+        yield separator + _json_objects([{c: row[i] for i, c in keep} for row in chunk])
+        separator = b','
+    yield b']'
+
+
+# Caracteres de control que XML no admite
+_INVALID_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_XLSX_STATIC = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_cell(value):
+    if value is None:
+        return '<c/>'
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, (int, float)):
+        return f'<c><v>{value}</v></c>'
+    text = escape(_INVALID_XML.sub('', str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return '<row>' + ''.join(_xlsx_cell(v) for v in values) + '</row>'
+
+
+def xlsx_stream(columns, rows, sheet_name='Hoja1'):
+    """
+    XLSX mínimo (una hoja, celdas inlineStr, sin sharedStrings) escrito directamente
+    en un ZIP de streaming: cada bloque de filas se comprime y se entrega al cliente.
+    """
+    out = _Buffer()
+    with zipfile.ZipFile(out, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, content in _XLSX_STATIC.items():
+            zf.writestr(name, content)
+        zf.writestr('xl/workbook.xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{escape(sheet_name)}" sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>'
+        ))
+        yield out.drain()
+
+        with zf.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write(_xlsx_row(columns).encode('utf-8'))
+            for chunk in _chunks(rows, STREAM_CHUNK_ROWS):
+                sheet.write(''.join(_xlsx_row(row) for row in chunk).encode('utf-8'))
+                data = out.drain()
+                if data:
+                    yield data
+            sheet.write(b'</sheetData></worksheet>')
+    yield out.drain()
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# --- IMPORTACIÓN: LECTURA ---
+
+def read_csv(stream):
+    """
+    (columnas, iterador de dicts) de un CSV en UTF-8 (con o sin BOM).
+    Detecta ';' como separador (CSV guardado por Excel en configuración regional es).
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    header_line = text.readline()
+    delimiter = ';' if header_line.count(';') > header_line.count(',') else ','
+    reader = csv.DictReader(itertools.chain([header_line], text), delimiter=delimiter)
+    columns = [c.strip() for c in reader.fieldnames or []]
+    reader.fieldnames = columns
+    return columns, reader
+
+
+def read_xlsx(stream):
+    """(columnas, iterador de dicts) de la primera hoja. Requiere openpyxl (opcional)."""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError('Para importar XLSX instale openpyxl (pip install openpyxl) o use CSV')
+
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    rows = workbook.active.iter_rows(values_only=True)
+    header = next(rows, None) or ()
+    columns = [str(c).strip() if c is not None else '' for c in header]
+
+    def records():
+        try:
+            for row in rows:
+                if all(v is None or v == '' for v in row):
+                    continue
+                yield dict(zip(columns, row))
+        finally:
+            workbook.close()
+
+    return columns, records()
+
+
+# --- IMPORTACIÓN: VALIDACIÓN Y CARGA ---
+
+# columna: (tipo, obligatoria, valor por defecto)
+IMPORT_SCHEMAS = {
+    'pendientes': {
+        'id': ('int', False, None),
+        'fecha': ('date', False, lambda: date.today().isoformat()),
+        'actividad': ('text', True, None),
+        'descripcion': ('text', False, None),
+        'empresa': ('text', False, None),
+        'estado': ('text', False, 'Pendiente'),
+        'observaciones': ('text', False, None),
+        'fecha_limite': ('date', False, None),
+        'email_notificacion': ('text', False, None),
+        'dias_antes_notificacion': ('int', False, 3),
+        # Sin client_id se vincula por el texto de empresa (trigger en la base)
+        'client_id': ('int', False, None),
+    },
+    'clientes': {
+        'id': ('int', False, None),
+        'empresa': ('text', True, None),
+        'observaciones': ('text', False, None),
+        'check_estado': ('bool', False, 0),
+        'procedimiento': ('text', False, ''),
+        'estado': ('text', False, 'Pendiente'),
+    },
+    'client_tasks': {
+        'id': ('int', False, None),
+        'client_id': ('int', True, None),
+        'description': ('text', True, None),
+        'completed': ('bool', False, 0),
+        'created_at': ('text', False, lambda: datetime.now().strftime('%Y-%m-%d %H:%M:%S')),
+    },
+}
+
+_TRUE = {'1', 'true', 'si', 'sí', 'x', 'yes'}
+_FALSE = {'0', 'false', 'no', ''}
+
+
+def _convert(kind, value):
+    if isinstance(value, str):
+        value = value.strip()
+    if value is None or value == '':
+        return None
+
+    if kind == 'text':
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        return str(value)
+    if kind == 'int':
+        if isinstance(value, float):
+            if not value.is_integer():
+                raise ValueError(f'"{value}" no es un número entero')
+            return int(value)
+        return int(value)
+    if kind == 'bool':
+        if isinstance(value, (int, float)):
+            return 1 if value else 0
+        text = str(value).strip().lower()
+        if text in _TRUE:
+            return 1
+        if text in _FALSE:
+            return 0
+        raise ValueError(f'"{value}" no es un valor sí/no')
+    if kind == 'date':
+        if isinstance(value, datetime):
+            return value.date().isoformat()
+        if isinstance(value, date):
+            return value.isoformat()
+        return datetime.strptime(str(value)[:10], '%Y-%m-%d').date().isoformat()
+    raise ValueError(f'Tipo desconocido: {kind}')
+
+
+def clean_row(table, record):
+    """Tupla de valores en el orden de IMPORT_SCHEMAS[table]. ValueError si no es válida."""
+    values = []
+    for column, (kind, required, default) in IMPORT_SCHEMAS[table].items():
+        try:
+            value = _convert(kind, record.get(column))
+        except (TypeError, ValueError):
+            raise ValueError(f'{column}: valor inválido "{record.get(column)}"')
+        if value is None:
+            if required:
+                raise ValueError(f'{column}: es obligatorio')
+            value = default() if callable(default) else default
+        values.append(value)
+    return tuple(values)
+
+
+def missing_columns(table, columns):
+    return [c for c, (_, required, _) in IMPORT_SCHEMAS[table].items() if required and c not in columns]
+
+
+def import_rows(table, records, dry_run=False, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Valida e inserta registros (dicts) por bloques de chunk_size, una transacción por bloque.
+    Las filas cuyo id ya existe se cuentan como 'skipped'. Con dry_run no se escribe nada
+    y 'inserted' indica cuántas filas se insertarían.
+    """
+    columns = tuple(IMPORT_SCHEMAS[table])
+    report = {'table': table, 'dry_run': dry_run, 'rows': 0, 'inserted': 0, 'skipped': 0, 'invalid': 0, 'errors': []}
+
+    def error(line, message):
+        report['invalid'] += 1
+        if len(report['errors']) < MAX_REPORTED_ERRORS:
+            report['errors'].append({'row': line, 'error': message})
+
+    def flush(chunk):
+        if 'client_id' in columns:
+            index = columns.index('client_id')
+            clients = database.existing_ids('clientes', [values[index] for _, values in chunk])
+            valid = []
+            for line, values in chunk:
+                if values[index] is None or values[index] in clients:
+                    valid.append((line, values))
+                else:
+                    error(line, f'client_id: no existe el cliente {values[index]}')
+            chunk = valid
+
+        rows = [values for _, values in chunk]
+        if dry_run:
+            duplicates = database.existing_ids(table, [values[0] for values in rows])
+            skipped = sum(1 for values in rows if values[0] in duplicates)
+            report['inserted'] += len(rows) - skipped
+            report['skipped'] += skipped
+        else:
+            inserted = database.insert_rows(table, columns, rows)
+            report['inserted'] += inserted
+            report['skipped'] += len(rows) - inserted
+
+    chunk = []
+    # La fila 1 del archivo son los encabezados
+    for line, record in enumerate(records, start=2):
+        report['rows'] += 1
+        try:
+            chunk.append((line, clean_row(table, record)))
+        except ValueError as e:
+            error(line, str(e))
+            continue
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+
+    return report
@@ -0,0 +1,40 @@
+"""
+Punto de entrada de producción (WSGI).
+
+Windows / cualquier sistema, con waitress (pip install waitress):
+    python wsgi.py [--host 0.0.0.0] [--port 5001] [--threads 8]
+
+Linux, con gunicorn (pip install gunicorn), varios procesos según gunicorn.conf.py:
+    gunicorn -c gunicorn.conf.py
+
+Antes, 'npm run build' en frontend/ (genera dist/ y sus variantes .gz/.br).
+En producción el frontend se sirve desde el mismo origen, por eso CORS queda apagado
+salvo que se pida con PENDIENTES_CORS=1. Con muchos usuarios en /api/events conviene
+asgi.py o serve_gevent.py: acá cada conexión SSE ocupa un hilo
+(comparación: python bench/http_load.py).
+"""
+import argparse
+import os
+
+os.environ.setdefault('PENDIENTES_CORS', '0')
+
+from app import create_app
+
+app = create_app()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor waitress para pendientes')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5001)
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('PENDIENTES_THREADS', '8')))
+    args = parser.parse_args()
+
+    from waitress import serve
+
+    print(f'🚀 Sirviendo en http://{args.host}:{args.port} (waitress, {args.threads} hilos)')
+    serve(app, host=args.host, port=args.port, threads=args.threads)
+
+
+if __name__ == '__main__':
+    main()